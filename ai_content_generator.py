@@ -1,51 +1,138 @@
 import json
-import time
-import streamlit as st
+import math
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from openai import OpenAI
 
+from completion_cache import JSON_RESPONSE_FORMAT, UsageTracker, cached_completion_content
+from content_validation import (
+    REPAIR_RESPONSE_FORMAT, apply_repairs, build_repair_prompt, enforce_limits, find_problems,
+    repair_expected_tokens, response_format_for
+)
+from near_duplicates import DEDUPE_FIELDS, NearDuplicateIndex, diversity_hint, row_text
+from rate_limiter import RateLimiter
+from reporting import Reporter, get_reporter
+from resilience import RetryBudget
+from run_manifest import prompt_fingerprint, slot_fingerprint, slot_id
+from utils import estimate_tokens
+
 # Use gpt-4o-mini as it's a capable and cost-effective recent model.
 # The user can change this if they have access to a specific "gpt-4.1-mini".
 DEFAULT_MODEL = "gpt-4o-mini" 
 
-def _call_openai_api_sync(prompt: str, openai_client: OpenAI, model: str = DEFAULT_MODEL) -> dict | None:
-    """Makes a synchronous API call to OpenAI and parses JSON output."""
+# Concurrency for generate_all_content. Pacing is handled by the rate limiter, not fixed sleeps.
+MAX_CONCURRENT_REQUESTS = 8
+EXPECTED_COMPLETION_TOKENS = 600 # Rough per-call output budget reserved against tokens/min
+RETRY_BUDGET_PER_CALL = 2 # A run may spend on average this many retries per API call
+
+# Multi-item mode: one call returns several versions for a platform/objective.
+MULTI_ITEM_OUTPUT_TOKEN_LIMIT = 12000 # Stay well below the model's max output tokens per call
+ITEM_OUTPUT_TOKEN_ESTIMATES = {"email": 450, "linkedin": 250, "facebook": 260}
+
+# Model per prompt type, in fallback order, with the p95 latency (seconds per call) past which the next
+# model is used (see model_routing.ModelRouter). Cheap, fast models take the short-form bulk; the long
+# reasoning statement and the email sequence get stronger ones.
+MODEL_ROUTES = {
+    "email": {"models": ["gpt-4o-mini", "gpt-4.1-mini"], "max_p95_seconds": 20},
+    "linkedin": {"models": ["gpt-4.1-nano", "gpt-4o-mini"], "max_p95_seconds": 12},
+    "facebook": {"models": ["gpt-4.1-nano", "gpt-4o-mini"], "max_p95_seconds": 12},
+    "google_search": {"models": ["gpt-4.1-nano", "gpt-4o-mini"], "max_p95_seconds": 12},
+    "google_display": {"models": ["gpt-4.1-nano", "gpt-4o-mini"], "max_p95_seconds": 12},
+    "repair": {"models": ["gpt-4o-mini", "gpt-4.1-mini"], "max_p95_seconds": 15}, # Counting characters needs care
+    "reasoning": {"models": ["gpt-4.1-mini", "gpt-4o-mini"], "max_p95_seconds": 30},
+}
+
+# Near-duplicate versions are regenerated with a diversity hint, within these limits.
+MAX_DEDUPE_ATTEMPTS = 2 # Per row
+DEDUPE_BUDGET_SHARE = 0.25 # Per run, as a share of the email/LinkedIn/Facebook rows
+
+def _call_openai_api_sync(prompt: str, openai_client: OpenAI, model: str = DEFAULT_MODEL,
+                          use_cache: bool = True, rate_limiter: RateLimiter | None = None,
+                          expected_completion_tokens: int = EXPECTED_COMPLETION_TOKENS,
+                          retry_budget: RetryBudget | None = None, reporter: Reporter | None = None,
+                          usage_tracker: UsageTracker | None = None, usage_label: str = "",
+                          usage_tags: dict | None = None, response_format: dict = JSON_RESPONSE_FORMAT,
+                          model_task: str = "") -> dict | None:
+    """Makes a synchronous API call to OpenAI (or serves it from the completion cache) and parses JSON output."""
+    reporter = get_reporter(reporter)
+    content = None
     try:
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
+        content = cached_completion_content(
+            openai_client, model, prompt, response_format=response_format, use_cache=use_cache, rate_limiter=rate_limiter,
+            estimated_tokens=estimate_tokens(prompt) + expected_completion_tokens, retry_budget=retry_budget,
+            usage_tracker=usage_tracker, usage_label=usage_label, usage_tags=usage_tags, model_task=model_task
         )
-        content = response.choices[0].message.content
         return json.loads(content)
     except json.JSONDecodeError as e:
-        st.error(f"AI response JSON parsing error: {e}")
-        st.text_area("Problematic AI Response:", content, height=150)
+        reporter.error(f"AI response JSON parsing error: {e}", details=content)
         return None
     except Exception as e:
-        st.error(f"OpenAI API call failed: {e}")
+        reporter.error(f"OpenAI API call failed: {e}")
         return None
 
-def generate_email_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, num_emails):
+PREFIX_BRIEF_REFERENCE = "see the company brief at the top of this prompt"
+
+def build_shared_prefix(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url):
+    """
+    Run-wide context placed verbatim at the start of every prompt in the prefix-cache layout.
+    It is identical for all calls in a run, so providers with automatic prompt caching
+    (OpenAI caches prefixes of 1024+ tokens) only process it once.
+    """
+    return f"""You are an expert B2B marketing copywriter. Every task in this session is for the company described below.
+Always write in the company's tone of voice and respond with a single JSON object only.
+
+=== COMPANY BRIEF ===
+{json.dumps(company_info, indent=2, sort_keys=True, ensure_ascii=False)}
+
+Lead Objective: {lead_objective_type}
+Lead Objective URL: {lead_objective_url}
+Downloadable Material URL: {downloadable_material_url if downloadable_material_url else "N/A"}
+Downloadable Material Context:
+{downloadable_material_context if downloadable_material_context else "N/A"}
+=== END OF COMPANY BRIEF ===
+
+=== TASK ===
+"""
+
+def _company_context(company_info, audience_default, shared_prefix, indent):
+    """Company info lines of a prompt; in the prefix-cache layout they refer to the shared brief instead."""
+    if shared_prefix:
+        return f"Company Info and Target Audience: {PREFIX_BRIEF_REFERENCE}."
+    return (f"Company Info: Tone: {company_info.get('tone_of_voice', 'professional')}, Offerings: {company_info.get('offerings', [])}, USPs: {company_info.get('USPs', [])}.\n"
+            f"{' ' * indent}Target Audience: {company_info.get('target_audience', audience_default)}.")
+
+def _google_company_context(company_info, audience_default, shared_prefix):
+    if shared_prefix:
+        return f"Company Info and Target Audience: {PREFIX_BRIEF_REFERENCE}."
+    return f"Company Info: Offerings: {company_info.get('offerings', [])}, USPs: {company_info.get('USPs', [])}, Target Audience: {company_info.get('target_audience', audience_default)}."
+
+def _downloadable_context(downloadable_material_context, shared_prefix):
+    if not downloadable_material_context:
+        return "N/A"
+    return PREFIX_BRIEF_REFERENCE if shared_prefix else downloadable_material_context
+
+def generate_email_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, num_emails, shared_prefix=""):
     prompts = []
     email_objective = "Demand Capture"
     email_destination_url = lead_objective_url
     email_cta_text_suggestion = f"Book a {lead_objective_type}" if lead_objective_type else "Learn More"
 
     for i in range(num_emails):
+        # Only the email's role in the sequence is given, not the sequence length, so adding emails
+        # leaves the earlier prompts (and their slots in the run manifest) unchanged except the old last one.
         sequence_guidance = ""
         if num_emails > 1:
-            sequence_guidance = f"This is email {i+1} of a {num_emails}-email sequence. The messaging should evolve."
+            sequence_guidance = f"This is email {i+1} of an email sequence. The messaging should evolve."
             if i == 0: sequence_guidance += " This first email should introduce the core value."
             elif i == num_emails - 1: sequence_guidance += " This last email should be a final engagement attempt."
             else: sequence_guidance += " This email should build on previous messages."
 
-        prompt = f"""
+        prompt = shared_prefix + f"""
         You are an expert email marketing copywriter for {company_info.get('company_name', 'the company')}.
-        Company Info: Tone: {company_info.get('tone_of_voice', 'professional')}, Offerings: {company_info.get('offerings', [])}, USPs: {company_info.get('USPs', [])}.
-        Target Audience: {company_info.get('target_audience', 'potential clients')}.
+        {_company_context(company_info, 'potential clients', shared_prefix, indent=8)}
         Email Details: Objective: {email_objective}, Lead Objective: {lead_objective_type}, CTA URL: {email_destination_url}.
         {sequence_guidance}
-        Downloadable Material Context (if relevant): {downloadable_material_context if downloadable_material_context else "N/A"}
+        Downloadable Material Context (if relevant): {_downloadable_context(downloadable_material_context, shared_prefix)}
 
         Output JSON: {{
           "version_number": {i + 1}, "objective": "{email_objective}",
@@ -59,7 +146,7 @@ def generate_email_prompts(company_info, lead_objective_type, lead_objective_url
         prompts.append({"type": "email", "prompt": prompt, "version": i + 1, "objective_type": email_objective})
     return prompts
 
-def generate_linkedin_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_pieces):
+def generate_linkedin_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_pieces, shared_prefix=""):
     prompts = []
     linkedin_objectives = ["Brand Awareness", "Demand Gen", "Demand Capture"]
     base_cta_options = {"Demo Booking": ["Request Demo", "Book Now"], "Sales Meeting": ["Book Meeting", "Schedule Call"]}
@@ -73,12 +160,11 @@ def generate_linkedin_ad_prompts(company_info, lead_objective_type, lead_objecti
             if downloadable_material_url and objective in ["Demand Gen", "Brand Awareness"]:
                 dest_url = downloadable_material_url
                 cta_buttons = ["Download", "Learn More"]
-                current_downloadable_context = downloadable_material_context if downloadable_material_context else "Available for download."
+                current_downloadable_context = _downloadable_context(downloadable_material_context, shared_prefix) if downloadable_material_context else "Available for download."
 
-            prompt = f"""
+            prompt = shared_prefix + f"""
             Generate a LinkedIn ad for {company_info.get('company_name', 'the company')}.
-            Company Info: Tone: {company_info.get('tone_of_voice', 'professional')}, Offerings: {company_info.get('offerings', [])}, USPs: {company_info.get('USPs', [])}.
-            Target Audience: {company_info.get('target_audience', 'professionals')}.
+            {_company_context(company_info, 'professionals', shared_prefix, indent=12)}
             Ad Details: Objective: {objective}, Lead Objective: {lead_objective_type}, Destination URL: {dest_url}.
             Downloadable Material Context: {current_downloadable_context}
 
@@ -97,7 +183,7 @@ def generate_linkedin_ad_prompts(company_info, lead_objective_type, lead_objecti
             prompts.append({"type": "linkedin", "prompt": prompt, "version": i + 1, "objective_type": objective})
     return prompts
 
-def generate_facebook_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_pieces):
+def generate_facebook_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_pieces, shared_prefix=""):
     prompts = []
     fb_objectives = ["Brand Awareness", "Demand Gen", "Demand Capture"]
     base_cta_options = {"Demo Booking": ["Book Now", "Request Demo"], "Sales Meeting": ["Book Now", "Schedule Call"]}
@@ -111,12 +197,11 @@ def generate_facebook_ad_prompts(company_info, lead_objective_type, lead_objecti
             if downloadable_material_url and objective in ["Demand Gen", "Brand Awareness"]:
                 dest_url = downloadable_material_url
                 cta_buttons = ["Download", "Learn More"]
-                current_downloadable_context = downloadable_material_context if downloadable_material_context else "Available for download."
+                current_downloadable_context = _downloadable_context(downloadable_material_context, shared_prefix) if downloadable_material_context else "Available for download."
 
-            prompt = f"""
+            prompt = shared_prefix + f"""
             Generate a Facebook ad for {company_info.get('company_name', 'the company')}.
-            Company Info: Tone: {company_info.get('tone_of_voice', 'professional')}, Offerings: {company_info.get('offerings', [])}, USPs: {company_info.get('USPs', [])}.
-            Target Audience: {company_info.get('target_audience', 'relevant users')}.
+            {_company_context(company_info, 'relevant users', shared_prefix, indent=12)}
             Ad Details: Objective: {objective}, Lead Objective: {lead_objective_type}, Destination URL: {dest_url}.
             Downloadable Material Context: {current_downloadable_context}
 
@@ -136,10 +221,184 @@ def generate_facebook_ad_prompts(company_info, lead_objective_type, lead_objecti
             prompts.append({"type": "facebook", "prompt": prompt, "version": i + 1, "objective_type": objective})
     return prompts
 
-def generate_google_search_ad_prompt(company_info):
-    prompt = f"""
+def _version_chunks(platform, num_versions):
+    """Splits versions 1..num_versions into chunks whose combined output fits in one call."""
+    per_call = max(1, MULTI_ITEM_OUTPUT_TOKEN_LIMIT // ITEM_OUTPUT_TOKEN_ESTIMATES[platform])
+    return [list(range(start + 1, min(start + per_call, num_versions) + 1)) for start in range(0, num_versions, per_call)]
+
+def generate_email_multi_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, num_emails, shared_prefix=""):
+    """Multi-item variant of generate_email_prompts: one prompt returns a chunk of the email sequence."""
+    prompts = []
+    email_objective = "Demand Capture"
+    email_destination_url = lead_objective_url
+    email_cta_text_suggestion = f"Book a {lead_objective_type}" if lead_objective_type else "Learn More"
+
+    sequence_guidance = ""
+    if num_emails > 1:
+        sequence_guidance = ("These emails form a sequence and the messaging should evolve. "
+                             f"Email 1 should introduce the core value, email {num_emails} is the last and should be a final engagement attempt, "
+                             "and the emails in between should build on previous messages.")
+
+    for versions in _version_chunks("email", num_emails):
+        first, last = versions[0], versions[-1]
+        prompt = shared_prefix + f"""
+        You are an expert email marketing copywriter for {company_info.get('company_name', 'the company')}.
+        {_company_context(company_info, 'potential clients', shared_prefix, indent=8)}
+        Email Details: Objective: {email_objective}, Lead Objective: {lead_objective_type}, CTA URL: {email_destination_url}.
+        {sequence_guidance}
+        Write emails {first} to {last} of the sequence.
+        Downloadable Material Context (if relevant): {_downloadable_context(downloadable_material_context, shared_prefix)}
+
+        Output JSON: {{
+          "items": [
+            {{
+              "version_number": <email number, {first} to {last}>, "objective": "{email_objective}",
+              "headline": "Captivating email headline/hook (internal title or first impactful sentence).",
+              "subject_line": "Compelling email subject line.",
+              "body": "Email body (2-3 paragraphs). Embed CTA naturally. Follow the sequence position. Adhere to company tone. Mention downloadable material if relevant.",
+              "cta": "Brief CTA description (e.g., 'Click here to book your demo ({email_cta_text_suggestion})')."
+            }}
+          ]
+        }}
+        Return exactly {len(versions)} items, one per email, in order. Provide ONLY the JSON object.
+        """
+        prompts.append({
+            "type": "email", "prompt": prompt, "versions": versions, "objective_type": email_objective,
+            "rows": [v - 1 for v in versions],
+            "expected_output_tokens": len(versions) * ITEM_OUTPUT_TOKEN_ESTIMATES["email"]
+        })
+    return prompts
+
+def generate_linkedin_ad_multi_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_pieces, shared_prefix=""):
+    """Multi-item variant of generate_linkedin_ad_prompts: one prompt per objective returns several versions."""
+    prompts = []
+    linkedin_objectives = ["Brand Awareness", "Demand Gen", "Demand Capture"]
+    base_cta_options = {"Demo Booking": ["Request Demo", "Book Now"], "Sales Meeting": ["Book Meeting", "Schedule Call"]}
+
+    for objective_index, objective in enumerate(linkedin_objectives):
+        dest_url = lead_objective_url
+        cta_buttons = base_cta_options.get(lead_objective_type, []) + ["Learn More"]
+
+        current_downloadable_context = "N/A"
+        if downloadable_material_url and objective in ["Demand Gen", "Brand Awareness"]:
+            dest_url = downloadable_material_url
+            cta_buttons = ["Download", "Learn More"]
+            current_downloadable_context = _downloadable_context(downloadable_material_context, shared_prefix) if downloadable_material_context else "Available for download."
+
+        for versions in _version_chunks("linkedin", num_pieces):
+            first, last = versions[0], versions[-1]
+            prompt = shared_prefix + f"""
+            Generate {len(versions)} distinct LinkedIn ad versions for {company_info.get('company_name', 'the company')}.
+            {_company_context(company_info, 'professionals', shared_prefix, indent=12)}
+            Ad Details: Objective: {objective}, Lead Objective: {lead_objective_type}, Destination URL: {dest_url}.
+            Downloadable Material Context: {current_downloadable_context}
+            Each version must take a different angle, hook or focus.
+
+            Output JSON: {{
+              "items": [
+                {{
+                  "version_number": <version, {first} to {last}>,
+                  "ad_name": "LinkedIn Ad - {objective} - V<version_number> - [Unique focus/keyword]",
+                  "objective": "{objective}",
+                  "introductory_text": "Hook in first 150 chars. Total 200-350 chars (max 500). Use emojis. Align with company tone.",
+                  "image_copy": "Short text for ad image (max 125 chars).",
+                  "headline": "Compelling headline (max 70 chars).",
+                  "destination": "{dest_url}",
+                  "cta_button": "Choose one from: {', '.join(cta_buttons)}. If 'Download', ensure ad promotes it."
+                }}
+              ]
+            }}
+            Return exactly {len(versions)} items with version_number {first} to {last}, in order.
+            Ad name max 255 chars. Provide ONLY the JSON object.
+            """
+            prompts.append({
+                "type": "linkedin", "prompt": prompt, "versions": versions, "objective_type": objective,
+                "rows": [(v - 1) * len(linkedin_objectives) + objective_index for v in versions],
+                "expected_output_tokens": len(versions) * ITEM_OUTPUT_TOKEN_ESTIMATES["linkedin"]
+            })
+    return prompts
+
+def generate_facebook_ad_multi_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_pieces, shared_prefix=""):
+    """Multi-item variant of generate_facebook_ad_prompts: one prompt per objective returns several versions."""
+    prompts = []
+    fb_objectives = ["Brand Awareness", "Demand Gen", "Demand Capture"]
+    base_cta_options = {"Demo Booking": ["Book Now", "Request Demo"], "Sales Meeting": ["Book Now", "Schedule Call"]}
+
+    for objective_index, objective in enumerate(fb_objectives):
+        dest_url = lead_objective_url
+        cta_buttons = base_cta_options.get(lead_objective_type, []) + ["Learn More"]
+
+        current_downloadable_context = "N/A"
+        if downloadable_material_url and objective in ["Demand Gen", "Brand Awareness"]:
+            dest_url = downloadable_material_url
+            cta_buttons = ["Download", "Learn More"]
+            current_downloadable_context = _downloadable_context(downloadable_material_context, shared_prefix) if downloadable_material_context else "Available for download."
+
+        for versions in _version_chunks("facebook", num_pieces):
+            first, last = versions[0], versions[-1]
+            prompt = shared_prefix + f"""
+            Generate {len(versions)} distinct Facebook ad versions for {company_info.get('company_name', 'the company')}.
+            {_company_context(company_info, 'relevant users', shared_prefix, indent=12)}
+            Ad Details: Objective: {objective}, Lead Objective: {lead_objective_type}, Destination URL: {dest_url}.
+            Downloadable Material Context: {current_downloadable_context}
+            Each version must take a different angle, hook or focus.
+
+            Output JSON: {{
+              "items": [
+                {{
+                  "version_number": <version, {first} to {last}>,
+                  "ad_name": "Facebook Ad - {objective} - V<version_number> - [Unique focus/keyword]",
+                  "objective": "{objective}",
+                  "primary_text": "Hook in first 125 chars. Total 200-350 chars (max 500). Use emojis. Align with company tone.",
+                  "image_copy": "Short text for ad image (max 125 chars).",
+                  "headline": "Compelling headline (max 27 chars).",
+                  "link_description": "Link description (max 27 chars).",
+                  "destination": "{dest_url}",
+                  "cta_button": "Choose one from: {', '.join(cta_buttons)}. If 'Download', ensure ad promotes it."
+                }}
+              ]
+            }}
+            Return exactly {len(versions)} items with version_number {first} to {last}, in order.
+            Ad name max 255 chars. Provide ONLY the JSON object.
+            """
+            prompts.append({
+                "type": "facebook", "prompt": prompt, "versions": versions, "objective_type": objective,
+                "rows": [(v - 1) * len(fb_objectives) + objective_index for v in versions],
+                "expected_output_tokens": len(versions) * ITEM_OUTPUT_TOKEN_ESTIMATES["facebook"]
+            })
+    return prompts
+
+def split_multi_item_result(prompt_obj, generated_data):
+    """
+    Splits a multi-item response into one row per requested version, in `versions` order.
+    Items are matched by version_number, falling back to position. Missing items become None.
+    """
+    versions = prompt_obj["versions"]
+    items = generated_data.get("items") if isinstance(generated_data, dict) else None
+    items = [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+    by_version = {}
+    for item in items:
+        try:
+            version = int(item.get("version_number"))
+        except (TypeError, ValueError):
+            continue
+        if version in versions and version not in by_version:
+            by_version[version] = item
+
+    use_positions = len(by_version) < len(versions) and len(items) == len(versions)
+    rows = []
+    for position, version in enumerate(versions):
+        item = items[position] if use_positions else by_version.get(version)
+        if item is not None:
+            item = dict(item, version_number=version)
+        rows.append(item)
+    return rows
+
+def generate_google_search_ad_prompt(company_info, shared_prefix=""):
+    prompt = shared_prefix + f"""
     Generate Google Search Ad components for {company_info.get('company_name', 'the company')}.
-    Company Info: Offerings: {company_info.get('offerings', [])}, USPs: {company_info.get('USPs', [])}, Target Audience: {company_info.get('target_audience', 'search users')}.
+    {_google_company_context(company_info, 'search users', shared_prefix)}
     Output JSON: {{
       "headlines": ["Headline 1 (max 30 chars)", /* ...14 more headlines */ ],
       "descriptions": ["Description 1 (max 90 chars)", /* ...3 more descriptions */ ]
@@ -150,10 +409,10 @@ def generate_google_search_ad_prompt(company_info):
     """
     return {"type": "google_search", "prompt": prompt}
 
-def generate_google_display_ad_prompt(company_info):
-    prompt = f"""
+def generate_google_display_ad_prompt(company_info, shared_prefix=""):
+    prompt = shared_prefix + f"""
     Generate Google Display Ad components for {company_info.get('company_name', 'the company')}.
-    Company Info: Offerings: {company_info.get('offerings', [])}, USPs: {company_info.get('USPs', [])}, Target Audience: {company_info.get('target_audience', 'relevant audience segments')}.
+    {_google_company_context(company_info, 'relevant audience segments', shared_prefix)}
     Output JSON: {{
       "headlines": ["Headline 1 (max 30 chars)", /* ...4 more headlines */ ],
       "descriptions": ["Description 1 (max 90 chars)", /* ...4 more descriptions */ ]
@@ -164,16 +423,16 @@ def generate_google_display_ad_prompt(company_info):
     """
     return {"type": "google_display", "prompt": prompt}
 
-def generate_reasoning_prompt(company_info, all_scraped_text, lead_objective_type, downloadable_material_context):
-    prompt = f"""
+def generate_reasoning_prompt(company_info, all_scraped_text, lead_objective_type, downloadable_material_context, shared_prefix=""):
+    prompt = shared_prefix + f"""
     You are a senior marketing consultant. Based on the provided company information and context, provide a strategic reasoning statement.
     Explain how the company data (name, offerings, USPs, target audience, tone: {company_info.get('tone_of_voice')}), website content, lead objective ({lead_objective_type}),
     and any downloadable material context ({'Provided' if downloadable_material_context else 'Not provided'})
     were (or would be) used to tailor the generated marketing ad content for different platforms.
 
-    Company Information Extracted: {json.dumps(company_info, indent=2)}
+    Company Information Extracted: {PREFIX_BRIEF_REFERENCE if shared_prefix else json.dumps(company_info, indent=2)}
     Full Scraped Text Summary (first 1000 chars): {all_scraped_text[:1000]}...
-    Downloadable Material Context: {downloadable_material_context if downloadable_material_context else "N/A"}
+    Downloadable Material Context: {_downloadable_context(downloadable_material_context, shared_prefix)}
 
     Output JSON: {{
       "reasoning_statement": "Your detailed reasoning here. Explain data influence on content strategy."
@@ -185,60 +444,425 @@ def generate_reasoning_prompt(company_info, all_scraped_text, lead_objective_typ
 
 def compile_all_prompts(company_info, lead_objective_type, lead_objective_url,
                         downloadable_material_context, downloadable_material_url,
-                        num_content_pieces, full_scraped_text_for_reasoning):
+                        num_content_pieces, full_scraped_text_for_reasoning, multi_item=False, prefix_cache=False):
+    """
+    Builds every prompt for a run. With `multi_item=True`, email/LinkedIn/Facebook use one call per
+    platform and objective (chunked to fit output limits) instead of one call per version.
+    With `prefix_cache=True`, every prompt starts with the same run-wide company brief (see
+    build_shared_prefix) and only the task-specific text follows, so provider-side prompt caching applies.
+    """
+    shared_prefix = ""
+    if prefix_cache:
+        shared_prefix = build_shared_prefix(company_info, lead_objective_type, lead_objective_url,
+                                            downloadable_material_context, downloadable_material_url)
+    email_prompts = generate_email_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, num_content_pieces, shared_prefix)
+    linkedin_prompts = generate_linkedin_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_content_pieces, shared_prefix)
+    facebook_prompts = generate_facebook_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_content_pieces, shared_prefix)
+    if multi_item:
+        # The per-version prompts are kept only as slot fingerprints, so a version is reused from the run
+        # manifest whether it was generated in multi-item mode or not
+        email_prompts = _with_slot_inputs(generate_email_multi_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, num_content_pieces, shared_prefix), email_prompts)
+        linkedin_prompts = _with_slot_inputs(generate_linkedin_ad_multi_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_content_pieces, shared_prefix), linkedin_prompts)
+        facebook_prompts = _with_slot_inputs(generate_facebook_ad_multi_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_content_pieces, shared_prefix), facebook_prompts)
+
     all_prompts_dict = {
-        "email": generate_email_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, num_content_pieces),
-        "linkedin": generate_linkedin_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_content_pieces),
-        "facebook": generate_facebook_ad_prompts(company_info, lead_objective_type, lead_objective_url, downloadable_material_context, downloadable_material_url, num_content_pieces),
-        "google_search": [generate_google_search_ad_prompt(company_info)], # List of one for consistency
-        "google_display": [generate_google_display_ad_prompt(company_info)], # List of one
-        "reasoning": generate_reasoning_prompt(company_info, full_scraped_text_for_reasoning, lead_objective_type, downloadable_material_context)
+        "email": email_prompts,
+        "linkedin": linkedin_prompts,
+        "facebook": facebook_prompts,
+        "google_search": [generate_google_search_ad_prompt(company_info, shared_prefix)], # List of one for consistency
+        "google_display": [generate_google_display_ad_prompt(company_info, shared_prefix)], # List of one
+        "reasoning": generate_reasoning_prompt(company_info, full_scraped_text_for_reasoning, lead_objective_type, downloadable_material_context, shared_prefix)
     }
     return all_prompts_dict
 
-def generate_all_content(all_prompts_dict, openai_client, progress_bar_updater, status_updater, model=DEFAULT_MODEL):
-    results = {"email": [], "linkedin": [], "facebook": [], "google_search": [], "google_display": [], "reasoning": None}
-    
-    total_api_calls = 0
-    for platform, prompts_or_prompt_str in all_prompts_dict.items():
-        if platform == "reasoning":
-            if prompts_or_prompt_str: total_api_calls +=1
-        elif isinstance(prompts_or_prompt_str, list):
-            total_api_calls += len(prompts_or_prompt_str)
-            
-    completed_api_calls = 0
-
-    for platform, prompts_list_or_str in all_prompts_dict.items():
-        if platform == "reasoning":
-            if prompts_list_or_str: # This is a single prompt string
-                status_updater(f"Generating reasoning statement...")
-                reasoning_content = _call_openai_api_sync(prompts_list_or_str, openai_client, model)
-                if reasoning_content:
-                    results["reasoning"] = reasoning_content
-                completed_api_calls += 1
-                progress_bar_updater(completed_api_calls / total_api_calls if total_api_calls > 0 else 1)
-                time.sleep(1) # API rate limit
-            continue
+def _with_slot_inputs(multi_prompts, single_prompts):
+    """Adds "slot_inputs" to multi-item prompts: the fingerprint of the single-version prompt of each version."""
+    fingerprints = {(p["objective_type"], p["version"]): prompt_fingerprint(p["prompt"]) for p in single_prompts}
+    for prompt_obj in multi_prompts:
+        prompt_obj["slot_inputs"] = [fingerprints[(prompt_obj["objective_type"], v)] for v in prompt_obj["versions"]]
+    return multi_prompts
 
-        # For other platforms, it's a list of prompt objects
-        for prompt_obj in prompts_list_or_str:
-            prompt_text = prompt_obj["prompt"]
-            version = prompt_obj.get("version", 1)
-            objective = prompt_obj.get("objective_type", "N/A")
-            
-            status_updater(f"Generating content for {platform.capitalize()} ({objective} - V{version})...")
-            
-            generated_data = _call_openai_api_sync(prompt_text, openai_client, model)
-            if generated_data:
-                results[platform].append(generated_data)
-            else: # Add a placeholder if API call failed for this item
-                error_placeholder = {"error": f"Failed to generate content for {platform} V{version} ({objective})"}
-                if platform in ["google_search", "google_display"]: # These expect specific structures
-                     error_placeholder = {"headlines": [f"Error generating for {platform}"], "descriptions": ["Error"]}
-                results[platform].append(error_placeholder)
-
-            completed_api_calls += 1
-            progress_bar_updater(completed_api_calls / total_api_calls if total_api_calls > 0 else 1)
-            time.sleep(1) # Slight delay
-
-    return results
\ No newline at end of file
+def prompt_rows(prompt_obj, index):
+    """Row positions a prompt object fills in its platform's results list."""
+    return prompt_obj.get("rows", [index])
+
+def prompt_label(prompt_obj):
+    """Short description of a prompt object for status messages, e.g. 'Demand Gen - V1-10'."""
+    objective = prompt_obj.get("objective_type", "N/A")
+    versions = prompt_obj.get("versions")
+    if versions:
+        version_text = f"V{versions[0]}" if len(versions) == 1 else f"V{versions[0]}-{versions[-1]}"
+    else:
+        version_text = f"V{prompt_obj.get('version', 1)}"
+    return f"{objective} - {version_text}"
+
+def prompt_slots(platform, index, prompt_obj):
+    """(row, slot ID, input fingerprint) for every row a prompt object fills, as recorded in the run manifest."""
+    objective = prompt_obj.get("objective_type", "N/A")
+    if prompt_obj.get("versions"):
+        versions = prompt_obj["versions"]
+        inputs = prompt_obj.get("slot_inputs") or [prompt_fingerprint(f"{prompt_obj['prompt']}V{v}") for v in versions]
+    else:
+        versions = [prompt_obj.get("version", 1)]
+        inputs = [prompt_fingerprint(prompt_obj["prompt"])]
+    return [(row, slot_id(platform, objective, version), input_fingerprint)
+            for row, version, input_fingerprint in zip(prompt_rows(prompt_obj, index), versions, inputs)]
+
+def narrow_multi_item_prompt(prompt_obj, rows, extra_prompt=""):
+    """Copy of a multi-item prompt object that only asks for the versions filling `rows`, a subset of its rows."""
+    positions = [prompt_obj["rows"].index(row) for row in rows]
+    versions = [prompt_obj["versions"][position] for position in positions]
+    narrowed = dict(
+        prompt_obj, versions=versions, rows=list(rows),
+        prompt=prompt_obj["prompt"] + extra_prompt + f'    Return only version_number {", ".join(map(str, versions))} in "items".\n',
+        expected_output_tokens=len(versions) * ITEM_OUTPUT_TOKEN_ESTIMATES[prompt_obj["type"]]
+    )
+    if prompt_obj.get("slot_inputs"):
+        narrowed["slot_inputs"] = [prompt_obj["slot_inputs"][position] for position in positions]
+    return narrowed
+
+def _error_placeholder(platform, version, objective):
+    """Builds the row inserted when generation for a single prompt fails."""
+    if platform in ["google_search", "google_display"]: # These expect specific structures
+        return {"headlines": [f"Error generating for {platform}"], "descriptions": ["Error"]}
+    return {"error": f"Failed to generate content for {platform} V{version} ({objective})"}
+
+def _streamlit_thread_initializer():
+    """Returns a thread initializer that lets worker threads report via st.* calls, if running under Streamlit."""
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    return lambda: add_script_run_ctx(threading.current_thread(), ctx)
+
+def _platform_row_count(prompts_list):
+    """Number of result rows a platform's prompt list produces."""
+    return max((max(prompt_rows(p, i)) + 1 for i, p in enumerate(prompts_list)), default=0)
+
+def fill_result_rows(platform_rows, prompt_obj, index, generated_data):
+    """
+    Places one call's output into its platform's row list, splitting multi-item
+    responses per version and inserting error placeholders for anything missing.
+    Returns (row_index, generated) pairs for the rows that were filled; generated is False for placeholders.
+    """
+    platform = prompt_obj.get("type")
+    objective = prompt_obj.get("objective_type", "N/A")
+    if prompt_obj.get("versions"):
+        versions = prompt_obj["versions"]
+        items = split_multi_item_result(prompt_obj, generated_data)
+    else:
+        versions = [prompt_obj.get("version", 1)]
+        items = [generated_data]
+    filled = []
+    for row, version, item in zip(prompt_rows(prompt_obj, index), versions, items):
+        # Add a placeholder if API call failed for this item
+        platform_rows[row] = item if item else _error_placeholder(platform, version, objective)
+        filled.append((row, bool(item)))
+    return filled
+
+def generate_all_content(all_prompts_dict, openai_client, progress_bar_updater, status_updater, model=DEFAULT_MODEL,
+                         max_concurrency=MAX_CONCURRENT_REQUESTS, rate_limiter=None, use_cache=True, retry_budget=None,
+                         result_callback=None, reporter=None, usage_tracker=None, structured_outputs=True, validate=True,
+                         dedupe=True, dedupe_budget=None, run_manifest=None, router=None):
+    """
+    Runs every compiled prompt against OpenAI using a bounded thread pool.
+    At most `max_concurrency` calls are in flight; `rate_limiter` paces requests/min and tokens/min.
+    Set `use_cache=False` to bypass the completion cache for this run.
+    Transient failures are retried within `retry_budget` (by default RETRY_BUDGET_PER_CALL per call).
+    Results keep the per-platform, per-version order of `all_prompts_dict`, including
+    for multi-item prompts, which are split back into one row per version.
+    `result_callback(platform, row_index, row)` is called for every result row as soon as its
+    call completes (e.g. to stream rows into exporters); reasoning arrives as row 0 of "reasoning".
+    Callbacks are always invoked from the calling thread. Errors go to `reporter` (see reporting.get_reporter).
+    Per-call token usage, including provider-cached prompt tokens, is recorded in `usage_tracker` if given.
+    With `structured_outputs` each call uses a strict JSON schema for its platform (see content_validation).
+    With `validate` every row is checked against its platform's character limits and counts; failing rows
+    are held back until the platform's calls are done, then all their failing fields are rewritten in one
+    repair call per platform, and anything still over a limit after that is truncated.
+    With `dedupe` every email/LinkedIn/Facebook version is compared on arrival with the versions already
+    accepted for its platform and objective (see near_duplicates). Near-copies are regenerated with a
+    diversity hint, at most MAX_DEDUPE_ATTEMPTS times per row and `dedupe_budget` times per run
+    (by default DEDUPE_BUDGET_SHARE of the rows); after that they are kept.
+    With a `run_manifest` (see run_manifest.RunManifest) every row is looked up by its slot (platform,
+    objective, version) and the fingerprint of its inputs first: stored rows are reused without a call,
+    multi-item calls are narrowed to the versions still missing, and every newly generated row is recorded.
+    With use_cache=False nothing is reused but new rows are still recorded.
+    With a `router` (see model_routing.ModelRouter, e.g. over MODEL_ROUTES) each call's model is picked
+    per prompt type when the call starts, instead of using `model` for everything.
+    """
+    run = _GenerationRun(
+        openai_client, progress_bar_updater, status_updater, model, max_concurrency, rate_limiter, use_cache,
+        result_callback, get_reporter(reporter), usage_tracker, structured_outputs, validate, dedupe, run_manifest, router
+    )
+    return run.run(all_prompts_dict, retry_budget, dedupe_budget)
+
+
+class _GenerationRun:
+    """State of one generate_all_content call: result rows, in-flight calls and the dedupe and repair bookkeeping."""
+
+    def __init__(self, openai_client, progress_bar_updater, status_updater, model, max_concurrency, rate_limiter, use_cache,
+                 result_callback, reporter, usage_tracker, structured_outputs, validate, dedupe, run_manifest, router):
+        self.openai_client = openai_client
+        self.progress_bar_updater = progress_bar_updater
+        self.status_updater = status_updater
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.use_cache = use_cache
+        self.result_callback = result_callback
+        self.reporter = reporter
+        self.usage_tracker = usage_tracker
+        self.structured_outputs = structured_outputs
+        self.validate = validate
+        self.dedupe = dedupe
+        self.run_manifest = run_manifest
+        self.router = router
+
+        self.reasoning = None
+        self.slots = {} # platform -> result rows
+        self.slot_keys = {} # (platform, row) -> (slot ID, fingerprint) of rows to record in run_manifest
+        self.calls_left = {} # Includes regenerations; the repair call waits for all of them
+        self.held_problems = {} # platform -> {row: problems}, callbacks wait for the repair
+        self.duplicate_index = NearDuplicateIndex()
+        self.dedupe_attempts = {} # (platform, row) -> regenerations so far
+        self.dedupe_budget = 0
+        self.kept_duplicates = 0
+        self.retry_budget = None
+        self.total_api_calls = 0
+        self.completed_api_calls = 0
+        self.pending = {} # future -> (kind, platform, index, payload, source prompt_obj the payload was narrowed from)
+
+    def run(self, all_prompts_dict, retry_budget, dedupe_budget):
+        self.slots = {platform: [None] * _platform_row_count(prompts) for platform, prompts in all_prompts_dict.items()
+                      if platform != "reasoning" and isinstance(prompts, list)}
+        self.calls_left = {platform: 0 for platform in self.slots}
+        self.held_problems = {platform: {} for platform in self.slots}
+        jobs, reused = self._plan_jobs(all_prompts_dict)
+
+        self.total_api_calls = len(jobs)
+        if retry_budget is None:
+            retry_budget = RetryBudget(RETRY_BUDGET_PER_CALL * self.total_api_calls)
+        self.retry_budget = retry_budget
+        if dedupe_budget is None:
+            dedupe_budget = math.ceil(DEDUPE_BUDGET_SHARE * sum(len(self.slots.get(platform, [])) for platform in DEDUPE_FIELDS))
+        self.dedupe_budget = dedupe_budget
+
+        self._restore_reused(reused)
+        if reused:
+            self.status_updater(f"Reusing {len(reused)} of {len(reused) + len(self.slot_keys)} slots from earlier runs.")
+        if not jobs:
+            self.progress_bar_updater(1)
+
+        self.status_updater(f"Generating content with {self.total_api_calls} API calls ({self.max_concurrency} at a time)...")
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, initializer=_streamlit_thread_initializer()) as executor:
+            for platform, index, prompt_obj, source in jobs:
+                self._submit_generation(executor, platform, index, prompt_obj, source=source)
+
+            while self.pending:
+                done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, platform, index, payload, source = self.pending.pop(future)
+                    try:
+                        generated_data = future.result()
+                    except Exception as e:
+                        self.reporter.error(f"OpenAI API call failed: {e}")
+                        generated_data = None
+
+                    if kind == "repair":
+                        self._apply_repair(platform, payload, generated_data)
+                    elif platform == "reasoning":
+                        self._accept_reasoning(generated_data)
+                    else:
+                        self._accept_generation(executor, kind, platform, index, payload, source, generated_data)
+
+                    self.completed_api_calls += 1
+                    self.progress_bar_updater(self.completed_api_calls / self.total_api_calls if self.total_api_calls > 0 else 1)
+
+        if self.kept_duplicates:
+            self.reporter.warning(f"Kept {self.kept_duplicates} near-duplicate version(s) after the dedupe budget was spent.")
+        results = {"email": [], "linkedin": [], "facebook": [], "google_search": [], "google_display": [], "reasoning": self.reasoning}
+        results.update(self.slots)
+        return results
+
+    def _plan_jobs(self, all_prompts_dict):
+        """
+        Flattens the prompts into (platform, index, prompt_obj, source) jobs so results can be slotted back in order;
+        `source` is the original prompt_obj. With a run manifest, stored rows are returned as reused
+        (platform, objective, row, stored row) instead, and multi-item jobs are narrowed to their missing versions.
+        Returns (jobs, reused).
+        """
+        jobs = []
+        for platform, prompts_list_or_str in all_prompts_dict.items():
+            if platform == "reasoning":
+                if prompts_list_or_str: # This is a single prompt string
+                    reasoning_obj = {"type": "reasoning", "prompt": prompts_list_or_str}
+                    jobs.append(("reasoning", 0, reasoning_obj, reasoning_obj))
+                continue
+            for index, prompt_obj in enumerate(prompts_list_or_str):
+                jobs.append((platform, index, prompt_obj, prompt_obj))
+        if self.run_manifest is None:
+            return jobs, []
+
+        remaining_jobs = []
+        reused = []
+        for platform, index, prompt_obj, source in jobs:
+            missing = []
+            for row, slot, input_fingerprint in prompt_slots(platform, index, prompt_obj):
+                fingerprint = slot_fingerprint(self.router.models(platform) if self.router else self.model, input_fingerprint,
+                                               structured_outputs=self.structured_outputs, validate=self.validate, dedupe=self.dedupe)
+                stored = self.run_manifest.get(slot, fingerprint) if self.use_cache else None
+                if stored is None:
+                    self.slot_keys[(platform, row)] = (slot, fingerprint)
+                    missing.append(row)
+                else:
+                    reused.append((platform, prompt_obj.get("objective_type", "N/A"), row, stored))
+            if len(missing) == len(prompt_rows(prompt_obj, index)):
+                remaining_jobs.append((platform, index, prompt_obj, source))
+            elif missing: # Only the versions of a multi-item call that aren't stored
+                remaining_jobs.append((platform, index, narrow_multi_item_prompt(prompt_obj, missing), source))
+        return remaining_jobs, reused
+
+    def _restore_reused(self, reused):
+        for platform, objective, row, stored in reused:
+            if platform == "reasoning":
+                self.reasoning = stored
+                if self.result_callback:
+                    self.result_callback("reasoning", 0, stored)
+                continue
+            self.slots[platform][row] = stored
+            if self.dedupe and platform in DEDUPE_FIELDS: # New versions must differ from the reused ones too
+                self.duplicate_index.add((platform, objective), row, row_text(platform, stored),
+                                         str(stored.get(DEDUPE_FIELDS[platform][0]) or ""))
+            self._emit(platform, row, store=False)
+
+    def _emit(self, platform, row, store=True):
+        if store and self.run_manifest is not None and (platform, row) in self.slot_keys:
+            self.run_manifest.put(*self.slot_keys[(platform, row)], self.slots[platform][row])
+        if self.result_callback:
+            self.result_callback(platform, row, self.slots[platform][row])
+
+    def _accept(self, platform, row, generated):
+        problems = find_problems(platform, self.slots[platform][row], row) if self.validate and generated else []
+        if problems:
+            self.held_problems[platform][row] = problems
+        else:
+            self._emit(platform, row, store=generated)
+
+    def _routed_call(self, task, multi_item, prompt, label, tags, expected_tokens, response_format):
+        call_model, model_task = self.router.route(task, multi_item) if self.router else (self.model, "")
+        return _call_openai_api_sync(
+            prompt, self.openai_client, call_model, self.use_cache, self.rate_limiter, expected_tokens, self.retry_budget,
+            self.reporter, self.usage_tracker, label, tags, response_format, model_task
+        )
+
+    def _submit_call(self, executor, platform, prompt, label, objective, expected_tokens, response_format, task=None,
+                     multi_item=False):
+        # Routed in the worker, so the model is picked with the latest stats when the call actually starts
+        return executor.submit(self._routed_call, task or platform, multi_item, prompt, label,
+                               {"platform": platform, "objective": objective}, expected_tokens, response_format)
+
+    def _submit_generation(self, executor, platform, index, prompt_obj, kind="generate", source=None):
+        if kind == "generate": # Regenerations announce themselves in _regenerate()
+            if platform == "reasoning":
+                self.status_updater("Generating reasoning statement...")
+            else:
+                self.status_updater(f"Generating content for {platform.capitalize()} ({prompt_label(prompt_obj)})...")
+        response_format = JSON_RESPONSE_FORMAT
+        if self.structured_outputs:
+            response_format = response_format_for(platform, multi_item=bool(prompt_obj.get("versions")))
+        future = self._submit_call(
+            executor, platform, prompt_obj["prompt"],
+            platform if platform == "reasoning" else f"{platform} {prompt_label(prompt_obj)}" + (" dedupe" if kind == "regenerate" else ""),
+            prompt_obj.get("objective_type", "N/A"),
+            prompt_obj.get("expected_output_tokens", EXPECTED_COMPLETION_TOKENS), response_format,
+            multi_item=bool(prompt_obj.get("versions"))
+        )
+        self.pending[future] = (kind, platform, index, prompt_obj, source or prompt_obj)
+        if platform in self.calls_left:
+            self.calls_left[platform] += 1
+
+    def _regenerate(self, executor, platform, index, source, duplicates):
+        """
+        Re-asks for the duplicate rows of one call ([(row, version, label)]) with a diversity hint. Every retry is
+        built from the call's original `source` prompt_obj, so hints don't pile up across attempts.
+        """
+        objective = source.get("objective_type", "N/A")
+        hint = diversity_hint(self.duplicate_index.labels((platform, objective)), duplicates[0][2])
+        if source.get("versions"): # Only the duplicate versions of a multi-item call
+            retry_obj = narrow_multi_item_prompt(source, [row for row, _, _ in duplicates], hint)
+        else:
+            retry_obj = dict(source, prompt=source["prompt"] + hint)
+        self.status_updater(f"Regenerating {len(duplicates)} near-duplicate {platform.capitalize()} version(s) ({objective})...")
+        self._submit_generation(executor, platform, index, retry_obj, kind="regenerate", source=source)
+        self.total_api_calls += 1
+
+    def _apply_repair(self, platform, problems, generated_data):
+        replaced = apply_repairs(self.slots[platform], problems, generated_data)
+        self.status_updater(f"Repaired {replaced} of {len(problems)} fields for {platform.capitalize()}.")
+        for row in sorted(self.held_problems[platform]):
+            still_wrong = enforce_limits(platform, self.slots[platform][row])
+            if still_wrong:
+                self.reporter.warning(f"{platform.capitalize()} row {row + 1} still has problems after repair: {', '.join(still_wrong)}.")
+            self._emit(platform, row)
+
+    def _accept_reasoning(self, generated_data):
+        self.status_updater("Generated reasoning statement.")
+        if generated_data:
+            self.reasoning = generated_data
+            if self.run_manifest is not None and ("reasoning", 0) in self.slot_keys:
+                self.run_manifest.put(*self.slot_keys[("reasoning", 0)], generated_data)
+            if self.result_callback:
+                self.result_callback("reasoning", 0, generated_data)
+
+    def _duplicate_label(self, platform, row, group, restored):
+        """
+        Dedupe check of a generated row: returns its label if it should be regenerated, or None once it is
+        accepted into the duplicate index (near-copies are kept when restored or out of attempts or budget).
+        """
+        text = row_text(platform, self.slots[platform][row])
+        label = str(self.slots[platform][row].get(DEDUPE_FIELDS[platform][0]) or "")
+        if restored or self.duplicate_index.match(group, text):
+            attempts = self.dedupe_attempts.get((platform, row), 0)
+            if not restored and self.dedupe_budget > 0 and attempts < MAX_DEDUPE_ATTEMPTS:
+                self.dedupe_budget -= 1
+                self.dedupe_attempts[(platform, row)] = attempts + 1
+                return label
+            self.kept_duplicates += 1
+        self.duplicate_index.add(group, row, text, label)
+        return None
+
+    def _accept_generation(self, executor, kind, platform, index, payload, source, generated_data):
+        self.status_updater(f"Generated content for {platform.capitalize()} ({prompt_label(payload)}).")
+        group = (platform, payload.get("objective_type", "N/A"))
+        versions = dict(zip(prompt_rows(payload, index), payload.get("versions") or [payload.get("version", 1)]))
+        originals = {row: self.slots[platform][row] for row in versions} if kind == "regenerate" else {}
+        duplicates = []
+        for row, generated in fill_result_rows(self.slots[platform], payload, index, generated_data):
+            restored = kind == "regenerate" and not generated
+            if restored: # The regeneration failed, so keep the earlier draft
+                self.slots[platform][row], generated = originals[row], True
+            if generated and self.dedupe and platform in DEDUPE_FIELDS:
+                label = self._duplicate_label(platform, row, group, restored)
+                if label is not None:
+                    duplicates.append((row, versions[row], label))
+                    continue
+            self._accept(platform, row, generated)
+        if duplicates:
+            self._regenerate(executor, platform, index, source, duplicates)
+        self.calls_left[platform] -= 1
+        if self.calls_left[platform] == 0 and self.held_problems[platform]:
+            self._submit_repair(executor, platform)
+
+    def _submit_repair(self, executor, platform):
+        """Rewrites every held-back field of a platform that breaks its limits in one call."""
+        problems = [problem for row in sorted(self.held_problems[platform]) for problem in self.held_problems[platform][row]]
+        self.status_updater(f"Repairing {len(problems)} fields that break {platform.capitalize()} limits in one call...")
+        future = self._submit_call(
+            executor, platform, build_repair_prompt(platform, self.slots[platform], problems), f"{platform} repair",
+            "repair", repair_expected_tokens(problems), REPAIR_RESPONSE_FORMAT, task="repair"
+        )
+        self.pending[future] = ("repair", platform, None, problems, None)
+        self.total_api_calls += 1
@@ -0,0 +1,289 @@
+import json
+import os
+import re
+import time
+import uuid
+from openai import OpenAI
+
+from ai_content_generator import DEFAULT_MODEL, fill_result_rows, prompt_rows
+from completion_cache import (
+    CACHE_DIR, JSON_RESPONSE_FORMAT, cached_completion_content, completion_cache_key, get_completion_cache
+)
+from reporting import get_reporter
+
+# Batch input files and run manifests are kept here so a batch can be resumed later by its ID.
+BATCH_DIR = os.path.join(CACHE_DIR, "batches")
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL_SECONDS = 30
+
+# Terminal states reported by the Batch API
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+MAX_REPORTED_FAILURES = 5 # custom_ids listed in a failure message
+
+
+def _custom_id(platform, prompt_obj):
+    """Stable, human-readable custom_id for a prompt slot, e.g. 'linkedin-v3-demand_gen' or 'email-v1_10'."""
+    parts = [platform]
+    versions = prompt_obj.get("versions")
+    if versions:
+        parts.append(f"v{versions[0]}" if len(versions) == 1 else f"v{versions[0]}_{versions[-1]}")
+    elif prompt_obj.get("version") is not None:
+        parts.append(f"v{prompt_obj['version']}")
+    objective = prompt_obj.get("objective_type")
+    if objective:
+        parts.append(re.sub(r'[^a-z0-9]+', '_', objective.lower()).strip('_'))
+    return "-".join(parts)
+
+
+def build_batch_requests(all_prompts_dict, model=DEFAULT_MODEL):
+    """
+    Flattens the compiled prompt set into Batch API request lines.
+    Returns (requests, slots) where `slots` records where each custom_id belongs in the results dict.
+    """
+    requests_list = []
+    slots = []
+    for platform, prompts_list_or_str in all_prompts_dict.items():
+        if platform == "reasoning":
+            # This is a single prompt string
+            prompt_objs = [{"type": "reasoning", "prompt": prompts_list_or_str}] if prompts_list_or_str else []
+        else:
+            prompt_objs = prompts_list_or_str
+
+        for index, prompt_obj in enumerate(prompt_objs):
+            custom_id = _custom_id(platform, prompt_obj)
+            requests_list.append({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": model,
+                    "messages": [{"role": "user", "content": prompt_obj["prompt"]}],
+                    "response_format": JSON_RESPONSE_FORMAT
+                }
+            })
+            slot = {key: value for key, value in prompt_obj.items() if key != "prompt"}
+            slot.update({"custom_id": custom_id, "platform": platform, "index": index})
+            slots.append(slot)
+    return requests_list, slots
+
+
+def write_batch_file(requests_list, path):
+    """Writes Batch API request lines to a JSONL file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests_list:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return path
+
+
+def _manifest_path(batch_id, batch_dir):
+    return os.path.join(batch_dir, f"{batch_id}.json")
+
+
+def load_batch_manifest(batch_id, batch_dir=BATCH_DIR):
+    """Loads the manifest saved when the batch was submitted."""
+    with open(_manifest_path(batch_id, batch_dir), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def submit_prompts_batch(all_prompts_dict, openai_client: OpenAI, model=DEFAULT_MODEL, batch_dir=BATCH_DIR,
+                         metadata=None, use_cache=True):
+    """
+    Writes the compiled prompts to a JSONL batch file, uploads it and creates a batch job.
+    Prompts already in the completion cache are resolved locally and left out of the batch.
+    Returns the batch ID (or a local ID if every prompt was cached). `metadata` is stored in
+    the manifest so the run can be turned into a workbook later.
+    """
+    requests_list, slots = build_batch_requests(all_prompts_dict, model)
+
+    cache = get_completion_cache()
+    cached_content = {}
+    pending_requests = []
+    for request in requests_list:
+        content = None
+        if use_cache:
+            body = request["body"]
+            content = cache.get(completion_cache_key(model, body["messages"][0]["content"], body["response_format"]))
+        if content is not None:
+            cached_content[request["custom_id"]] = content
+        else:
+            pending_requests.append(request)
+
+    run_id = uuid.uuid4().hex[:12]
+    batch_id = f"local-{run_id}"
+    input_path = None
+    if pending_requests:
+        input_path = write_batch_file(pending_requests, os.path.join(batch_dir, f"{run_id}_input.jsonl"))
+        with open(input_path, "rb") as f:
+            input_file = openai_client.files.create(file=f, purpose="batch")
+        batch = openai_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+            metadata={"run_id": run_id}
+        )
+        batch_id = batch.id
+
+    manifest = {
+        "batch_id": batch_id,
+        "run_id": run_id,
+        "model": model,
+        "created_at": time.time(),
+        "input_path": input_path,
+        "slots": slots,
+        "prompts": {r["custom_id"]: r["body"]["messages"][0]["content"] for r in requests_list},
+        "cached_content": cached_content,
+        "use_cache": use_cache,
+        "metadata": metadata or {}
+    }
+    os.makedirs(batch_dir, exist_ok=True)
+    with open(_manifest_path(batch_id, batch_dir), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return batch_id
+
+
+def get_batch_status(openai_client: OpenAI, batch_id):
+    """Returns (status, completed_count, total_count) for a batch."""
+    if batch_id.startswith("local-"): # Fully served from cache, nothing was submitted
+        return "completed", 0, 0
+    batch = openai_client.batches.retrieve(batch_id)
+    counts = batch.request_counts
+    return batch.status, (counts.completed + counts.failed) if counts else 0, counts.total if counts else 0
+
+
+def wait_for_batch(openai_client: OpenAI, batch_id, poll_interval=BATCH_POLL_INTERVAL_SECONDS, timeout=None,
+                   progress_bar_updater=None, status_updater=None):
+    """Polls a batch until it reaches a final status or `timeout` seconds pass. Returns the last status."""
+    start = time.monotonic()
+    while True:
+        status, done, total = get_batch_status(openai_client, batch_id)
+        if status_updater:
+            status_updater(f"Batch {batch_id}: {status} ({done}/{total} requests)")
+        if progress_bar_updater and total:
+            progress_bar_updater(done / total)
+        if status in BATCH_FINAL_STATUSES:
+            return status
+        if timeout is not None and time.monotonic() - start >= timeout:
+            return status
+        time.sleep(poll_interval)
+
+
+def _read_output_file(openai_client, file_id):
+    """Downloads a batch output/error file and returns its JSONL lines as dicts."""
+    if not file_id:
+        return []
+    text = openai_client.files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _line_error(line):
+    """Error message of a failed batch output/error line, or None if it succeeded."""
+    response = line.get("response") or {}
+    if not line.get("error") and response.get("status_code") == 200:
+        return None
+    error = line.get("error") or (response.get("body") or {}).get("error") or {}
+    return error.get("message") or f"status {response.get('status_code')}"
+
+
+def _describe_failures(failures):
+    listed = ", ".join(f"{custom_id} ({message})" for custom_id, message in list(failures.items())[:MAX_REPORTED_FAILURES])
+    more = len(failures) - MAX_REPORTED_FAILURES
+    return listed + (f" and {more} more" if more > 0 else "")
+
+
+def collect_batch_results(openai_client: OpenAI, batch_id, batch_dir=BATCH_DIR, reporter=None, retry_failed=True):
+    """
+    Downloads the output of a finished batch and maps it back into the `results` dict shape
+    that `create_excel_file` expects. Successful completions are also written to the
+    completion cache. Requests that failed in the batch (error file lines or non-200 output lines)
+    are reported to `reporter` and, with `retry_failed`, re-run through the synchronous path;
+    requests missing from the output (e.g. an expired batch) are reported. Returns (results, manifest).
+    """
+    reporter = get_reporter(reporter)
+    manifest = load_batch_manifest(batch_id, batch_dir)
+    contents = dict(manifest.get("cached_content", {}))
+
+    if not batch_id.startswith("local-"):
+        batch = openai_client.batches.retrieve(batch_id)
+        cache = get_completion_cache()
+        failures = {}
+        lines = _read_output_file(openai_client, batch.output_file_id) + _read_output_file(openai_client, batch.error_file_id)
+        for line in lines:
+            error = _line_error(line)
+            if error is not None:
+                failures[line.get("custom_id")] = error
+                continue
+            content = line["response"]["body"]["choices"][0]["message"]["content"]
+            contents[line["custom_id"]] = content
+            prompt = manifest["prompts"].get(line["custom_id"])
+            if prompt is not None and content is not None:
+                try:
+                    json.loads(content)
+                    cache.set(completion_cache_key(manifest["model"], prompt, JSON_RESPONSE_FORMAT), content, manifest["model"])
+                except json.JSONDecodeError:
+                    pass
+
+        if failures:
+            action = "retrying them one by one" if retry_failed else "they are left as placeholders"
+            reporter.warning(f"{len(failures)} batch requests failed: {_describe_failures(failures)}; {action}.")
+            for custom_id in failures if retry_failed else []:
+                prompt = manifest["prompts"].get(custom_id)
+                if prompt is None:
+                    continue
+                try:
+                    contents[custom_id] = cached_completion_content(openai_client, manifest["model"], prompt,
+                                                                    use_cache=manifest.get("use_cache", True),
+                                                                    usage_label=f"batch retry {custom_id}")
+                except Exception as e:
+                    reporter.error(f"Retry of batch request {custom_id} failed: {e}")
+        missing = [custom_id for custom_id in manifest["prompts"] if custom_id not in contents and custom_id not in failures]
+        if missing:
+            reporter.warning(f"{len(missing)} batch requests have no result (batch {batch.status}): "
+                             f"{', '.join(missing[:MAX_REPORTED_FAILURES])}{' ...' if len(missing) > MAX_REPORTED_FAILURES else ''}.")
+
+    return map_batch_contents_to_results(manifest["slots"], contents), manifest
+
+
+def map_batch_contents_to_results(slots, contents):
+    """Builds the `results` dict from raw completion content keyed by custom_id, in slot order."""
+    results = {"email": [], "linkedin": [], "facebook": [], "google_search": [], "google_display": [], "reasoning": None}
+    platform_slots = {}
+    for slot in slots:
+        platform_slots.setdefault(slot["platform"], []).append(slot)
+
+    for platform, platform_slot_list in platform_slots.items():
+        if platform != "reasoning":
+            results[platform] = [None] * (max(max(prompt_rows(slot, slot["index"])) for slot in platform_slot_list) + 1)
+        for slot in platform_slot_list:
+            generated_data = None
+            content = contents.get(slot["custom_id"])
+            if content is not None:
+                try:
+                    generated_data = json.loads(content)
+                except json.JSONDecodeError:
+                    generated_data = None
+
+            if platform == "reasoning":
+                if generated_data:
+                    results["reasoning"] = generated_data
+                continue
+            fill_result_rows(results[platform], slot, slot["index"], generated_data)
+    return results
+
+
+def generate_all_content_batch(all_prompts_dict, openai_client: OpenAI, progress_bar_updater, status_updater,
+                               model=DEFAULT_MODEL, batch_dir=BATCH_DIR, poll_interval=BATCH_POLL_INTERVAL_SECONDS,
+                               timeout=None, use_cache=True, reporter=None):
+    """
+    Batch-mode counterpart of `generate_all_content`: submits, polls until done and returns
+    the results dict. Returns None if the batch did not complete within `timeout`.
+    """
+    batch_id = submit_prompts_batch(all_prompts_dict, openai_client, model, batch_dir, use_cache=use_cache)
+    status_updater(f"Submitted batch {batch_id}.")
+    status = wait_for_batch(openai_client, batch_id, poll_interval, timeout, progress_bar_updater, status_updater)
+    if status not in BATCH_FINAL_STATUSES:
+        return None
+    results, _ = collect_batch_results(openai_client, batch_id, batch_dir, reporter=reporter)
+    progress_bar_updater(1)
+    return results
@@ -0,0 +1,66 @@
+"""
+Compares the BeautifulSoup extraction path (scraper.html_to_text) with the streaming,
+size-capped extractor (html_extractor) on large synthetic marketing pages.
+
+Run from the repository root:
+    python benchmarks/bench_html_extraction.py [--memory]
+
+--memory also reports peak Python allocations via tracemalloc (much slower for BeautifulSoup).
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extractor import extract_text_streaming, MAX_HTML_BYTES, MAX_TEXT_CHARS
+from scraper import html_to_text
+
+SECTION = (
+    "<section><h2>Why teams choose Acme</h2><p>Acme helps <b>mid-market</b> retailers forecast demand, "
+    "automate replenishment and cut stock-outs by up to 30%.</p><ul><li>Real-time dashboards</li>"
+    "<li>Native ERP integrations</li><li>SOC 2 Type II</li></ul></section>"
+    "<script>window.dataLayer=window.dataLayer||[];dataLayer.push({'event':'view'});</script>"
+    "<aside>Related posts</aside>"
+)
+
+
+def build_page(target_bytes):
+    """Builds an HTML page of roughly `target_bytes` with nav/footer chrome and repeated sections."""
+    head = "<html><head><style>body{font-family:sans-serif}</style></head><body><nav>Home About Pricing</nav>"
+    tail = "<footer>(c) Acme</footer></body></html>"
+    repeats = max(1, (target_bytes - len(head) - len(tail)) // len(SECTION))
+    return (head + SECTION * repeats + tail).encode("utf-8")
+
+
+def _chunks(content, size=64 * 1024):
+    return (content[i:i + size] for i in range(0, len(content), size))
+
+
+def measure(label, func, track_memory=False):
+    start = time.perf_counter()
+    text = func()
+    elapsed = time.perf_counter() - start
+    line = f"  {label:<28} {elapsed * 1000:9.1f} ms   {len(text):>10,} chars"
+    if track_memory: # Separate pass so tracing overhead doesn't distort the timing
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"   peak {peak / 1024 / 1024:8.1f} MB"
+    print(line)
+
+
+def main():
+    track_memory = "--memory" in sys.argv
+    for size_mb in (1, 4, 8):
+        page = build_page(size_mb * 1024 * 1024)
+        print(f"Page of {len(page) / 1024 / 1024:.1f} MB")
+        measure("BeautifulSoup (full tree)", lambda: html_to_text(page), track_memory)
+        measure("streaming (uncapped)", lambda: extract_text_streaming(_chunks(page), max_bytes=len(page), max_chars=len(page), keep_raw=False)["text"], track_memory)
+        measure("streaming (default caps)", lambda: extract_text_streaming(_chunks(page), MAX_HTML_BYTES, MAX_TEXT_CHARS, keep_raw=False)["text"], track_memory)
+
+
+if __name__ == "__main__":
+    main()
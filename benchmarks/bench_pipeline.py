@@ -0,0 +1,281 @@
+"""
+End-to-end pipeline benchmark against a local mock OpenAI server and fixture website, so throughput
+can be measured without API spend or live sites (see mock_openai_server.py and fixture_site.py).
+
+Times each stage: scrape (crawl), PDF/PPTX extraction, key info extraction, generate_all_content and
+create_excel_file (plus the streaming writer the app uses). Reports wall time, calls/sec (OpenAI calls,
+or pages/documents for the non-AI stages), retries and peak Python memory (tracemalloc), and compares
+them with the stored baseline for the scenario in baselines.json.
+
+Run from the repository root:
+    python benchmarks/bench_pipeline.py [--latency-ms 200] [--error-rate 0.02] [--rate-limit-rate 0.02]
+    python benchmarks/bench_pipeline.py --save-baseline      # record the current numbers for the scenario
+
+Exits with status 1 if any stage regressed by more than --tolerance. Baselines are machine-specific;
+re-save them on the machine that runs the comparison.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+# Fresh, throwaway on-disk caches, so every stage does its full work
+os.environ["CONTENT_CACHE_DIR"] = tempfile.mkdtemp(prefix="ad_content_bench_")
+
+from openai import OpenAI
+
+from ai_content_generator import MAX_CONCURRENT_REQUESTS, compile_all_prompts, generate_all_content
+from excel_formatter import create_excel_file, create_excel_file_streaming
+from fixture_site import FixtureSite
+from mock_openai_server import MockOpenAIServer
+from rate_limiter import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, RateLimiter
+from reporting import Reporter
+from resilience import resilience_stats
+from scraper import extract_key_info_from_text
+from site_crawler import crawl_site
+from utils import extract_text_from_upload
+
+BASELINES_PATH = os.path.join(BENCH_DIR, "baselines.json")
+DEFAULT_TOLERANCE = 0.25 # A stage regresses when it is 25% slower, 25% less throughput or 25% more memory
+MIN_WALL_DELTA_SECONDS = 0.05 # Ignore slowdowns smaller than this; short stages are mostly noise
+MIN_MEMORY_DELTA_MB = 2.0
+MODEL = "gpt-4o-mini"
+STAGES = ["scrape", "documents", "key_info", "generate", "excel", "excel_streaming"]
+
+
+def _serve(server_class, kwargs, urls):
+    server = server_class(**kwargs)
+    urls.put(server.base_url)
+    server.serve_forever()
+
+
+def start_server(server_class, **kwargs):
+    """Runs a fixture server in a child process so its allocations don't count towards peak memory."""
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(server_class, kwargs, urls), daemon=True)
+    process.start()
+    return process, urls.get(timeout=60)
+
+
+def mock_stats(api_base_url):
+    return requests.get(api_base_url.rsplit("/v1", 1)[0] + "/stats", timeout=10).json()
+
+
+def measure(func, calls=None):
+    """Runs `func` under tracemalloc. `calls(result)` counts the work done, for the calls/sec column."""
+    retries_before = resilience_stats()["retries"]
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = calls(result) if calls else 0
+    return result, {
+        "wall_seconds": round(elapsed, 4),
+        "calls": count,
+        "calls_per_second": round(count / elapsed, 2) if elapsed and count else 0.0,
+        "retries": resilience_stats()["retries"] - retries_before,
+        "peak_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+def run_once(args, site_url, api_base_url):
+    client = OpenAI(api_key="benchmark", base_url=api_base_url, max_retries=0)
+    reporter = Reporter("benchmark")
+    results = {}
+
+    crawl, results["scrape"] = measure(
+        lambda: crawl_site(site_url + "/", max_pages=args.pages, use_cache=False),
+        lambda crawl_result: len(crawl_result["pages"])
+    )
+
+    documents = {name: requests.get(f"{site_url}/{name}", timeout=30).content for name in ("whitepaper.pdf", "deck.pptx")}
+
+    def extract_documents():
+        return [extract_text_from_upload(io.BytesIO(content), name) for name, content in documents.items()]
+
+    document_texts, results["documents"] = measure(extract_documents, len)
+    # The whitepaper is read as additional material (key info), the deck is the downloadable material
+    combined_context = crawl["text"] + "\n\n--- Additional Material ---\n" + document_texts[0]
+
+    def ai_calls(_):
+        return mock_stats(api_base_url)["requests"] - requests_before
+
+    requests_before = mock_stats(api_base_url)["requests"]
+    company_info, results["key_info"] = measure(
+        lambda: extract_key_info_from_text(combined_context, client, MODEL, use_cache=False, reporter=reporter,
+                                           rate_limiter=RateLimiter(args.rpm, args.tpm),
+                                           chunked=not args.truncate_key_info_context),
+        ai_calls
+    )
+
+    all_prompts = compile_all_prompts(
+        company_info, "Demo Booking", f"{site_url}/contact", document_texts[1], f"{site_url}/deck.pptx",
+        args.pieces, combined_context, multi_item=args.multi_item, prefix_cache=args.prefix_cache
+    )
+    rate_limiter = RateLimiter(args.rpm, args.tpm)
+    requests_before = mock_stats(api_base_url)["requests"]
+    content_data, results["generate"] = measure(
+        lambda: generate_all_content(all_prompts, client, lambda value: None, lambda message: None, MODEL,
+                                     max_concurrency=args.max_concurrency, rate_limiter=rate_limiter,
+                                     use_cache=False, reporter=reporter),
+        ai_calls
+    )
+
+    company_name = company_info.get("company_name")
+    _, results["excel"] = measure(lambda: create_excel_file(content_data, company_name, "Demo Booking", company_info))
+    _, results["excel_streaming"] = measure(
+        lambda: create_excel_file_streaming(content_data, company_name, "Demo Booking", company_info)
+    )
+    return results
+
+
+def summarize(runs):
+    """Median wall time and throughput across runs; the highest peak memory seen."""
+    summary = {}
+    for stage in STAGES:
+        samples = [run[stage] for run in runs]
+        summary[stage] = {
+            "wall_seconds": round(statistics.median(s["wall_seconds"] for s in samples), 4),
+            "calls": samples[0]["calls"],
+            "calls_per_second": round(statistics.median(s["calls_per_second"] for s in samples), 2),
+            "retries": max(s["retries"] for s in samples),
+            "peak_mb": max(s["peak_mb"] for s in samples),
+        }
+    summary["total"] = {"wall_seconds": round(sum(summary[stage]["wall_seconds"] for stage in STAGES), 4)}
+    return summary
+
+
+def find_regressions(summary, baseline, tolerance):
+    regressions = []
+    for stage, current in summary.items():
+        previous = baseline.get(stage)
+        if not previous:
+            continue
+        wall_delta = current["wall_seconds"] - previous["wall_seconds"]
+        if wall_delta > MIN_WALL_DELTA_SECONDS and current["wall_seconds"] > previous["wall_seconds"] * (1 + tolerance):
+            regressions.append(f"{stage}: wall time {previous['wall_seconds']}s -> {current['wall_seconds']}s")
+        if previous.get("calls_per_second") and current["calls_per_second"] < previous["calls_per_second"] * (1 - tolerance):
+            regressions.append(f"{stage}: {previous['calls_per_second']} -> {current['calls_per_second']} calls/s")
+        if "peak_mb" in previous and current["peak_mb"] - previous["peak_mb"] > MIN_MEMORY_DELTA_MB \
+                and current["peak_mb"] > previous["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{stage}: peak memory {previous['peak_mb']} MB -> {current['peak_mb']} MB")
+    return regressions
+
+
+def _change(current, previous):
+    if not previous:
+        return ""
+    return f"{(current - previous) / previous:+.0%}"
+
+
+def print_report(summary, baseline):
+    print(f"  {'stage':<16} {'wall':>9} {'vs base':>8} {'calls':>6} {'calls/s':>9} {'retries':>8} {'peak MB':>9} {'vs base':>8}")
+    for stage in STAGES:
+        current, previous = summary[stage], baseline.get(stage, {})
+        print(f"  {stage:<16} {current['wall_seconds']:8.3f}s {_change(current['wall_seconds'], previous.get('wall_seconds')):>8} "
+              f"{current['calls']:>6} {current['calls_per_second']:>9.1f} {current['retries']:>8} "
+              f"{current['peak_mb']:>9.1f} {_change(current['peak_mb'], previous.get('peak_mb')):>8}")
+    total, previous_total = summary["total"]["wall_seconds"], baseline.get("total", {}).get("wall_seconds")
+    print(f"  {'total':<16} {total:8.3f}s {_change(total, previous_total):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local mock OpenAI server and fixture site.")
+    parser.add_argument("--scenario", default="default", help="Baseline name to compare with / save under")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median is reported")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--overlong-rate", type=float, default=0.0,
+                        help="Share of mock replies whose copy breaks its limits (exercises the repair calls)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with mock 429s")
+    parser.add_argument("--pages", type=int, default=8, help="Pages on the fixture site (all are crawled)")
+    parser.add_argument("--page-kb", type=int, default=256)
+    parser.add_argument("--pdf-pages", type=int, default=40)
+    parser.add_argument("--pptx-slides", type=int, default=20)
+    parser.add_argument("--pieces", type=int, default=5, help="num_content_pieces")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENT_REQUESTS)
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Client-side requests/min budget")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TOKENS_PER_MINUTE, help="Client-side tokens/min budget")
+    parser.add_argument("--multi-item", action="store_true")
+    parser.add_argument("--prefix-cache", action="store_true")
+    parser.add_argument("--truncate-key-info-context", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the scenario's baseline")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    config = {name: value for name, value in vars(args).items()
+              if name not in ("scenario", "repeat", "tolerance", "save_baseline", "json")}
+    site_process, site_url = start_server(FixtureSite, pages=args.pages, page_kb=args.page_kb,
+                                          pdf_pages=args.pdf_pages, pptx_slides=args.pptx_slides)
+    api_process, api_base_url = start_server(MockOpenAIServer, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                             error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                                             retry_after_seconds=args.retry_after, overlong_rate=args.overlong_rate, seed=0)
+    try:
+        runs = []
+        for run in range(args.repeat):
+            runs.append(run_once(args, site_url, api_base_url))
+            print(f"Run {run + 1}/{args.repeat}: {sum(runs[-1][stage]['wall_seconds'] for stage in STAGES):.2f}s")
+        server_stats = mock_stats(api_base_url)
+    finally:
+        site_process.terminate()
+        api_process.terminate()
+        shutil.rmtree(os.environ["CONTENT_CACHE_DIR"], ignore_errors=True)
+
+    summary = summarize(runs)
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, encoding="utf-8") as f:
+            baselines = json.load(f)
+    stored = baselines.get(args.scenario, {})
+    baseline = stored.get("stages", {})
+
+    print(f"\nScenario '{args.scenario}' (median of {args.repeat}; mock server: {server_stats['requests']} requests, "
+          f"{server_stats['errors']} errors, {server_stats['rate_limited']} rate limited, {server_stats['overlong']} overlong)")
+    if stored and stored.get("config") != config:
+        print("  Note: the baseline was recorded with different settings; comparisons may not be meaningful.")
+    print_report(summary, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"scenario": args.scenario, "config": config, "stages": summary, "server": server_stats}, f, indent=2)
+
+    if args.save_baseline:
+        baselines[args.scenario] = {"config": config, "stages": summary, "recorded_at": time.strftime("%Y-%m-%d")}
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nSaved baseline '{args.scenario}' to {BASELINES_PATH}")
+        return
+    if not baseline:
+        print(f"\nNo baseline for '{args.scenario}' yet; record one with --save-baseline.")
+        return
+
+    regressions = find_regressions(summary, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Local fixture website for benchmarks: a sitemap, large marketing pages and generated PDF/PPTX downloads.
+
+Standalone:
+    python benchmarks/fixture_site.py --port 8012 --pages 8 --page-kb 512
+"""
+import argparse
+import io
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pptx import Presentation
+from pptx.util import Inches
+
+SECTION = (
+    "<section><h2>Why teams choose Acme</h2><p>Acme helps <b>mid-market</b> retailers forecast demand, "
+    "automate replenishment and cut stock-outs by up to 30%. Our platform connects to your ERP in days, "
+    "not months, and gives planners one view of inventory across every store.</p><ul><li>Real-time dashboards</li>"
+    "<li>Native ERP integrations</li><li>SOC 2 Type II</li></ul></section>"
+    "<script>window.dataLayer=window.dataLayer||[];dataLayer.push({'event':'view'});</script>"
+)
+PAGE_NAMES = ["about", "pricing", "products", "customers", "integrations", "security", "careers", "blog",
+              "partners", "resources", "support", "contact"]
+PDF_LINE = "Demand forecasting whitepaper: how mid-market retailers cut stock-outs by 30 percent."
+
+
+def build_page(title, target_bytes, links=()):
+    """An HTML page of roughly `target_bytes` with nav/footer chrome, links and repeated sections."""
+    nav = "".join(f'<a href="/{name}">{name.title()}</a> ' for name in links)
+    head = f"<html><head><title>{title}</title><style>body{{font-family:sans-serif}}</style></head><body><nav>{nav}</nav><h1>{title}</h1>"
+    tail = "<footer>(c) Acme Analytics</footer></body></html>"
+    repeats = max(1, (target_bytes - len(head) - len(tail)) // len(SECTION))
+    return (head + SECTION * repeats + tail).encode("utf-8")
+
+
+def build_pdf(num_pages, lines_per_page=40):
+    """A minimal multi-page text PDF (Helvetica, compressed content streams) that PyPDF2 can read."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for page in range(num_pages):
+        page_id, content_id = 4 + page * 2, 5 + page * 2
+        lines = [f"({PDF_LINE} Page {page + 1}, line {line + 1}.) Tj T*" for line in range(lines_per_page)]
+        stream = zlib.compress(("BT /F1 9 Tf 11 TL 36 800 Td " + " ".join(lines) + " ET").encode("latin-1"))
+        objects[content_id] = b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), num_pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = out.tell()
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id]))
+    xref = out.tell()
+    size = max(objects) + 1
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+    for object_id in range(1, size):
+        out.write(b"%010d 00000 n \n" % offsets[object_id])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+    return out.getvalue()
+
+
+def build_pptx(num_slides):
+    """A deck with a title and a few bullet text boxes per slide."""
+    deck = Presentation()
+    for slide_number in range(num_slides):
+        slide = deck.slides.add_slide(deck.slide_layouts[1])
+        slide.shapes.title.text = f"Acme forecasting, part {slide_number + 1}"
+        slide.placeholders[1].text = "\n".join(f"{PDF_LINE} Point {point + 1}." for point in range(6))
+        box = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(8), Inches(1))
+        box.text_frame.text = f"Speaker note {slide_number + 1}: customers see ROI within one quarter."
+    out = io.BytesIO()
+    deck.save(out)
+    return out.getvalue()
+
+
+class FixtureSite(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), pages=8, page_kb=512, pdf_pages=40, pptx_slides=20):
+        super().__init__(address, FixtureSiteHandler)
+        links = PAGE_NAMES[:max(0, pages - 1)]
+        self.documents = {"/": ("text/html", build_page("Acme Analytics", page_kb * 1024, links))}
+        for name in links:
+            self.documents[f"/{name}"] = ("text/html", build_page(name.title(), page_kb * 1024, links))
+        self.documents["/whitepaper.pdf"] = ("application/pdf", build_pdf(pdf_pages))
+        self.documents["/deck.pptx"] = ("application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                                        build_pptx(pptx_slides))
+        self.documents["/robots.txt"] = ("text/plain", b"User-agent: *\nAllow: /\n")
+        self.requests = 0
+        self.requests_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def sitemap(self):
+        urls = "".join(f"<url><loc>{self.base_url}{path}</loc></url>" for path, (kind, _) in self.documents.items()
+                       if kind == "text/html")
+        return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode("utf-8")
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FixtureSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.requests_lock:
+            self.server.requests += 1
+        path = self.path.split("?", 1)[0]
+        status = 200
+        if path == "/sitemap.xml":
+            kind, body = "application/xml", self.server.sitemap()
+        elif path in self.server.documents:
+            kind, body = self.server.documents[path]
+        else:
+            status, kind, body = 404, "text/html", b"<html><body>Not found</body></html>"
+        self.send_response(status)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixture website.")
+    parser.add_argument("--port", type=int, default=8012)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--page-kb", type=int, default=512)
+    args = parser.parse_args()
+    site = FixtureSite(("127.0.0.1", args.port), args.pages, args.page_kb)
+    print(f"Fixture site at {site.base_url}/ (PDF at /whitepaper.pdf, PPTX at /deck.pptx)")
+    site.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
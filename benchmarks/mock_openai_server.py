@@ -0,0 +1,323 @@
+"""
+Local OpenAI-compatible chat completions server for benchmarks and offline runs.
+
+Answers POST /v1/chat/completions with JSON shaped after the prompt's "Output JSON" block (key info,
+single and multi-item ads, Google assets, reasoning, field repairs), after a configurable latency. Copy
+respects the "max N chars" limits in the prompt unless a share of replies is made overlong on purpose,
+to exercise the repair path. A share of requests can fail with 500s or 429s (with Retry-After), to
+exercise the retry and circuit breaker paths.
+POST /v1/files, POST /v1/batches, GET /v1/batches/{id} and GET /v1/files/{id}/content stand in for the
+Batch API: a batch is answered in full when it is created, and a share of its requests (batch_error_rate)
+is written to the batch's error file instead of its output file.
+GET /stats returns the request counters.
+
+Standalone:
+    python benchmarks/mock_openai_server.py --port 8011 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8011/v1 OPENAI_API_KEY=x python pipeline.py companies.csv
+"""
+import argparse
+import email.parser
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = ("Acme helps mid-market retailers forecast demand, automate replenishment and cut stock-outs "
+          "with real-time dashboards and native ERP integrations.")
+# Versions draw their copy from these angles, so a run gets a realistic share of near-duplicates
+ANGLES = [
+    FILLER,
+    "Stop losing weekend sales to empty shelves: planners see every store's stock in one live view.",
+    "Your ERP already has the data. Acme turns it into purchase orders your buyers can approve in one click.",
+    "Retail teams cut excess inventory by a fifth in their first quarter, without adding headcount.",
+    "SOC 2 Type II security and a thirty day rollout mean IT signs off before the pilot even starts.",
+    "Seasonal peaks no longer mean guesswork; machine learning models adjust forecasts every night.",
+    "From spreadsheets to automated replenishment: see how a 200-store chain made the switch.",
+    "Markdowns eat margin. Forecast accurately and order less of what will not sell this season.",
+    "Join operations leaders who review exceptions, not every SKU, thanks to smart alerts.",
+    "Free up working capital tied in slow stock and put it behind the products customers want.",
+    "A guided demo with your own sales history shows the forecast accuracy you can expect.",
+    "Supplier lead times change weekly; Acme recalculates reorder points as soon as they do.",
+]
+HEADLINES = [
+    "Never run out of bestsellers", "Forecasts your buyers trust", "Cut stock-outs by 30%", "Live in 30 days",
+    "Inventory in one live view", "Smarter replenishment", "Less excess, more sales", "Built for mid-market retail",
+    "Plan peaks with confidence", "Your ERP, now predictive", "Fewer markdowns this season", "SOC 2 Type II certified",
+    "See the demo on your data", "Automate purchase orders", "Alerts, not spreadsheets", "Free up working capital",
+    "Nightly model retraining", "Trusted by 200-store chains", "Reorder points that adapt", "Forecast every store",
+]
+
+KEY_INFO_RESPONSE = {
+    "company_name": "Acme Analytics", "tagline": "Forecast with confidence",
+    "mission_statement": "Help retailers never miss a sale.", "industry": "SaaS",
+    "offerings": ["Demand forecasting", "Replenishment automation", "Inventory dashboards"],
+    "USPs": ["Native ERP integrations", "SOC 2 Type II", "Live in 30 days"],
+    "value_proposition": "Fewer stock-outs and less excess inventory.", "target_audience": "Mid-market retail operations teams",
+    "tone_of_voice": "Confident and practical", "CTAs": ["Book a demo", "Start free trial"],
+    "confidence": {"company_name": 1.0, "tagline": 0.9, "mission_statement": 0.5, "industry": 0.9,
+                   "value_proposition": 0.8, "target_audience": 0.8, "tone_of_voice": 0.5},
+}
+
+OUTPUT_BLOCK = re.compile(r"Output JSON:\s*(\{.*)", re.S)
+FIELD = re.compile(r'"(\w+)":')
+FIELD_LIMIT = re.compile(r'"(\w+)": "[^"]*?max (\d+) chars')
+REPAIR_REQUEST = re.compile(r'"id": "([^"]+)",\s*"field": "(\w+)",\s*"max_chars": (\d+|null)')
+VERSION = re.compile(r'"version_number":\s*(\d+)')
+VERSION_RANGE = re.compile(r"(\d+) to (\d+)>")
+EXACT_COUNT = re.compile(r"exactly (\d+) unique, \w+ (headlines|descriptions)")
+
+
+def _text(field, length, angle=FILLER):
+    return f"{angle} ({field.replace('_', ' ')})"[:length]
+
+
+def _seed(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def _item(fields, limits, version, seed, overlong=False):
+    angle = ANGLES[(seed + version) % len(ANGLES)]
+    item = {field: _text(field, 120 if overlong else limits.get(field, 120), angle) for field in fields if field != "items"}
+    item["version_number"] = version
+    return item
+
+
+def mock_completion(request, content):
+    """A chat.completion object for `request` replying with `content`."""
+    prompt = request.get("messages", [{}])[-1].get("content", "")
+    prompt_tokens = len(prompt) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                  "total_tokens": prompt_tokens + len(content) // 4,
+                  "prompt_tokens_details": {"cached_tokens": 0}},
+    }
+
+
+def mock_content(prompt, overlong=False):
+    """Builds a plausible JSON reply for one of the app's prompts. With overlong=True, copy ignores its limits."""
+    if "Extract the following information" in prompt:
+        return dict(KEY_INFO_RESPONSE)
+    if '"fixes"' in prompt:
+        fixes = []
+        for fix_id, field, limit in REPAIR_REQUEST.findall(prompt):
+            pool = HEADLINES if field == "headlines" else ANGLES
+            fixes.append({"id": fix_id, "text": _text(field, int(limit) if limit != "null" else 120, pool[_seed(fix_id) % len(pool)])})
+        return {"fixes": fixes}
+    if "reasoning_statement" in prompt:
+        return {"reasoning_statement": " ".join([FILLER] * 4)}
+    if "Google Search Ad" in prompt or "Google Display Ad" in prompt:
+        counts = {kind: int(n) for n, kind in EXACT_COUNT.findall(prompt)}
+        headlines = [ANGLES[i % len(ANGLES)][:40] if overlong else HEADLINES[i % len(HEADLINES)]
+                     for i in range(counts.get("headlines", 5))]
+        return {"headlines": headlines,
+                "descriptions": [ANGLES[i % len(ANGLES)][:90] for i in range(counts.get("descriptions", 4))]}
+    block = OUTPUT_BLOCK.search(prompt)
+    fields = list(dict.fromkeys(FIELD.findall(block.group(1) if block else "")))
+    limits = {field: int(limit) for field, limit in FIELD_LIMIT.findall(block.group(1) if block else "")}
+    seed = _seed(prompt) # Regenerated prompts carry a diversity hint, so they draw different angles
+    if '"items"' in prompt:
+        match = VERSION_RANGE.search(prompt)
+        first, last = (int(match.group(1)), int(match.group(2))) if match else (1, 1)
+        return {"items": [_item(fields, limits, version, seed, overlong) for version in range(first, last + 1)]}
+    match = VERSION.search(prompt)
+    return _item(fields, limits, int(match.group(1)) if match else 1, seed, overlong)
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency_ms=200, jitter_ms=100, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after_seconds=1, overlong_rate=0.0, batch_error_rate=0.0, max_prompt_chars=None, seed=None):
+        super().__init__(address, MockOpenAIHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.overlong_rate = overlong_rate
+        self.batch_error_rate = batch_error_rate
+        self.max_prompt_chars = max_prompt_chars
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "overlong": 0, "bad_requests": 0}
+        self.files = {} # file id -> uploaded or generated JSONL text
+        self.batches = {} # batch id -> batch object
+        self.stats_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def count(self, outcome):
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats[outcome] += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real API, so client connection pooling is exercised
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_not_found(self):
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.rstrip("/")
+        parts = path.split("/")
+        if path == "/stats": # Request counters, for benchmarks running the server in another process
+            with server.stats_lock:
+                stats = dict(server.stats)
+            self._send_json(200, stats)
+        elif path.startswith("/v1/batches/") and parts[-1] in server.batches:
+            self._send_json(200, server.batches[parts[-1]])
+        elif path.startswith("/v1/files/") and parts[-1] == "content" and parts[-2] in server.files:
+            body = server.files[parts[-2]].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_not_found()
+
+    def _store_file(self, text, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.server.files[file_id] = text
+        return {"id": file_id, "object": "file", "bytes": len(text.encode("utf-8")), "created_at": int(time.time()),
+                "filename": f"{file_id}.jsonl", "purpose": purpose}
+
+    def _upload_file(self, body):
+        """Stores the "file" part of a multipart/form-data upload, as the openai client sends it."""
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8") + body)
+        fields = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                  for part in message.get_payload()}
+        purpose = (fields.get("purpose") or b"batch").decode("utf-8")
+        self._send_json(200, self._store_file(fields["file"].decode("utf-8"), purpose))
+
+    def _create_batch(self, request):
+        """Answers every request of the input file at once, splitting them into an output and an error file."""
+        server = self.server
+        input_text = server.files.get(request.get("input_file_id"))
+        if input_text is None:
+            self._send_json(404, {"error": {"message": "No such input file.", "type": "invalid_request_error"}})
+            return
+        output_lines, error_lines = [], []
+        for line in filter(str.strip, input_text.splitlines()):
+            batch_request = json.loads(line)
+            with server.stats_lock:
+                failed = server.random.random() < server.batch_error_rate
+            if failed:
+                error_lines.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": batch_request["custom_id"],
+                                    "response": None,
+                                    "error": {"code": "server_error", "message": "Internal error (mock)."}})
+                continue
+            body = batch_request["body"]
+            prompt = body.get("messages", [{}])[-1].get("content", "")
+            output_lines.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": batch_request["custom_id"],
+                                 "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                                              "body": mock_completion(body, json.dumps(mock_content(prompt)))},
+                                 "error": None})
+        output_file = self._store_file("".join(json.dumps(line) + "\n" for line in output_lines), "batch_output")
+        error_file = self._store_file("".join(json.dumps(line) + "\n" for line in error_lines), "batch_output") if error_lines else None
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        now = int(time.time())
+        server.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": request.get("endpoint"), "errors": None,
+            "input_file_id": request.get("input_file_id"), "completion_window": request.get("completion_window"),
+            "status": "completed", "output_file_id": output_file["id"], "error_file_id": error_file and error_file["id"],
+            "created_at": now, "completed_at": now,
+            "request_counts": {"total": len(output_lines) + len(error_lines), "completed": len(output_lines),
+                               "failed": len(error_lines)},
+            "metadata": request.get("metadata"),
+        }
+        self._send_json(200, server.batches[batch_id])
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.rstrip("/")
+        if path.endswith("/files"):
+            self._upload_file(body)
+            return
+        request = json.loads(body or b"{}")
+        if path.endswith("/batches"):
+            self._create_batch(request)
+            return
+        if not path.endswith("/chat/completions"):
+            self._send_not_found()
+            return
+
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        if server.max_prompt_chars is not None and len(prompt) > server.max_prompt_chars:
+            server.count("bad_requests")
+            self._send_json(400, {"error": {"message": "This model's maximum context length was exceeded (mock).",
+                                            "type": "invalid_request_error", "code": "context_length_exceeded"}})
+            return
+
+        with server.stats_lock:
+            roll = server.random.random()
+            overlong = server.random.random() < server.overlong_rate
+            delay = max(0.0, server.latency_ms + server.random.uniform(-server.jitter_ms, server.jitter_ms)) / 1000
+        if roll < server.rate_limit_rate:
+            server.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock).", "type": "rate_limit_error"}},
+                            {"Retry-After": str(server.retry_after_seconds)})
+            return
+        time.sleep(delay)
+        if roll < server.rate_limit_rate + server.error_rate:
+            server.count("errors")
+            self._send_json(500, {"error": {"message": "Internal error (mock).", "type": "server_error"}})
+            return
+
+        content = json.dumps(mock_content(prompt, overlong))
+        server.count("ok")
+        if overlong:
+            with server.stats_lock:
+                server.stats["overlong"] += 1
+        self._send_json(200, mock_completion(request, content))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock OpenAI chat completions server.")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument("--overlong-rate", type=float, default=0.0, help="Share of replies whose copy breaks its limits")
+    parser.add_argument("--batch-error-rate", type=float, default=0.0, help="Share of batch requests written to the error file")
+    parser.add_argument("--max-prompt-chars", type=int, default=None, help="Answer longer prompts with a 400 (context length)")
+    args = parser.parse_args()
+    server = MockOpenAIServer(("127.0.0.1", args.port), args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                              overlong_rate=args.overlong_rate, batch_error_rate=args.batch_error_rate,
+                              max_prompt_chars=args.max_prompt_chars)
+    print(f"Mock OpenAI server at {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from model_routing import get_model_stats
+from resilience import call_with_retries, get_breaker, is_retryable
+
+# All on-disk caches live under this directory. Override with CONTENT_CACHE_DIR.
+CACHE_DIR = os.environ.get("CONTENT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ad_content_generator"))
+COMPLETION_CACHE_PATH = os.path.join(CACHE_DIR, "completions.sqlite3")
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600 # Cached completions expire after a week
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024 # Least recently used entries are evicted past 200 MB
+
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+def completion_cache_key(model, prompt, response_format=None):
+    """Content-addressed key: a hash of the model, prompt and response_format."""
+    payload = json.dumps([model, prompt, response_format], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """SQLite-backed cache of raw completion content with TTL and size-bounded LRU eviction."""
+
+    def __init__(self, path=COMPLETION_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, model TEXT, content TEXT, size INTEGER,"
+            " created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Returns cached content for `key`, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, content, model=""):
+        """Stores `content` under `key` and evicts least recently used entries past `max_bytes`."""
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, content, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        """Removes every cached completion."""
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def stats(self):
+        """Returns hit/miss counters and the current entry count and size."""
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_completion_cache():
+    """Returns the process-wide completion cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = CompletionCache()
+        return _default_cache
+
+
+class UsageTracker:
+    """
+    Collects token usage for every completion that went to the network in a run, including
+    prompt tokens the provider served from its prompt cache (usage.prompt_tokens_details.cached_tokens).
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def record(self, label, model, usage, latency_seconds=None, tags=None, wait_seconds=None):
+        """
+        `tags` (e.g. platform and objective) are stored with the call so it can be grouped later.
+        `latency_seconds` is the model's time on the successful attempt; `wait_seconds` is the rest of the
+        call (rate-limiter queueing, retry backoff and failed attempts).
+        """
+        details = getattr(usage, "prompt_tokens_details", None)
+        entry = {
+            "label": label,
+            **(tags or {}),
+            "model": model,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "latency_seconds": round(latency_seconds, 3) if latency_seconds is not None else None,
+            "wait_seconds": round(wait_seconds, 3) if wait_seconds is not None else None,
+        }
+        with self._lock:
+            self.calls.append(entry)
+
+    def summary(self):
+        """Totals across recorded calls, with the share of prompt tokens served from the provider's cache."""
+        with self._lock:
+            calls = list(self.calls)
+        prompt_tokens = sum(call["prompt_tokens"] for call in calls)
+        cached_tokens = sum(call["cached_tokens"] for call in calls)
+        return {
+            "calls": len(calls),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": sum(call["completion_tokens"] for call in calls),
+            "cached_ratio": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+        }
+
+
+def cached_completion_content(openai_client, model, prompt, response_format=JSON_RESPONSE_FORMAT, use_cache=True,
+                              rate_limiter=None, estimated_tokens=0, retry_budget=None, usage_tracker=None, usage_label="",
+                              usage_tags=None, model_task=""):
+    """
+    Returns the message content for a single-prompt chat completion, served from the
+    completion cache when possible. With use_cache=False the cache is bypassed for
+    reads but fresh results still refresh it. Only content that parses as JSON is
+    stored for JSON response formats, so a malformed reply is never replayed.
+    `rate_limiter` is only consulted when the call actually goes to the network. Transient
+    API failures are retried through the shared resilience layer (see resilience.call_with_retries).
+    Token usage of network calls is recorded in `usage_tracker` under `usage_label` and `usage_tags`.
+    The latency and outcome of every network attempt feed the process-wide model stats used for
+    routing (see model_routing), under `model_task` (by default the "platform" usage tag); non-retryable
+    client errors are left out.
+    """
+    cache = get_completion_cache()
+    key = completion_cache_key(model, prompt, response_format)
+    if use_cache:
+        content = cache.get(key)
+        if content is not None:
+            return content
+
+    request_kwargs = {"model": model, "messages": [{"role": "user", "content": prompt}]}
+    if response_format is not None:
+        request_kwargs["response_format"] = response_format
+
+    model_stats = get_model_stats()
+    model_task = model_task or (usage_tags or {}).get("platform", "")
+
+    model_seconds = None
+
+    def timed_completion(): # Timed after the rate limiter's wait, so only the model's latency is measured
+        nonlocal model_seconds
+        attempt_started = time.monotonic()
+        try:
+            response = openai_client.chat.completions.create(**request_kwargs)
+        except Exception as e:
+            if is_retryable(e): # Client errors (bad prompt or request) say nothing about the model's health
+                model_stats.observe(model, model_task, time.monotonic() - attempt_started, ok=False)
+            raise
+        model_seconds = time.monotonic() - attempt_started
+        model_stats.observe(model, model_task, model_seconds)
+        return response
+
+    def create_completion():
+        if rate_limiter is None:
+            return timed_completion()
+        with rate_limiter.request(estimated_tokens): # Every attempt, including retries, spends rate budget
+            return timed_completion()
+
+    started = time.monotonic()
+    response = call_with_retries(create_completion, breaker=get_breaker("openai"), retry_budget=retry_budget)
+    content = response.choices[0].message.content
+    if usage_tracker is not None and getattr(response, "usage", None) is not None:
+        wait_seconds = max(0.0, time.monotonic() - started - model_seconds)
+        usage_tracker.record(usage_label, model, response.usage, model_seconds, usage_tags, wait_seconds=wait_seconds)
+
+    if content is not None:
+        cacheable = True
+        if response_format is not None and response_format.get("type") in ("json_object", "json_schema"):
+            try:
+                json.loads(content)
+            except json.JSONDecodeError:
+                cacheable = False
+        if cacheable:
+            cache.set(key, content, model)
+    return content
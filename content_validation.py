@@ -0,0 +1,192 @@
+import json
+
+from near_duplicates import is_near_duplicate
+
+# Platform limits the prompts ask for. The JSON schemas below pin the structure and list counts;
+# character limits can't be expressed in strict schemas, so they are checked here after each call.
+FIELD_LIMITS = {
+    "linkedin": {"ad_name": 255, "introductory_text": 500, "image_copy": 125, "headline": 70},
+    "facebook": {"ad_name": 255, "primary_text": 500, "image_copy": 125, "headline": 27, "link_description": 27},
+    "google_search": {"headlines": 30, "descriptions": 90},
+    "google_display": {"headlines": 30, "descriptions": 90},
+}
+LIST_COUNTS = {
+    "google_search": {"headlines": 15, "descriptions": 4},
+    "google_display": {"headlines": 5, "descriptions": 5},
+}
+TEXT_FIELDS = {
+    "email": ["objective", "headline", "subject_line", "body", "cta"],
+    "linkedin": ["ad_name", "objective", "introductory_text", "image_copy", "headline", "destination", "cta_button"],
+    "facebook": ["ad_name", "objective", "primary_text", "image_copy", "headline", "link_description", "destination", "cta_button"],
+    "reasoning": ["reasoning_statement"],
+}
+VERSIONED_PLATFORMS = ("email", "linkedin", "facebook")
+
+REPAIR_EXPECTED_TOKENS_PER_FIX = 40
+REPAIR_CONTEXT_CHARS = 200 # Sibling fields shown with each fix, so rewrites stay consistent with the ad
+
+
+def _object_schema(properties):
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def _schema(platform, multi_item=False):
+    if platform in LIST_COUNTS:
+        return _object_schema({
+            field: {"type": "array", "items": {"type": "string", "description": f"At most {FIELD_LIMITS[platform][field]} characters."},
+                    "minItems": count, "maxItems": count}
+            for field, count in LIST_COUNTS[platform].items()
+        })
+    properties = {}
+    if platform in VERSIONED_PLATFORMS:
+        properties["version_number"] = {"type": "integer"}
+    for field in TEXT_FIELDS[platform]:
+        limit = FIELD_LIMITS.get(platform, {}).get(field)
+        properties[field] = {"type": "string", "description": f"At most {limit} characters."} if limit else {"type": "string"}
+    item = _object_schema(properties)
+    return _object_schema({"items": {"type": "array", "items": item}}) if multi_item else item
+
+
+def response_format_for(platform, multi_item=False):
+    """Strict json_schema response_format for one of the generation prompts (multi-item prompts wrap rows in "items")."""
+    return {"type": "json_schema", "json_schema": {
+        "name": f"{platform}_multi" if multi_item else platform, "strict": True, "schema": _schema(platform, multi_item)
+    }}
+
+
+REPAIR_RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {
+    "name": "field_fixes", "strict": True,
+    "schema": _object_schema({"fixes": {"type": "array", "items": _object_schema({"id": {"type": "string"}, "text": {"type": "string"}})}}),
+}}
+
+
+def _is_text(value):
+    return isinstance(value, str) and value.strip() != ""
+
+
+def find_problems(platform, row, row_index):
+    """
+    Checks one result row against its platform's limits and returns the fields that need a rewrite.
+    List fields are normalised in place first: valid items that aren't near-duplicates of an earlier one
+    are kept and surplus items dropped, so only the shortfall (overlong, duplicate or missing entries)
+    is left to repair.
+    Each problem is {"id", "row", "field", "index", "limit", "issue", "value"}.
+    """
+    problems = []
+    limits = FIELD_LIMITS.get(platform, {})
+    for field, count in LIST_COUNTS.get(platform, {}).items():
+        limit = limits[field]
+        items = [item.strip() for item in row.get(field) or [] if _is_text(item)] if isinstance(row.get(field), list) else []
+        valid, overlong = [], []
+        for item in items:
+            if is_near_duplicate(item, valid + overlong): # Repeats and near-copies count as missing
+                continue
+            (valid if len(item) <= limit else overlong).append(item)
+        if len(valid) >= count:
+            row[field] = valid[:count]
+            continue
+        candidates = overlong[:count - len(valid)]
+        row[field] = valid + candidates + [""] * (count - len(valid) - len(candidates))
+        for index in range(len(valid), count):
+            value = row[field][index]
+            problems.append({"id": f"{row_index}.{field}.{index}", "row": row_index, "field": field, "index": index,
+                             "limit": limit, "issue": "too_long" if value else "missing", "value": value})
+
+    for field in TEXT_FIELDS.get(platform, []):
+        value = row.get(field)
+        limit = limits.get(field)
+        if not _is_text(value):
+            problems.append({"id": f"{row_index}.{field}", "row": row_index, "field": field, "index": None,
+                             "limit": limit, "issue": "missing", "value": ""})
+        elif limit and len(value) > limit:
+            problems.append({"id": f"{row_index}.{field}", "row": row_index, "field": field, "index": None,
+                             "limit": limit, "issue": "too_long", "value": value})
+    return problems
+
+
+def _instruction(problem, row):
+    limit_text = f" of at most {problem['limit']} characters" if problem["limit"] else ""
+    if problem["issue"] == "too_long":
+        return f"Shorten to at most {problem['limit']} characters, keeping the message and tone."
+    if problem["index"] is not None:
+        others = [item for item in row[problem["field"]] if item and item != problem["value"]]
+        return f"Write one new {problem['field'][:-1]}{limit_text}, clearly different from: {json.dumps(others, ensure_ascii=False)}."
+    return f"Write the missing {problem['field'].replace('_', ' ')}{limit_text}."
+
+
+def _row_context(platform, row):
+    return {field: row[field][:REPAIR_CONTEXT_CHARS] for field in TEXT_FIELDS.get(platform, [])
+            if _is_text(row.get(field)) and field not in ("ad_name", "destination")}
+
+
+def build_repair_prompt(platform, platform_rows, problems):
+    """One prompt asking for replacements of every failing field of a platform, answered as {"fixes": [...]}."""
+    requests_list = []
+    for problem in problems:
+        request = {"id": problem["id"], "field": problem["field"], "max_chars": problem["limit"],
+                   "instruction": _instruction(problem, platform_rows[problem["row"]])}
+        if problem["value"]:
+            request["current"] = problem["value"]
+        if problem["index"] is None:
+            request["ad"] = _row_context(platform, platform_rows[problem["row"]])
+        requests_list.append(request)
+    return f"""
+    You are an expert ad copy editor. The following fields of {platform.replace('_', ' ').title()} ad copy
+    break the platform's limits. Rewrite each one as instructed, keeping the ad's message, tone and language.
+    Count characters carefully; every text must fit its max_chars.
+    Fields to fix: {json.dumps(requests_list, ensure_ascii=False, indent=2)}
+
+    Output JSON: {{
+      "fixes": [{{"id": "id of the field being fixed", "text": "replacement text"}}]
+    }}
+    Return exactly one fix per id. Provide ONLY the JSON object.
+    """
+
+
+def repair_expected_tokens(problems):
+    return max(200, REPAIR_EXPECTED_TOKENS_PER_FIX * len(problems))
+
+
+def apply_repairs(platform_rows, problems, repair_data):
+    """Writes replacement texts from a repair response into the rows. Returns the number of fields replaced."""
+    fixes = repair_data.get("fixes") if isinstance(repair_data, dict) else None
+    by_id = {fix.get("id"): fix.get("text") for fix in fixes if isinstance(fix, dict)} if isinstance(fixes, list) else {}
+    replaced = 0
+    for problem in problems:
+        text = by_id.get(problem["id"])
+        if not _is_text(text):
+            continue
+        row = platform_rows[problem["row"]]
+        if problem["index"] is None:
+            row[problem["field"]] = text.strip()
+        else:
+            row[problem["field"]][problem["index"]] = text.strip()
+        replaced += 1
+    return replaced
+
+
+def _truncate(text, limit):
+    """Cuts text to `limit` characters at a word boundary where possible."""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit + 1].rsplit(" ", 1)[0] if " " in text[:limit + 1] else text[:limit]
+    return cut[:limit].rstrip(" ,;:-")
+
+
+def enforce_limits(platform, row):
+    """
+    Last resort once repair is spent: truncates anything still over its limit and drops empty list entries.
+    Returns descriptions of what is still wrong (short lists, missing fields) for a warning.
+    """
+    remaining = []
+    for problem in find_problems(platform, row, 0):
+        if problem["issue"] == "too_long":
+            if problem["index"] is None:
+                row[problem["field"]] = _truncate(problem["value"], problem["limit"])
+            else:
+                row[problem["field"]][problem["index"]] = _truncate(problem["value"], problem["limit"])
+        else:
+            remaining.append(f"{problem['field']} missing" if problem["index"] is None else f"{problem['field']} short")
+    for field in LIST_COUNTS.get(platform, {}):
+        row[field] = [item for item in row[field] if item]
+    return sorted(set(remaining))
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from completion_cache import CACHE_DIR
+from utils import (
+    MAX_DOCUMENT_CHARS, MAX_PDF_PAGES, PDF_EXTRACTOR_VERSION, PPTX_EXTRACTOR_VERSION,
+    extract_text_from_upload, get_file_extension
+)
+
+DOCUMENT_CACHE_PATH = os.path.join(CACHE_DIR, "documents.sqlite3")
+
+DEFAULT_MEMORY_ENTRIES = 32 # Extracted texts kept in process memory
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024 # Least recently used texts are evicted from disk past 200 MB
+
+EXTRACTOR_VERSIONS = {"pdf": PDF_EXTRACTOR_VERSION, "pptx": PPTX_EXTRACTOR_VERSION}
+
+
+def document_cache_key(file_obj, filename):
+    """Hash of the file bytes plus the extractor version and limits that shaped its text."""
+    ext = get_file_extension(filename)
+    digest = hashlib.sha256()
+    digest.update(f"{ext}:{EXTRACTOR_VERSIONS.get(ext, 0)}:{MAX_PDF_PAGES}:{MAX_DOCUMENT_CHARS}:".encode("utf-8"))
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+        digest.update(chunk)
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    return digest.hexdigest()
+
+
+class DocumentTextCache:
+    """Two-level cache of extracted document text: an in-memory LRU in front of a size-bounded SQLite store."""
+
+    def __init__(self, path=DOCUMENT_CACHE_PATH, memory_entries=DEFAULT_MEMORY_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " key TEXT PRIMARY KEY, filename TEXT, text TEXT, size INTEGER, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_accessed ON documents(accessed_at)")
+        self._conn.commit()
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns cached text for `key`, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            row = self._conn.execute("SELECT text FROM documents WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE documents SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self._remember(key, row[0])
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, text, filename=""):
+        """Stores extracted text in memory and on disk, evicting least recently used disk entries past `max_bytes`."""
+        with self._lock:
+            self._remember(key, text)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (key, filename, text, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, filename, text, len(text.encode("utf-8")), time.time())
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in self._conn.execute("SELECT key, size FROM documents ORDER BY accessed_at ASC").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM documents WHERE key = ?", (old_key,))
+                    self._memory.pop(old_key, None)
+                    total -= size
+            self._conn.commit()
+
+    def clear(self):
+        """Removes every cached document text."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_document_cache():
+    """Returns the process-wide document text cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DocumentTextCache()
+        return _default_cache
+
+
+def extract_document_text_cached(file_obj, filename, use_cache=True):
+    """
+    Extracts text from an uploaded PDF/PPTX, reusing earlier results for byte-identical files.
+    Re-uploads of the same deck skip parsing entirely.
+    """
+    cache = get_document_cache()
+    key = document_cache_key(file_obj, filename)
+    if use_cache:
+        text = cache.get(key)
+        if text is not None:
+            return text
+    text = extract_text_from_upload(file_obj, filename)
+    if text: # Failed extractions return "" and are retried next time
+        cache.set(key, text, filename)
+    return text
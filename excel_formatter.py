@@ -1,9 +1,11 @@
 import io
+import threading
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 import streamlit as st
 import json
+import xlsxwriter
 
 def apply_header_style(cell):
     """Applies header style to a cell."""
@@ -62,147 +64,88 @@ def set_column_widths_and_row_heights(sheet):
         sheet.row_dimensions[row_idx + 1].height = max(20, max_lines * 15 + 5)
 
 
-def create_excel_file(content_data: dict, company_name: str, lead_objective: str, company_info_for_reasoning: dict) -> bytes:
-    """Creates an Excel file with structured ad content."""
+# Per-platform sheet layout shared by every export path: (sheet name, [(header, result key), ...]).
+PLATFORM_SHEET_SCHEMAS = {
+    "email": ("Email", [
+        ("Version #", "version_number"), ("Objective", "objective"), ("Headline", "headline"),
+        ("Subject Line", "subject_line"), ("Body", "body"), ("CTA", "cta")
+    ]),
+    "linkedin": ("LinkedIn", [
+        ("Version #", "version_number"), ("Ad Name", "ad_name"), ("Objective", "objective"),
+        ("Introductory Text", "introductory_text"), ("Image Copy", "image_copy"), ("Headline", "headline"),
+        ("Destination", "destination"), ("CTA Button", "cta_button")
+    ]),
+    "facebook": ("Facebook", [
+        ("Version #", "version_number"), ("Ad Name", "ad_name"), ("Objective", "objective"),
+        ("Primary Text", "primary_text"), ("Image Copy", "image_copy"), ("Headline", "headline"),
+        ("Link Description", "link_description"), ("Destination", "destination"), ("CTA Button", "cta_button")
+    ]),
+    "google_search": ("Google Search", [("Headline", "headlines"), ("Description", "descriptions")]),
+    "google_display": ("Google Display", [("Headline", "headlines"), ("Description", "descriptions")]),
+}
+
+
+def _fill_platform_sheet(wb, platform, rows):
+    """Adds one per-version platform sheet (Email, LinkedIn, Facebook) laid out by PLATFORM_SHEET_SCHEMAS."""
+    sheet_name, columns = PLATFORM_SHEET_SCHEMAS[platform]
+    ws = wb.create_sheet(sheet_name)
+    for col_num, (header, _) in enumerate(columns, 1):
+        apply_header_style(ws.cell(row=1, column=col_num, value=header))
+
+    for row_num, data_row in enumerate(rows, 2):
+        if isinstance(data_row, dict) and "error" not in data_row:
+            values = [data_row.get(key) for _, key in columns]
+        else: # Handle error placeholder
+            values = ["Error"] + [str(data_row)] * (len(columns) - 1)
+        for col_num, value in enumerate(values, 1):
+            ws.cell(row=row_num, column=col_num, value=value)
+
+    for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=len(columns)):
+        for idx, cell in enumerate(row):
+            apply_default_cell_style(cell, is_version_col=(idx == 0 and cell.row > 1))
+    set_column_widths_and_row_heights(ws)
+
+
+def _fill_google_sheet(wb, platform, data, grey_missing_descriptions):
+    """Adds a Google Search/Display sheet with headlines and descriptions side by side."""
+    sheet_name, columns = PLATFORM_SHEET_SCHEMAS[platform]
+    ws = wb.create_sheet(sheet_name)
+    for col_num, (header, _) in enumerate(columns, 1):
+        apply_header_style(ws.cell(row=1, column=col_num, value=header))
+
+    headlines = data.get("headlines", [])
+    descriptions = data.get("descriptions", [])
+    for i in range(max(len(headlines), len(descriptions))):
+        if i < len(headlines):
+            ws.cell(row=i + 2, column=1, value=headlines[i])
+        if i < len(descriptions):
+            ws.cell(row=i + 2, column=2, value=descriptions[i])
+        elif grey_missing_descriptions: # Grey out empty description cells
+            ws.cell(row=i + 2, column=2).fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
+
+    for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=len(columns)):
+        for cell in row:
+            apply_default_cell_style(cell)
+    set_column_widths_and_row_heights(ws)
+
+
+def create_excel_file(content_data: dict, company_name: str, lead_objective: str, company_info_for_reasoning: dict,
+                      metrics: dict | None = None) -> bytes:
+    """Creates an Excel file with structured ad content, plus a Metrics sheet if run `metrics` are given."""
     wb = openpyxl.Workbook()
     
     # Remove default sheet
     if "Sheet" in wb.sheetnames:
         wb.remove(wb["Sheet"])
 
-    # Email Page
-    if "email" in content_data and content_data["email"]:
-        ws_email = wb.create_sheet("Email")
-        headers_email = ["Version #", "Objective", "Headline", "Subject Line", "Body", "CTA"]
-        for col_num, header in enumerate(headers_email, 1):
-            cell = ws_email.cell(row=1, column=col_num, value=header)
-            apply_header_style(cell)
-
-        for row_num, data_row in enumerate(content_data["email"], 2):
-            if isinstance(data_row, dict) and "error" not in data_row:
-                ws_email.cell(row=row_num, column=1, value=data_row.get("version_number")).alignment = Alignment(horizontal="center", vertical="center")
-                ws_email.cell(row=row_num, column=2, value=data_row.get("objective"))
-                ws_email.cell(row=row_num, column=3, value=data_row.get("headline"))
-                ws_email.cell(row=row_num, column=4, value=data_row.get("subject_line"))
-                ws_email.cell(row=row_num, column=5, value=data_row.get("body"))
-                ws_email.cell(row=row_num, column=6, value=data_row.get("cta"))
-            else: # Handle error placeholder
-                ws_email.cell(row=row_num, column=1, value="Error").alignment = Alignment(horizontal="center", vertical="center")
-                for i in range(2, len(headers_email) + 1):
-                    ws_email.cell(row=row_num, column=i, value=str(data_row))
-
-
-        for row in ws_email.iter_rows(min_row=1, max_row=ws_email.max_row, min_col=1, max_col=len(headers_email)):
-            for idx, cell in enumerate(row):
-                apply_default_cell_style(cell, is_version_col=(idx == 0 and cell.row > 1))
-        set_column_widths_and_row_heights(ws_email)
-
-    # LinkedIn Page
-    if "linkedin" in content_data and content_data["linkedin"]:
-        ws_linkedin = wb.create_sheet("LinkedIn")
-        headers_linkedin = ["Version #", "Ad Name", "Objective", "Introductory Text", "Image Copy", "Headline", "Destination", "CTA Button"]
-        for col_num, header in enumerate(headers_linkedin, 1):
-            cell = ws_linkedin.cell(row=1, column=col_num, value=header)
-            apply_header_style(cell)
-        
-        for row_num, data_row in enumerate(content_data["linkedin"], 2):
-            if isinstance(data_row, dict) and "error" not in data_row:
-                ws_linkedin.cell(row=row_num, column=1, value=data_row.get("version_number")).alignment = Alignment(horizontal="center", vertical="center")
-                ws_linkedin.cell(row=row_num, column=2, value=data_row.get("ad_name"))
-                ws_linkedin.cell(row=row_num, column=3, value=data_row.get("objective"))
-                ws_linkedin.cell(row=row_num, column=4, value=data_row.get("introductory_text"))
-                ws_linkedin.cell(row=row_num, column=5, value=data_row.get("image_copy"))
-                ws_linkedin.cell(row=row_num, column=6, value=data_row.get("headline"))
-                ws_linkedin.cell(row=row_num, column=7, value=data_row.get("destination"))
-                ws_linkedin.cell(row=row_num, column=8, value=data_row.get("cta_button"))
-            else:
-                ws_linkedin.cell(row=row_num, column=1, value="Error").alignment = Alignment(horizontal="center", vertical="center")
-                for i in range(2, len(headers_linkedin) + 1):
-                    ws_linkedin.cell(row=row_num, column=i, value=str(data_row))
-
-
-        for row in ws_linkedin.iter_rows(min_row=1, max_row=ws_linkedin.max_row, min_col=1, max_col=len(headers_linkedin)):
-            for idx, cell in enumerate(row):
-                apply_default_cell_style(cell, is_version_col=(idx == 0 and cell.row > 1))
-        set_column_widths_and_row_heights(ws_linkedin)
-
-    # Facebook Page
-    if "facebook" in content_data and content_data["facebook"]:
-        ws_facebook = wb.create_sheet("Facebook")
-        headers_facebook = ["Version #", "Ad Name", "Objective", "Primary Text", "Image Copy", "Headline", "Link Description", "Destination", "CTA Button"]
-        for col_num, header in enumerate(headers_facebook, 1):
-            cell = ws_facebook.cell(row=1, column=col_num, value=header)
-            apply_header_style(cell)
-
-        for row_num, data_row in enumerate(content_data["facebook"], 2):
-            if isinstance(data_row, dict) and "error" not in data_row:
-                ws_facebook.cell(row=row_num, column=1, value=data_row.get("version_number")).alignment = Alignment(horizontal="center", vertical="center")
-                ws_facebook.cell(row=row_num, column=2, value=data_row.get("ad_name"))
-                ws_facebook.cell(row=row_num, column=3, value=data_row.get("objective"))
-                ws_facebook.cell(row=row_num, column=4, value=data_row.get("primary_text"))
-                ws_facebook.cell(row=row_num, column=5, value=data_row.get("image_copy"))
-                ws_facebook.cell(row=row_num, column=6, value=data_row.get("headline"))
-                ws_facebook.cell(row=row_num, column=7, value=data_row.get("link_description"))
-                ws_facebook.cell(row=row_num, column=8, value=data_row.get("destination"))
-                ws_facebook.cell(row=row_num, column=9, value=data_row.get("cta_button"))
-            else:
-                ws_facebook.cell(row=row_num, column=1, value="Error").alignment = Alignment(horizontal="center", vertical="center")
-                for i in range(2, len(headers_facebook) + 1):
-                    ws_facebook.cell(row=row_num, column=i, value=str(data_row))
-
-        for row in ws_facebook.iter_rows(min_row=1, max_row=ws_facebook.max_row, min_col=1, max_col=len(headers_facebook)):
-            for idx, cell in enumerate(row):
-                apply_default_cell_style(cell, is_version_col=(idx == 0 and cell.row > 1))
-        set_column_widths_and_row_heights(ws_facebook)
-
-    # Google Search Page
-    if "google_search" in content_data and content_data["google_search"]:
-        gs_data = content_data["google_search"][0] if content_data["google_search"] else {} # Expects a list with one item
-        if isinstance(gs_data, dict) and "error" not in gs_data:
-            ws_gsearch = wb.create_sheet("Google Search")
-            headers_gsearch = ["Headline", "Description"]
-            for col_num, header in enumerate(headers_gsearch, 1):
-                cell = ws_gsearch.cell(row=1, column=col_num, value=header)
-                apply_header_style(cell)
-
-            headlines = gs_data.get("headlines", [])
-            descriptions = gs_data.get("descriptions", [])
-            max_rows = max(len(headlines), len(descriptions))
-
-            for i in range(max_rows):
-                if i < len(headlines):
-                    ws_gsearch.cell(row=i + 2, column=1, value=headlines[i])
-                if i < len(descriptions):
-                    ws_gsearch.cell(row=i + 2, column=2, value=descriptions[i])
-                else: # Grey out empty description cells
-                    cell = ws_gsearch.cell(row=i + 2, column=2)
-                    cell.fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid") # Light grey
-
-            for row in ws_gsearch.iter_rows(min_row=1, max_row=ws_gsearch.max_row, min_col=1, max_col=len(headers_gsearch)):
-                for cell in row: apply_default_cell_style(cell)
-            set_column_widths_and_row_heights(ws_gsearch)
-
-    # Google Display Page
-    if "google_display" in content_data and content_data["google_display"]:
-        gd_data = content_data["google_display"][0] if content_data["google_display"] else {} # Expects a list with one item
-        if isinstance(gd_data, dict) and "error" not in gd_data:
-            ws_gdisplay = wb.create_sheet("Google Display")
-            headers_gdisplay = ["Headline", "Description"]
-            for col_num, header in enumerate(headers_gdisplay, 1):
-                cell = ws_gdisplay.cell(row=1, column=col_num, value=header)
-                apply_header_style(cell)
-
-            headlines = gd_data.get("headlines", [])
-            descriptions = gd_data.get("descriptions", [])
-            max_rows = max(len(headlines), len(descriptions)) # Should be 5 for both
-
-            for i in range(max_rows):
-                if i < len(headlines): ws_gdisplay.cell(row=i + 2, column=1, value=headlines[i])
-                if i < len(descriptions): ws_gdisplay.cell(row=i + 2, column=2, value=descriptions[i])
-            
-            for row in ws_gdisplay.iter_rows(min_row=1, max_row=ws_gdisplay.max_row, min_col=1, max_col=len(headers_gdisplay)):
-                for cell in row: apply_default_cell_style(cell)
-            set_column_widths_and_row_heights(ws_gdisplay)
+    for platform in ("email", "linkedin", "facebook"):
+        if content_data.get(platform):
+            _fill_platform_sheet(wb, platform, content_data[platform])
+    for platform in ("google_search", "google_display"):
+        if content_data.get(platform):
+            data = content_data[platform][0] # Expects a list with one item
+            if isinstance(data, dict) and "error" not in data:
+                _fill_google_sheet(wb, platform, data, grey_missing_descriptions=platform == "google_search")
 
     # Reasoning Page
     ws_reasoning = wb.create_sheet("Reasoning")
@@ -250,9 +193,312 @@ def create_excel_file(content_data: dict, company_name: str, lead_objective: str
     
     set_column_widths_and_row_heights(ws_reasoning)
 
+    # Metrics Page
+    if metrics:
+        ws_metrics = wb.create_sheet("Metrics")
+        current_row = 1
+        for title, headers, rows in metrics_tables(metrics):
+            title_cell = ws_metrics.cell(row=current_row, column=1, value=title)
+            apply_header_style(title_cell)
+            ws_metrics.merge_cells(start_row=current_row, start_column=1, end_row=current_row, end_column=len(headers))
+            for col_num, header in enumerate(headers, 1):
+                apply_header_style(ws_metrics.cell(row=current_row + 1, column=col_num, value=header))
+            for row_offset, values in enumerate(rows, current_row + 2):
+                for col_num, value in enumerate(values, 1):
+                    apply_default_cell_style(ws_metrics.cell(row=row_offset, column=col_num, value=value))
+            current_row += len(rows) + 3 # Title, header and a blank row for spacing
+        set_column_widths_and_row_heights(ws_metrics)
+        ws_metrics.column_dimensions["A"].width = METRICS_FIRST_COLUMN_WIDTH
+
 
     # Save to a BytesIO object
     excel_bytes = io.BytesIO()
     wb.save(excel_bytes)
     excel_bytes.seek(0)
-    return excel_bytes.getvalue()
\ No newline at end of file
+    return excel_bytes.getvalue()
+
+# --- Write-only streaming backend ---
+
+MAX_COLUMN_WIDTH = 70
+VERSION_COLUMN_WIDTH = 10
+METRICS_FIRST_COLUMN_WIDTH = 24
+
+
+def metrics_tables(metrics):
+    """
+    The Metrics sheet's sections as (title, headers, rows), built from a telemetry.RunTelemetry summary():
+    stage timings, OpenAI usage grouped by platform and objective (slowest first) and by model, the
+    run's model routing decisions and every call.
+    """
+    stage_totals = {}
+    for span in metrics.get("stages", []):
+        stage_totals[span["stage"]] = round(stage_totals.get(span["stage"], 0.0) + span["seconds"], 3)
+    tables = [("Pipeline Stages", ["Stage", "Seconds"], [[stage, seconds] for stage, seconds in stage_totals.items()])]
+
+    totals = metrics.get("totals", {})
+    group_rows = [
+        [row["platform"], row["objective"], row["calls"], row["prompt_tokens"], row["cached_tokens"], row["completion_tokens"],
+         row["cost_usd"], row["latency_total_seconds"], row["latency_mean_seconds"], row["latency_p95_seconds"],
+         row["latency_max_seconds"], row.get("wait_total_seconds", 0.0)]
+        for row in metrics.get("groups", [])
+    ]
+    group_rows.append(["Total", "", totals.get("calls", 0), totals.get("prompt_tokens", 0), totals.get("cached_tokens", 0),
+                       totals.get("completion_tokens", 0), totals.get("cost_usd", 0.0), "", "", "", "", ""])
+    tables.append(("OpenAI Usage by Platform and Objective", [
+        "Platform", "Objective", "Calls", "Prompt Tokens", "Cached Tokens", "Completion Tokens", "Est. Cost (USD)",
+        "Total Latency (s)", "Mean Latency (s)", "p95 Latency (s)", "Max Latency (s)", "Queue/Retry Wait (s)"
+    ], group_rows))
+
+    if metrics.get("models"):
+        tables.append(("OpenAI Usage by Model", [
+            "Model", "Calls", "Prompt Tokens", "Completion Tokens", "Est. Cost (USD)", "p50 Latency (s)",
+            "p95 Latency (s)", "Max Latency (s)"
+        ], [[row["model"], row["calls"], row["prompt_tokens"], row["completion_tokens"], row["cost_usd"],
+             row["latency_p50_seconds"], row["latency_p95_seconds"], row["latency_max_seconds"]] for row in metrics["models"]]))
+    routing = metrics.get("routing") or {}
+    if routing.get("decisions"):
+        tables.append(("Model Routing", ["Task", "Model", "Reason", "Calls"],
+                       [[d["task"], d["model"], d["reason"], d["calls"]] for d in routing["decisions"]]))
+
+    tables.append(("OpenAI Calls", [
+        "Call", "Model", "Latency (s)", "Queue/Retry Wait (s)", "Prompt Tokens", "Cached Tokens", "Completion Tokens",
+        "Est. Cost (USD)"
+    ], [[call["label"], call["model"], call["latency_seconds"], call.get("wait_seconds"), call["prompt_tokens"], call["cached_tokens"],
+         call["completion_tokens"], call.get("cost_usd", 0.0)] for call in metrics.get("calls", [])]))
+    return tables
+
+
+def _line_stats(value):
+    """(number of lines, longest line length) of a cell value, as used for sizing rows and columns."""
+    if value is None or value == "":
+        return 1, 0
+    lines = str(value).split('\n')
+    return len(lines), max(len(line) for line in lines)
+
+
+class _StreamingSheet:
+    """
+    Writes rows to an XlsxWriter worksheet in constant-memory mode, sizing each row as it is
+    written and tracking column widths so they can be applied when the sheet is finished.
+    """
+
+    def __init__(self, workbook, name, formats):
+        self.worksheet = workbook.add_worksheet(name)
+        self.formats = formats
+        self.row = 0
+        self.max_lengths = {}
+
+    def write_row(self, values, cell_formats):
+        """Writes one row, sizing it from its own values."""
+        max_lines = 1
+        for col, value in enumerate(values):
+            lines, longest = _line_stats(value)
+            max_lines = max(max_lines, lines)
+            self.max_lengths[col] = max(self.max_lengths.get(col, 0), longest)
+        # Approximate row height: 15 points per line, plus some padding
+        self.worksheet.set_row(self.row, max(20, max_lines * 15 + 5))
+        for col, (value, cell_format) in enumerate(zip(values, cell_formats)):
+            if value is None or value == "":
+                self.worksheet.write_blank(self.row, col, None, cell_format)
+            else:
+                self.worksheet.write(self.row, col, value, cell_format)
+        self.row += 1
+
+    def write_merged(self, value, cell_format, last_col, extra_rows=0):
+        """Writes `value` into a cell merged across columns 0..last_col and `extra_rows` further rows."""
+        lines, longest = _line_stats(value)
+        self.max_lengths[0] = max(self.max_lengths.get(0, 0), longest)
+        # Rows must be sized before the merge writes into them (constant_memory flushes rows in order)
+        self.worksheet.set_row(self.row, max(20, lines * 15 + 5))
+        for extra_row in range(1, extra_rows + 1):
+            self.worksheet.set_row(self.row + extra_row, 20)
+        self.worksheet.merge_range(self.row, 0, self.row + extra_rows, last_col, value, cell_format)
+        self.row += 1 + extra_rows
+
+    def write_blank_row(self):
+        self.worksheet.set_row(self.row, 20)
+        self.row += 1
+
+    def finish(self):
+        """Applies column widths computed while the rows were written."""
+        for col, max_length in self.max_lengths.items():
+            width = VERSION_COLUMN_WIDTH if col == 0 else min((max_length + 5) * 1.2, MAX_COLUMN_WIDTH) # Add padding
+            self.worksheet.set_column(col, col, width)
+
+
+def _streaming_formats(workbook):
+    """Shared named styles; every cell references one of these instead of carrying its own style objects."""
+    border = {"border": 1}
+    return {
+        "header": workbook.add_format({**border, "bold": True, "font_color": "#FFFFFF", "bg_color": "#000000",
+                                       "align": "center", "valign": "vcenter", "text_wrap": True}),
+        "cell": workbook.add_format({**border, "align": "left", "valign": "top", "text_wrap": True}),
+        "version": workbook.add_format({**border, "align": "center", "valign": "vcenter"}),
+        "key": workbook.add_format({**border, "bold": True, "align": "left", "valign": "top", "text_wrap": True}),
+        "empty": workbook.add_format({**border, "bg_color": "#D3D3D3", "align": "left", "valign": "top", "text_wrap": True}),
+    }
+
+
+def _write_platform_sheet(workbook, formats, platform, rows):
+    """Writes one per-version platform sheet (Email, LinkedIn, Facebook)."""
+    sheet_name, columns = PLATFORM_SHEET_SCHEMAS[platform]
+    sheet = _StreamingSheet(workbook, sheet_name, formats)
+    sheet.write_row([header for header, _ in columns], [formats["header"]] * len(columns))
+    data_formats = [formats["version"]] + [formats["cell"]] * (len(columns) - 1)
+    for data_row in rows:
+        if isinstance(data_row, dict) and "error" not in data_row:
+            values = [data_row.get(key) for _, key in columns]
+        else: # Handle error placeholder
+            values = ["Error"] + [str(data_row)] * (len(columns) - 1)
+        sheet.write_row(values, data_formats)
+    sheet.finish()
+
+
+def _write_google_sheet(workbook, formats, platform, data, grey_missing_descriptions):
+    """Writes a Google Search/Display sheet with headlines and descriptions side by side."""
+    sheet_name, columns = PLATFORM_SHEET_SCHEMAS[platform]
+    sheet = _StreamingSheet(workbook, sheet_name, formats)
+    sheet.write_row([header for header, _ in columns], [formats["header"]] * len(columns))
+    headlines = data.get("headlines", [])
+    descriptions = data.get("descriptions", [])
+    for i in range(max(len(headlines), len(descriptions))):
+        headline = headlines[i] if i < len(headlines) else None
+        description = descriptions[i] if i < len(descriptions) else None
+        description_format = formats["empty"] if description is None and grey_missing_descriptions else formats["cell"]
+        sheet.write_row([headline, description], [formats["cell"], description_format])
+    sheet.finish()
+
+
+def _write_reasoning_sheet(workbook, formats, content_data, company_info_for_reasoning):
+    sheet = _StreamingSheet(workbook, "Reasoning", formats)
+
+    sheet.write_merged("Scraped Company Information", formats["header"], last_col=1)
+
+    for key, value in company_info_for_reasoning.items():
+        if isinstance(value, list):
+            val_str = "\n".join(f"- {item}" for item in value) if value else "N/A"
+        else:
+            val_str = str(value) if value else "N/A"
+        sheet.write_row([key.replace("_", " ").title(), val_str], [formats["key"], formats["cell"]])
+
+    sheet.write_blank_row() # Add a blank row for spacing
+
+    sheet.write_merged("AI Generated Reasoning", formats["header"], last_col=1)
+
+    reasoning_text = "No reasoning generated."
+    if "reasoning" in content_data and content_data["reasoning"]:
+        if isinstance(content_data["reasoning"], dict) and "reasoning_statement" in content_data["reasoning"]:
+            reasoning_text = content_data["reasoning"]["reasoning_statement"]
+        elif isinstance(content_data["reasoning"], str): # Fallback if it's just a string
+            reasoning_text = content_data["reasoning"]
+
+    sheet.write_merged(reasoning_text, formats["cell"], last_col=1, extra_rows=5) # Merge for more space
+    sheet.finish()
+
+
+def _write_metrics_sheet(workbook, formats, metrics):
+    sheet = _StreamingSheet(workbook, "Metrics", formats)
+    for title, headers, rows in metrics_tables(metrics):
+        sheet.write_merged(title, formats["header"], last_col=len(headers) - 1)
+        sheet.write_row(headers, [formats["header"]] * len(headers))
+        for values in rows:
+            sheet.write_row(values, [formats["cell"]] * len(values))
+        sheet.write_blank_row()
+    sheet.finish()
+    sheet.worksheet.set_column(0, 0, METRICS_FIRST_COLUMN_WIDTH) # Not a version column; titles would make it too wide
+
+
+def create_excel_file_streaming(content_data: dict, company_name: str, lead_objective: str,
+                                company_info_for_reasoning: dict, output=None, metrics: dict | None = None) -> bytes | None:
+    """
+    Write-only counterpart of create_excel_file with the same sheets and styling.
+    Rows are streamed to disk-backed sheet data (XlsxWriter constant_memory mode) using shared
+    named styles, and row heights/column widths are computed in the same pass that writes each row,
+    so memory stays flat and build time grows linearly with the number of rows.
+    `output` may be a path or a binary file object; when omitted the workbook bytes are returned.
+    `metrics` (a telemetry.RunTelemetry summary()) adds a Metrics sheet.
+    """
+    target = output if output is not None else io.BytesIO()
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "strings_to_urls": False})
+    formats = _streaming_formats(workbook)
+
+    for platform in ("email", "linkedin", "facebook"):
+        if content_data.get(platform):
+            _write_platform_sheet(workbook, formats, platform, content_data[platform])
+
+    for platform, grey_missing in (("google_search", True), ("google_display", False)):
+        if content_data.get(platform):
+            data = content_data[platform][0] # Expects a list with one item
+            if isinstance(data, dict) and "error" not in data:
+                _write_google_sheet(workbook, formats, platform, data, grey_missing)
+
+    _write_reasoning_sheet(workbook, formats, content_data, company_info_for_reasoning)
+    if metrics:
+        _write_metrics_sheet(workbook, formats, metrics)
+    workbook.close()
+
+    if output is None:
+        return target.getvalue()
+    return None
+
+
+class IncrementalWorkbook:
+    """
+    Collects results as their calls complete (pass `add_result` as generate_all_content's
+    result_callback) and builds a workbook from whatever has arrived so far. to_bytes() may be
+    called from another thread mid-run, e.g. by a deferred download button; the bytes are only
+    rebuilt when new results have arrived since the last build.
+    """
+
+    def __init__(self, company_name, lead_objective, company_info_for_reasoning):
+        self.company_name = company_name
+        self.lead_objective = lead_objective
+        self.company_info_for_reasoning = company_info_for_reasoning
+        self._rows = {platform: {} for platform in PLATFORM_SHEET_SCHEMAS}
+        self._reasoning = None
+        self._version = 0
+        self._built_version = -1
+        self._built_bytes = None
+        self._lock = threading.Lock()
+
+    def set_company_info(self, company_name, company_info_for_reasoning):
+        """Fills in company details that are only known once key info extraction has finished."""
+        with self._lock:
+            self.company_name = company_name
+            self.company_info_for_reasoning = company_info_for_reasoning
+            self._version += 1
+
+    def add_result(self, platform, row_index, data):
+        with self._lock:
+            if platform == "reasoning":
+                self._reasoning = data
+            elif platform in self._rows:
+                self._rows[platform][row_index] = data
+            else:
+                return
+            self._version += 1
+
+    @property
+    def completed_rows(self):
+        with self._lock:
+            return sum(len(rows) for rows in self._rows.values())
+
+    def content_data(self):
+        """Snapshot in generate_all_content's result shape, holding completed rows in row order."""
+        with self._lock:
+            snapshot = {platform: [rows[i] for i in sorted(rows)] for platform, rows in self._rows.items()}
+            snapshot["reasoning"] = self._reasoning
+            return snapshot
+
+    def to_bytes(self):
+        """Workbook bytes for the results received so far."""
+        with self._lock:
+            version = self._version
+            if version == self._built_version:
+                return self._built_bytes
+        workbook_bytes = create_excel_file_streaming(self.content_data(), self.company_name, self.lead_objective,
+                                                     self.company_info_for_reasoning)
+        with self._lock:
+            if version >= self._built_version:
+                self._built_version, self._built_bytes = version, workbook_bytes
+        return workbook_bytes
@@ -0,0 +1,251 @@
+import csv
+import io
+import json
+import os
+import zipfile
+
+from excel_formatter import PLATFORM_SHEET_SCHEMAS
+
+EXPORT_PLATFORMS = ["email", "linkedin", "facebook", "google_search", "google_display"]
+GOOGLE_PLATFORMS = ("google_search", "google_display")
+PARQUET_ROW_GROUP_SIZE = 500 # Rows buffered per platform before a Parquet row group is written
+
+
+def export_columns(platform):
+    """
+    Column names for a platform's table, taken from the workbook sheet schema.
+    Google sheets hold headline/description lists side by side, so their tables get one
+    row per position. Every table ends with an `error` column for failed generations.
+    """
+    if platform in GOOGLE_PLATFORMS:
+        return ["position", "headline", "description", "error"]
+    _, columns = PLATFORM_SHEET_SCHEMAS[platform]
+    return [key for _, key in columns] + ["error"]
+
+
+def flatten_result(platform, data):
+    """Turns one generated result into table rows (dicts keyed by export_columns)."""
+    columns = export_columns(platform)
+    if not isinstance(data, dict):
+        return [dict.fromkeys(columns, None) | {"error": str(data)}]
+    if platform in GOOGLE_PLATFORMS:
+        headlines = data.get("headlines", [])
+        descriptions = data.get("descriptions", [])
+        return [
+            {"position": i + 1,
+             "headline": headlines[i] if i < len(headlines) else None,
+             "description": descriptions[i] if i < len(descriptions) else None,
+             "error": data.get("error")}
+            for i in range(max(len(headlines), len(descriptions)))
+        ]
+    return [{column: data.get(column) for column in columns}]
+
+
+def _cell(value):
+    """Scalar value for a table cell; lists (e.g. from a model that ignored the format) are joined."""
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return value
+
+
+class Exporter:
+    """
+    Base class for per-platform table exporters. Rows are appended with write_rows() as results
+    arrive; close() flushes everything and returns the paths written. Subclasses implement
+    _open_table, _append and _close_table.
+    """
+    extension = ""
+
+    def __init__(self, output_dir, basename):
+        self.output_dir = output_dir
+        self.basename = basename
+        self.paths = {}
+        self._tables = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path_for(self, platform):
+        return os.path.join(self.output_dir, f"{self.basename}_{platform}.{self.extension}")
+
+    def write_rows(self, platform, rows):
+        """Appends already-flattened rows to a platform's table, creating it on first use."""
+        if platform not in self._tables:
+            self.paths[platform] = self.path_for(platform)
+            self._tables[platform] = self._open_table(platform, self.paths[platform])
+        self._append(platform, self._tables[platform], rows)
+
+    def write_result(self, platform, data):
+        """Appends one generated result (a row dict, or a Google headlines/descriptions dict)."""
+        self.write_rows(platform, flatten_result(platform, data))
+
+    def close(self):
+        for platform, table in self._tables.items():
+            self._close_table(platform, table)
+        self._tables = {}
+        return list(self.paths.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_table(self, platform, path):
+        raise NotImplementedError
+
+    def _append(self, platform, table, rows):
+        raise NotImplementedError
+
+    def _close_table(self, platform, table):
+        raise NotImplementedError
+
+
+class CsvExporter(Exporter):
+    """One UTF-8 CSV file per platform with a header row."""
+    extension = "csv"
+
+    def _open_table(self, platform, path):
+        handle = open(path, "w", newline="", encoding="utf-8")
+        writer = csv.DictWriter(handle, fieldnames=export_columns(platform))
+        writer.writeheader()
+        return handle, writer
+
+    def _append(self, platform, table, rows):
+        handle, writer = table
+        writer.writerows({key: _cell(value) for key, value in row.items()} for row in rows)
+        handle.flush()
+
+    def _close_table(self, platform, table):
+        table[0].close()
+
+
+class JsonlExporter(Exporter):
+    """One JSON Lines file per platform, one object per row."""
+    extension = "jsonl"
+
+    def _open_table(self, platform, path):
+        return open(path, "w", encoding="utf-8")
+
+    def _append(self, platform, table, rows):
+        for row in rows:
+            table.write(json.dumps(row, ensure_ascii=False) + "\n")
+        table.flush()
+
+    def _close_table(self, platform, table):
+        table.close()
+
+
+class ParquetExporter(Exporter):
+    """
+    One Parquet file per platform, written in row groups of PARQUET_ROW_GROUP_SIZE.
+    Every column is a nullable string except Google `position`, so error rows fit the same schema.
+    Requires pyarrow.
+    """
+    extension = "parquet"
+
+    def __init__(self, output_dir, basename, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow).") from e
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.row_group_size = row_group_size
+        super().__init__(output_dir, basename)
+
+    def _schema(self, platform):
+        pa = self._pa
+        return pa.schema([(column, pa.int64() if column == "position" else pa.string())
+                          for column in export_columns(platform)])
+
+    def _open_table(self, platform, path):
+        schema = self._schema(platform)
+        return {"writer": self._pq.ParquetWriter(path, schema), "schema": schema, "buffer": []}
+
+    def _flush(self, table):
+        if table["buffer"]:
+            batch = self._pa.Table.from_pylist(table["buffer"], schema=table["schema"])
+            table["writer"].write_table(batch)
+            table["buffer"] = []
+
+    def _append(self, platform, table, rows):
+        for row in rows:
+            table["buffer"].append({key: value if key == "position" or value is None else str(_cell(value))
+                                    for key, value in row.items()})
+        if len(table["buffer"]) >= self.row_group_size:
+            self._flush(table)
+
+    def _close_table(self, platform, table):
+        self._flush(table)
+        table["writer"].close()
+
+
+EXPORTERS = {"csv": CsvExporter, "jsonl": JsonlExporter, "parquet": ParquetExporter}
+
+
+class StreamingExport:
+    """
+    Feeds results into one or more exporters as they complete. Results can arrive in any order;
+    each platform's rows are written as soon as every earlier row for that platform is in, so the
+    files keep the same order as the workbook. Use `add_result` as generate_all_content's result_callback.
+    """
+
+    def __init__(self, output_dir, basename, formats):
+        unknown = [fmt for fmt in formats if fmt not in EXPORTERS]
+        if unknown:
+            raise ValueError(f"Unknown export format(s): {', '.join(unknown)}")
+        self.exporters = [EXPORTERS[fmt](output_dir, basename) for fmt in formats]
+        self._pending = {}
+        self._next_row = {}
+
+    def add_result(self, platform, row_index, data):
+        if platform not in EXPORT_PLATFORMS:
+            return
+        pending = self._pending.setdefault(platform, {})
+        pending[row_index] = data
+        next_row = self._next_row.get(platform, 0)
+        while next_row in pending:
+            rows = flatten_result(platform, pending.pop(next_row))
+            for exporter in self.exporters:
+                exporter.write_rows(platform, rows)
+            next_row += 1
+        self._next_row[platform] = next_row
+
+    def close(self):
+        """Writes anything still held back (after gaps from skipped rows) and returns all file paths."""
+        for platform, pending in self._pending.items():
+            for row_index in sorted(pending):
+                rows = flatten_result(platform, pending[row_index])
+                for exporter in self.exporters:
+                    exporter.write_rows(platform, rows)
+        self._pending = {}
+        paths = []
+        for exporter in self.exporters:
+            paths += exporter.close()
+        return paths
+
+
+def export_content(content_data, output_dir, basename, formats=("csv",)):
+    """
+    Headless export of a finished content_data dict (as returned by generate_all_content)
+    to one table per platform in each of `formats` ("csv", "jsonl", "parquet").
+    Returns the list of file paths written.
+    """
+    export = StreamingExport(output_dir, basename, formats)
+    for platform in EXPORT_PLATFORMS:
+        data = content_data.get(platform)
+        if isinstance(data, dict): # Google results are a single dict
+            export.add_result(platform, 0, data)
+        elif data:
+            for row_index, row in enumerate(data):
+                export.add_result(platform, row_index, row)
+    return export.close()
+
+
+def zip_export_files(paths):
+    """Bundles exported files into an in-memory zip archive for a single download."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            archive.write(path, arcname=os.path.basename(path))
+    return buffer.getvalue()
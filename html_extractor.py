@@ -0,0 +1,107 @@
+import re
+from lxml import etree
+
+# Hard caps for a single page. Anything past these is not downloaded or kept.
+MAX_HTML_BYTES = 5 * 1024 * 1024
+MAX_TEXT_CHARS = 200000
+
+# Same elements the BeautifulSoup path decomposes before calling get_text
+EXCLUDED_TAGS = {"script", "style", "nav", "footer", "aside"}
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+
+def is_text_content_type(content_type):
+    """True for responses worth parsing; binary downloads (PDFs, images, archives) are rejected."""
+    if not content_type: # Servers that omit the header usually serve HTML
+        return True
+    return content_type.split(";")[0].strip().lower() in TEXT_CONTENT_TYPES
+
+
+def sniff_encoding(head):
+    """Encoding from a BOM or <meta charset> in the first bytes of a document, defaulting to UTF-8."""
+    if head.startswith(b"\xef\xbb\xbf"):
+        return "utf-8"
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16"
+    match = re.search(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_-]+)', head[:4096], re.IGNORECASE)
+    return match.group(1).decode("ascii").lower() if match else "utf-8"
+
+
+class _TextCollector:
+    """lxml parser target that keeps text outside EXCLUDED_TAGS as the document streams in."""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.parts = []
+        self.chars = 0
+        self.skip_depth = 0
+
+    @property
+    def full(self):
+        return self.chars >= self.max_chars
+
+    def start(self, tag, attrib):
+        if self.skip_depth or tag in EXCLUDED_TAGS:
+            self.skip_depth += 1
+        else:
+            self.parts.append(" ") # Element boundaries separate words, like get_text(separator=' ')
+
+    def end(self, tag):
+        if self.skip_depth:
+            self.skip_depth -= 1
+        else:
+            self.parts.append(" ")
+
+    def data(self, data):
+        if self.skip_depth or self.full:
+            return
+        self.parts.append(data)
+        self.chars += len(data)
+
+    def close(self):
+        return None
+
+
+def extract_text_streaming(chunks, max_bytes=MAX_HTML_BYTES, max_chars=MAX_TEXT_CHARS, encoding=None, keep_raw=True):
+    """
+    Incrementally parses HTML from an iterable of byte chunks (e.g. `response.iter_content()`),
+    dropping script/style/nav/footer/aside content as it goes. Reading stops once `max_bytes`
+    have been consumed or `max_chars` of text collected. Without an explicit `encoding`,
+    it is sniffed from the first chunk.
+    Returns {"text", "raw" (bytes read, if keep_raw), "bytes_read", "truncated"}.
+    """
+    collector = _TextCollector(max_chars)
+    parser = None
+    raw_parts = []
+    bytes_read = 0
+    truncated = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if bytes_read + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - bytes_read]
+            truncated = True
+        bytes_read += len(chunk)
+        if keep_raw:
+            raw_parts.append(chunk)
+        if parser is None: # Pick the encoding from the first chunk unless the server declared one
+            try:
+                parser = etree.HTMLParser(target=collector, encoding=encoding or sniff_encoding(chunk),
+                                          remove_comments=True, no_network=True)
+            except LookupError: # Unknown charset name
+                parser = etree.HTMLParser(target=collector, encoding="utf-8", remove_comments=True, no_network=True)
+        parser.feed(chunk)
+        if collector.full:
+            truncated = True
+        if truncated:
+            break
+    if parser is not None:
+        try:
+            parser.close()
+        except etree.XMLSyntaxError: # Empty or hopelessly broken documents
+            pass
+
+    text = re.sub(r'\s+', ' ', "".join(collector.parts)).strip()
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip()
+    return {"text": text, "raw": b"".join(raw_parts), "bytes_read": bytes_read, "truncated": truncated}
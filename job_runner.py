@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from completion_cache import CACHE_DIR
+
+JOBS_DIR = os.path.join(CACHE_DIR, "jobs")
+JOBS_DB_PATH = os.path.join(JOBS_DIR, "jobs.sqlite3")
+
+DEFAULT_MAX_CONCURRENT_JOBS = 2 # Jobs running at once per server process; the rest wait in the queue
+MAX_LIVE_JOBS = 50 # Finished jobs whose in-memory handles are kept; older ones are read from the store only
+FINAL_STATUSES = ("completed", "failed", "interrupted")
+
+
+class JobStore:
+    """SQLite-backed job status, so a job can be looked up by ID from any session or after a page reload."""
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, label TEXT, status TEXT, progress REAL, message TEXT,"
+            " created_at REAL, started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+        )
+        self._conn.commit()
+
+    def create(self, job_id, label):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, label, status, progress, message, created_at) VALUES (?, ?, 'queued', 0, 'Queued', ?)",
+                (job_id, label, time.time())
+            )
+            self._conn.commit()
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False, default=str)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id):
+        """Returns the job as a dict (result decoded), or None for an unknown ID."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            names = [column[0] for column in cursor.description]
+        if row is None:
+            return None
+        job = dict(zip(names, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def recent(self, limit=10):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, label, status, created_at FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [{"id": r[0], "label": r[1], "status": r[2], "created_at": r[3]} for r in rows]
+
+    def mark_interrupted(self):
+        """Jobs left queued/running by a previous server process can't resume; mark them as such."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted', message = 'Server restarted before the job finished.', finished_at = ?"
+                " WHERE status IN ('queued', 'running')", (time.time(),)
+            )
+            self._conn.commit()
+
+
+class Job:
+    """Handle passed to a job function: its ID, a private working directory and a progress reporter."""
+
+    def __init__(self, job_id, store, work_dir):
+        self.id = job_id
+        self.work_dir = work_dir
+        self.live = {} # In-process state for the UI, e.g. a partial workbook; not persisted
+        self.finished = False
+        self._store = store
+
+    def report(self, message=None, progress=None):
+        """Persists a status message and/or progress (0-1)."""
+        fields = {}
+        if message is not None:
+            fields["message"] = message
+        if progress is not None:
+            fields["progress"] = max(0.0, min(1.0, progress))
+        if fields:
+            self._store.update(self.id, **fields)
+
+
+class JobRunner:
+    """
+    Runs job functions on a bounded worker pool, outside any Streamlit script run, so widget
+    interactions, reloads and disconnects don't stop them. Submissions beyond `max_concurrent_jobs`
+    wait in FIFO order. Status lives in a JobStore; results are whatever the job function returns.
+    """
+
+    def __init__(self, max_concurrent_jobs=DEFAULT_MAX_CONCURRENT_JOBS, store=None, jobs_dir=JOBS_DIR):
+        self.store = store or JobStore()
+        self.store.mark_interrupted()
+        self.jobs_dir = jobs_dir
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="job")
+        self._queue = [] # Queued job IDs in submission order
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create_job(self, label=""):
+        """Registers a queued job and its working directory (e.g. for uploaded files) before submitting it."""
+        job_id = uuid.uuid4().hex[:12]
+        work_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(work_dir, exist_ok=True)
+        self.store.create(job_id, label)
+        job = Job(job_id, self.store, work_dir)
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > MAX_LIVE_JOBS: # Dicts keep insertion order, so this drops the oldest finished job
+                oldest_finished = next((jid for jid, j in self._jobs.items() if j.finished), None)
+                if oldest_finished is None:
+                    break
+                del self._jobs[oldest_finished]
+        return job
+
+    def submit(self, job, func, *args, **kwargs):
+        """Queues `func(job, *args, **kwargs)`. Returns the job ID."""
+        with self._lock:
+            self._queue.append(job.id)
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job, func, args, kwargs):
+        with self._lock:
+            self._queue.remove(job.id)
+        self.store.update(job.id, status="running", started_at=time.time(), message="Starting...")
+        try:
+            result = func(job, *args, **kwargs)
+        except Exception as e:
+            self.store.update(job.id, status="failed", error=str(e), message=f"Failed: {e}", finished_at=time.time())
+            return
+        finally:
+            job.finished = True
+        self.store.update(job.id, status="completed", progress=1.0, message="Completed", result=result, finished_at=time.time())
+
+    def status(self, job_id):
+        """Persisted job status plus `queue_position` (1-based) while it waits for a worker."""
+        job = self.store.get(job_id)
+        if job is not None:
+            with self._lock:
+                job["queue_position"] = self._queue.index(job_id) + 1 if job_id in self._queue else None
+        return job
+
+    def live_job(self, job_id):
+        """The in-process Job handle, if the job was submitted by this server process."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+_default_runner = None
+_default_runner_lock = threading.Lock()
+
+def get_job_runner():
+    """Returns the process-wide job runner, shared by every Streamlit session."""
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner(int(os.environ.get("MAX_CONCURRENT_JOBS", DEFAULT_MAX_CONCURRENT_JOBS)))
+        return _default_runner
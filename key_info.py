@@ -0,0 +1,188 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from completion_cache import cached_completion_content
+from utils import estimate_tokens
+
+# Chunked (map-reduce) key info extraction. Each chunk is about the size of the single-call window.
+CHUNK_TOKENS = 3750 # ~15000 chars, the window extract_key_info_from_text reads in one call
+CHUNK_OVERLAP_TOKENS = 150 # Repeated at the start of the next chunk so facts split across a boundary survive
+MAX_CHUNKS = 16 # All chunks run in parallel, so latency stays flat up to this many
+CHUNK_EXPECTED_TOKENS = 800 # Output budget reserved per chunk call against tokens/min
+MAX_LIST_ITEMS = 12 # Merged offerings/USPs/CTAs are capped, most frequently mentioned first
+
+SCALAR_FIELDS = ["company_name", "tagline", "mission_statement", "industry", "value_proposition",
+                 "target_audience", "tone_of_voice"]
+LIST_FIELDS = ["offerings", "USPs", "CTAs"]
+MISSING_VALUES = {"", "not found", "n/a", "none", "unknown", "error", "api error"}
+
+# Preferred split points, best first: crawled page boundaries, the additional material marker,
+# paragraphs, lines, sentences and finally any whitespace.
+CHUNK_SEPARATORS = ["\n\n--- Page:", "\n\n--- Additional Material ---", "\n\n", "\n", ". ", " "]
+
+
+def split_into_chunks(text, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Splits text into chunks of at most ~`chunk_tokens`, breaking at the best separator in the
+    second half of each window so pages, paragraphs and sentences stay intact where possible.
+    """
+    chunk_chars = chunk_tokens * 4 # Same chars-per-token estimate as utils.estimate_tokens
+    overlap_chars = overlap_tokens * 4
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_chars
+        if end < len(text):
+            window_floor = start + chunk_chars // 2
+            for separator in CHUNK_SEPARATORS:
+                split_at = text.rfind(separator, window_floor, end)
+                if split_at != -1:
+                    end = split_at + (len(separator) if separator in (". ", " ") else 0)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        next_start = max(end - overlap_chars, start + 1)
+        space = text.find(" ", next_start, end) # Don't start the overlap mid-word
+        start = space + 1 if space != -1 else next_start
+    return chunks
+
+
+def build_chunk_prompt(chunk, part, total_parts):
+    return f"""
+    Analyze the following excerpt (part {part} of {total_parts}) of text from a company's website and any provided additional materials.
+    Extract the following information from THIS EXCERPT ONLY. If a piece of information is not present in the excerpt, use "Not found" or an empty list as appropriate.
+    For every string field also give a confidence between 0 and 1 that the excerpt states it clearly
+    (1 = stated verbatim, 0.5 = inferred, 0 = not found).
+    Return the information ONLY as a single JSON object.
+
+    JSON Structure:
+    {{
+      "company_name": "string (Company's official name)",
+      "tagline": "string (Company's tagline or slogan, if any)",
+      "mission_statement": "string (Company's mission statement, if explicitly stated or clearly inferable)",
+      "industry": "string (e.g., SaaS, E-commerce, Healthcare Technology)",
+      "offerings": ["string (Product/Service 1)", "string (Product/Service 2)"],
+      "USPs": ["string (Unique Selling Proposition 1)", "string (Unique Selling Proposition 2)"],
+      "value_proposition": "string (Concise statement of the unique benefit provided to customers)",
+      "target_audience": "string (Description of the primary target audience)",
+      "tone_of_voice": "string (Describe the typical tone of voice)",
+      "CTAs": ["string (Common Call-to-Action phrase 1 found in the excerpt)", "string (CTA phrase 2)"],
+      "confidence": {{"company_name": 0.0, "tagline": 0.0, "mission_statement": 0.0, "industry": 0.0,
+                      "value_proposition": 0.0, "target_audience": 0.0, "tone_of_voice": 0.0}}
+    }}
+
+    Excerpt:
+    ---
+    {chunk}
+    ---
+
+    Provide ONLY the JSON object. Do not include any explanatory text before or after the JSON.
+    """
+
+
+def _normalize(value):
+    return re.sub(r"[\W_]+", " ", str(value)).strip().lower()
+
+
+def _is_missing(value):
+    return value is None or _normalize(value) in MISSING_VALUES
+
+
+def _confidence(partial, field):
+    try:
+        return float((partial.get("confidence") or {}).get(field, 0.5))
+    except (TypeError, ValueError, AttributeError):
+        return 0.5
+
+
+def merge_key_info(partials):
+    """
+    Deterministically merges per-chunk extractions (in chunk order).
+    Scalars: the value with the highest confidence wins, ties broken by how many chunks agree, then by
+    earliest chunk. Lists: case/punctuation-insensitive union, most frequently mentioned first, then by
+    first appearance, capped at MAX_LIST_ITEMS.
+    """
+    merged = {}
+    for field in SCALAR_FIELDS:
+        candidates = {} # normalized value -> [best confidence, agreeing chunks, first chunk index, original value]
+        for index, partial in enumerate(partials):
+            value = partial.get(field)
+            if isinstance(value, list):
+                value = ", ".join(str(item) for item in value)
+            if _is_missing(value):
+                continue
+            key = _normalize(value)
+            confidence = _confidence(partial, field)
+            if key not in candidates:
+                candidates[key] = [confidence, 1, index, str(value).strip()]
+            else:
+                candidates[key][0] = max(candidates[key][0], confidence)
+                candidates[key][1] += 1
+        if candidates:
+            best = min(candidates.values(), key=lambda c: (-c[0], -c[1], c[2]))
+            merged[field] = best[3]
+        else:
+            merged[field] = "Not found"
+
+    for field in LIST_FIELDS:
+        items = {} # normalized item -> [mentions, first position, original item]
+        position = 0
+        for partial in partials:
+            values = partial.get(field) or []
+            if isinstance(values, str):
+                values = [values]
+            for value in values:
+                if _is_missing(value):
+                    continue
+                key = _normalize(value)
+                if key in items:
+                    items[key][0] += 1
+                else:
+                    items[key] = [1, position, str(value).strip()]
+                position += 1
+        ranked = sorted(items.values(), key=lambda item: (-item[0], item[1]))
+        merged[field] = [item[2] for item in ranked[:MAX_LIST_ITEMS]]
+    return merged
+
+
+def extract_key_info_chunked(text_content, openai_client, model, use_cache=True, reporter=None, rate_limiter=None,
+                             chunk_tokens=CHUNK_TOKENS, max_chunks=MAX_CHUNKS, usage_tracker=None):
+    """
+    Map-reduce key info extraction: splits `text_content` into token-aware chunks, extracts partial
+    JSON from every chunk in parallel and merges the results with merge_key_info.
+    Returns None if no chunk could be extracted, so the caller can fall back to its error result.
+    """
+    chunks = split_into_chunks(text_content, chunk_tokens)
+    if len(chunks) > max_chunks:
+        if reporter:
+            reporter.warning(f"Context is {len(chunks)} chunks long; only the first {max_chunks} are used for key info extraction.")
+        chunks = chunks[:max_chunks]
+
+    def extract_chunk(part):
+        prompt = build_chunk_prompt(chunks[part], part + 1, len(chunks))
+        content = cached_completion_content(openai_client, model, prompt, use_cache=use_cache, rate_limiter=rate_limiter,
+                                            estimated_tokens=estimate_tokens(prompt) + CHUNK_EXPECTED_TOKENS,
+                                            usage_tracker=usage_tracker, usage_label=f"key_info part {part + 1}",
+                                            usage_tags={"platform": "key_info", "objective": "chunk"})
+        return json.loads(content)
+
+    partials = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, len(chunks))) as executor:
+        futures = [executor.submit(extract_chunk, part) for part in range(len(chunks))]
+        for part, future in enumerate(futures): # Chunk order, so the merge is deterministic
+            try:
+                partial = future.result()
+            except Exception as e:
+                failures.append(f"part {part + 1}: {e}")
+                continue
+            if isinstance(partial, dict):
+                partials.append(partial)
+
+    if failures and reporter: # Reported from the calling thread so Streamlit can show it
+        reporter.warning(f"Key info extraction skipped {len(failures)} of {len(chunks)} chunks ({'; '.join(failures)}).")
+    return merge_key_info(partials) if partials else None
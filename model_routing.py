@@ -0,0 +1,140 @@
+import math
+import threading
+import time
+from collections import deque
+
+# A model is skipped for a task while its recent calls for that task are too slow or failing too often.
+# Samples older than the window are forgotten, so a skipped model is tried again once they expire.
+STATS_WINDOW_SECONDS = 300
+MAX_SAMPLES = 200 # Per model and task
+MIN_SAMPLES = 5 # Fewer recent calls than this say nothing about a model's health
+MAX_ERROR_RATE = 0.25
+MULTI_ITEM_P95_FACTOR = 4 # Multi-item calls write several versions, so they may take this much longer
+
+
+def _p95(values):
+    """Nearest-rank 95th percentile (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(0.95 * len(ordered)) - 1))]
+
+
+class ModelStats:
+    """
+    Process-wide latency and error samples of OpenAI calls per (model, task), fed by
+    completion_cache.cached_completion_content for every network attempt, so routing decisions
+    in one run see what earlier and concurrent runs measured.
+    """
+
+    def __init__(self, window_seconds=STATS_WINDOW_SECONDS, max_samples=MAX_SAMPLES):
+        self.window_seconds = window_seconds
+        self.max_samples = max_samples
+        self._samples = {} # (model, task) -> deque of (monotonic time, latency seconds, ok)
+        self._lock = threading.Lock()
+
+    def observe(self, model, task, latency_seconds, ok=True):
+        with self._lock:
+            samples = self._samples.setdefault((model, task), deque(maxlen=self.max_samples))
+            samples.append((time.monotonic(), latency_seconds, ok))
+
+    def snapshot(self, model, task):
+        """{"samples", "p95_seconds", "error_rate"} over the window; p95 is of successful calls."""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            samples = self._samples.get((model, task), ())
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            recent = list(samples)
+        latencies = [latency for _, latency, ok in recent if ok]
+        return {
+            "samples": len(recent),
+            "p95_seconds": round(_p95(latencies), 3),
+            "error_rate": round(1 - len(latencies) / len(recent), 3) if recent else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+_default_stats = None
+_default_stats_lock = threading.Lock()
+
+def get_model_stats():
+    """Returns the process-wide model stats, creating them on first use."""
+    global _default_stats
+    with _default_stats_lock:
+        if _default_stats is None:
+            _default_stats = ModelStats()
+        return _default_stats
+
+
+class ModelRouter:
+    """
+    Picks the model for each call of a run from a routing table {task: {"models": [...], "max_p95_seconds": s}}
+    (e.g. ai_content_generator.MODEL_ROUTES and scraper.MODEL_ROUTES). The first model in a task's list
+    is used unless its recent p95 latency or error rate for the task crosses the limits, in which case the
+    next healthy one is; if none is healthy the first is used anyway. Tasks not in the table use
+    `default_model`. Decisions are counted per run for summary().
+    """
+
+    def __init__(self, routes, default_model, stats=None):
+        self.routes = routes
+        self.default_model = default_model
+        self.stats = stats or get_model_stats()
+        self._decisions = {} # (task, model, reason) -> calls
+        self._lock = threading.Lock()
+
+    def models(self, task):
+        """The task's fallback chain, e.g. for fingerprints that must not depend on which model was healthy."""
+        route = self.routes.get(task)
+        return list(route["models"]) if route else [self.default_model]
+
+    def _unhealthy_reason(self, model, task, max_p95_seconds):
+        snapshot = self.stats.snapshot(model, task)
+        if snapshot["samples"] < MIN_SAMPLES:
+            return None
+        if snapshot["error_rate"] > MAX_ERROR_RATE:
+            return f"{model} error rate"
+        if max_p95_seconds and snapshot["p95_seconds"] > max_p95_seconds:
+            return f"{model} p95 latency"
+        return None
+
+    def route(self, task, multi_item=False):
+        """
+        The model for one call of `task`. Multi-item calls are measured separately (as "<task> multi")
+        against MULTI_ITEM_P95_FACTOR times the task's latency limit. Returns (model, stats task).
+        """
+        stats_task = f"{task} multi" if multi_item else task
+        route = self.routes.get(task)
+        if route is None:
+            model, reason = self.default_model, "default"
+        else:
+            max_p95_seconds = route.get("max_p95_seconds")
+            if max_p95_seconds and multi_item:
+                max_p95_seconds *= MULTI_ITEM_P95_FACTOR
+            model, reason, skipped = route["models"][0], "primary", []
+            for candidate in route["models"]:
+                unhealthy = self._unhealthy_reason(candidate, stats_task, max_p95_seconds)
+                if unhealthy is None:
+                    model = candidate
+                    reason = f"fallback ({'; '.join(skipped)})" if skipped else "primary"
+                    break
+                skipped.append(unhealthy)
+            else:
+                reason = f"no healthy model ({'; '.join(skipped)})"
+        with self._lock:
+            key = (stats_task, model, reason)
+            self._decisions[key] = self._decisions.get(key, 0) + 1
+        return model, stats_task
+
+    def summary(self):
+        """Routing decisions of the run and the current stats of every model in the routes it used, JSON-serialisable."""
+        with self._lock:
+            decisions = [{"task": task, "model": model, "reason": reason, "calls": calls}
+                         for (task, model, reason), calls in self._decisions.items()]
+        models = [{"model": model, "task": task, **self.stats.snapshot(model, task)}
+                  for task in sorted({d["task"] for d in decisions})
+                  for model in self.models(task.removesuffix(" multi"))]
+        return {"decisions": decisions, "models": models}
@@ -0,0 +1,137 @@
+import re
+
+import numpy as np
+
+# Near-duplicate detection by shingling: texts are compared by the Jaccard similarity of their sets of
+# 4-byte shingles, which catches reworded copies as well as exact repeats. Shingles are packed into
+# uint32 arrays, so building, MinHashing and comparing them is vectorized. MinHash signatures bucketed
+# by LSH bands pick the candidates, so each new text is compared exactly with a handful of accepted
+# ones rather than all of them.
+SHINGLE_SIZE = 4 # Bytes, packed into one uint32 per shingle
+NEAR_DUPLICATE_THRESHOLD = 0.75
+BIN_BITS = 5
+SIGNATURE_BINS = 1 << BIN_BITS
+LSH_BANDS = 8 # Of 4 bins each: pairs at 0.75 similarity share a band ~95% of the time, at 0.9 ~99.9%
+MIX_MULTIPLIER = 0x9E3779B1 # Fibonacci hashing: the top bits of the product pick the bin
+EMPTY_BIN = 1 << 32
+MAX_HINT_EXAMPLES = 10 # Accepted versions listed in a diversity hint
+
+# Fields that make up a version's copy, per platform. The first is shown in diversity hints.
+DEDUPE_FIELDS = {
+    "email": ["subject_line", "headline", "body"],
+    "linkedin": ["headline", "introductory_text", "image_copy"],
+    "facebook": ["headline", "primary_text", "image_copy", "link_description"],
+}
+
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    return NON_WORD.sub(" ", str(text).lower()).strip()
+
+
+def shingles(text):
+    """Sorted unique uint32 array of the normalised text's 4-byte shingles (one padded shingle if shorter)."""
+    data = normalize(text).encode("utf-8")
+    if not data:
+        return np.empty(0, dtype=np.uint32)
+    data = np.frombuffer(data.ljust(SHINGLE_SIZE), dtype=np.uint8).astype(np.uint32)
+    return np.unique((data[:-3] << 24) | (data[1:-2] << 16) | (data[2:-1] << 8) | data[3:])
+
+
+def jaccard(a, b):
+    if not a.size or not b.size:
+        return 0.0
+    overlap = np.intersect1d(a, b, assume_unique=True).size
+    return overlap / (a.size + b.size - overlap)
+
+
+def minhash_signature(shingle_set):
+    """
+    One-permutation MinHash: every shingle falls into one of SIGNATURE_BINS bins, which keep their
+    smallest mixed value. Empty bins (short texts) borrow from the next filled bin, tagged with the distance.
+    """
+    if not shingle_set.size:
+        return None
+    mixed = shingle_set * np.uint32(MIX_MULTIPLIER) # Wraps modulo 2**32
+    minimums = np.full(SIGNATURE_BINS, EMPTY_BIN, dtype=np.uint64)
+    np.minimum.at(minimums, mixed >> np.uint32(32 - BIN_BITS), mixed)
+    bins = [None if value == EMPTY_BIN else value for value in minimums.tolist()]
+    signature = []
+    for index in range(SIGNATURE_BINS):
+        distance = 0
+        while bins[(index + distance) % SIGNATURE_BINS] is None:
+            distance += 1
+        signature.append((bins[(index + distance) % SIGNATURE_BINS], distance))
+    return signature
+
+
+def _bands(signature):
+    rows = SIGNATURE_BINS // LSH_BANDS
+    return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(LSH_BANDS)]
+
+
+def row_text(platform, row):
+    return " ".join(str(row.get(field) or "") for field in DEDUPE_FIELDS.get(platform, []))
+
+
+class NearDuplicateIndex:
+    """
+    Accepted texts, grouped (e.g. by platform and objective). match() looks up the texts sharing an LSH
+    band with the new one and confirms them by exact Jaccard similarity, so hundreds of rows are
+    checked in milliseconds.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._entries = {} # group -> {key: (shingles, label)}
+        self._buckets = {} # (group, band, band values) -> [key]
+        self._last_sketch = (None, None, None) # add() usually follows match() for the same text
+
+    def _sketch(self, text):
+        if self._last_sketch[0] != text:
+            candidate = shingles(text)
+            self._last_sketch = (text, candidate, minhash_signature(candidate))
+        return self._last_sketch[1:]
+
+    def match(self, group, text):
+        """Returns (key, similarity) of the most similar accepted text at or above the threshold, or None."""
+        candidate, signature = self._sketch(text)
+        if signature is None:
+            return None
+        entries = self._entries.get(group, {})
+        keys = {key for band in _bands(signature) for key in self._buckets.get((group, *band), [])}
+        best = None
+        for key in keys:
+            similarity = jaccard(candidate, entries[key][0])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def add(self, group, key, text, label=""):
+        candidate, signature = self._sketch(text)
+        self._entries.setdefault(group, {})[key] = (candidate, label)
+        if signature is not None:
+            for band in _bands(signature):
+                self._buckets.setdefault((group, *band), []).append(key)
+
+    def labels(self, group):
+        return [label for _, label in self._entries.get(group, {}).values() if label]
+
+
+def is_near_duplicate(text, accepted_texts, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """True if `text` is at least `threshold` similar to any of `accepted_texts` (e.g. a Google headline list)."""
+    candidate = shingles(text)
+    return any(jaccard(candidate, shingles(other)) >= threshold for other in accepted_texts)
+
+
+def diversity_hint(accepted_labels, duplicate_label):
+    """Appended to a regenerated prompt so the new version takes a different angle from the accepted ones."""
+    examples = "\n".join(f"- {label}" for label in accepted_labels[-MAX_HINT_EXAMPLES:])
+    return f"""
+    Variety: other versions for this objective already use the angles below, and a draft that came out
+    too close to them ("{duplicate_label}") was rejected. Write this version with a clearly different hook,
+    angle and wording (e.g. a different benefit, proof point, pain point or audience segment).
+    Existing versions:
+{examples}
+    """
@@ -0,0 +1,429 @@
+"""
+Headless scrape -> extract -> generate -> export pipeline for many companies at once.
+
+Usage:
+    OPENAI_API_KEY=... python pipeline.py companies.csv --output-dir out [--workers 4] [--max-concurrent-requests 16]
+
+The CSV needs company_url, lead_objective and lead_objective_url columns. Optional columns:
+downloadable_material_url, downloadable_material_path, additional_material_path and num_content_pieces.
+One workbook is written per row, plus manifest.json summarising every row.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+
+from openai import OpenAI
+
+from ai_content_generator import DEFAULT_MODEL, MODEL_ROUTES as GENERATION_MODEL_ROUTES, compile_all_prompts, generate_all_content
+from document_cache import extract_document_text_cached
+from excel_formatter import create_excel_file_streaming
+from model_routing import ModelRouter
+from exporters import EXPORTERS, StreamingExport
+from rate_limiter import RateLimiter
+from reporting import CollectingReporter
+from run_manifest import RunManifest
+from scraper import MODEL_ROUTES as KEY_INFO_MODEL_ROUTES
+from scraper import extract_key_info_from_text, scrape_downloadable_material_text, scrape_website_text
+from site_crawler import DEFAULT_MAX_PAGES, crawl_site
+from stage_cache import company_info_key, context_key, downloadable_context_key, file_fingerprint, get_stage_cache
+from telemetry import METRICS_FORMATS, RunTelemetry, write_metrics
+from utils import add_http_if_missing, format_company_name_for_filename
+
+DEFAULT_WORKERS = 4 # Companies processed at the same time
+DEFAULT_MAX_CONCURRENT_REQUESTS = 16 # OpenAI calls in flight across all companies
+DEFAULT_NUM_CONTENT_PIECES = 10
+MANIFEST_FILENAME = "manifest.json"
+
+REQUIRED_COLUMNS = ("company_url", "lead_objective", "lead_objective_url")
+
+logger = logging.getLogger("ad_content_generator.pipeline")
+
+# Output paths claimed by rows still running, so two rows for the same company/objective don't pick the same file
+_claimed_paths = set()
+_claimed_paths_lock = threading.Lock()
+
+
+@dataclass
+class RunOptions:
+    """
+    How run_company processes a row; run_pipeline applies the same options to every row.
+    `use_scrape_cache` defaults to `use_cache`; use_scrape_cache=False refreshes the scraped stages and
+    use_cache=False the company info (see run_company's `stage_cache`).
+    With `reuse_slots` every generated item is recorded in the run manifest (see run_manifest) and reused
+    by later runs for the same company and lead objective while its inputs are unchanged, so e.g. raising
+    the number of content pieces only generates the new versions; entry["slots"] has the counts.
+    With `route_models` each prompt type gets its model from the routing tables of ai_content_generator
+    and scraper, falling back along each table's chain on slow or failing models (see model_routing);
+    otherwise `model` is used for every call. The run's decisions and model stats land in entry["routing"].
+    With a `metrics_format` (one of telemetry.METRICS_FORMATS) the run's metrics are written next to the workbook.
+    """
+    model: str = DEFAULT_MODEL
+    route_models: bool = True
+    use_cache: bool = True
+    use_scrape_cache: bool | None = None
+    crawl: bool = False
+    max_crawl_pages: int = DEFAULT_MAX_PAGES
+    chunked_key_info: bool = True
+    multi_item: bool = False
+    prefix_cache: bool = False
+    structured_outputs: bool = True
+    dedupe: bool = True
+    reuse_slots: bool = True
+    max_concurrency: int = DEFAULT_MAX_CONCURRENT_REQUESTS
+    export_formats: tuple = ()
+    metrics_format: str | None = None
+
+    @property
+    def scrape_cache_enabled(self):
+        return self.use_cache if self.use_scrape_cache is None else self.use_scrape_cache
+
+
+def read_companies_csv(path):
+    """Reads pipeline rows from a CSV file. Raises ValueError if a required column is missing."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} is missing required column(s): {', '.join(missing)}")
+        return [{key: (value or "").strip() for key, value in row.items() if key} for row in reader]
+
+
+def _read_document(path):
+    with open(path, "rb") as f:
+        return extract_document_text_cached(f, os.path.basename(path))
+
+
+def _claim_unique_path(path):
+    """Appends _2, _3, ... so two rows for the same company/objective don't overwrite each other. See _release_path."""
+    base, ext = os.path.splitext(path)
+    with _claimed_paths_lock:
+        candidate, n = path, 1
+        while candidate in _claimed_paths or os.path.exists(candidate):
+            n += 1
+            candidate = f"{base}_{n}{ext}"
+        _claimed_paths.add(candidate)
+    return candidate
+
+
+def _release_path(path):
+    """Ends a claim once the row has written its file (which then blocks the name by existing) or failed."""
+    with _claimed_paths_lock:
+        _claimed_paths.discard(path)
+
+
+def build_router(options):
+    """The ModelRouter for one run with `options` (a RunOptions), or None when every call uses options.model."""
+    if not options.route_models:
+        return None
+    return ModelRouter({**GENERATION_MODEL_ROUTES, **KEY_INFO_MODEL_ROUTES}, options.model)
+
+
+def prepare_company_context(row, client, options, reporter, telemetry, router=None, rate_limiter=None, stage_cache=None,
+                            status=None, cached_stages=None):
+    """
+    The scrape and extract stages of run_company, also used by the app's batch flow: the website context
+    (plus any additional material), key company info and downloadable material context of a row, each
+    reused from `stage_cache` when its inputs are unchanged (appended to `cached_stages`). Key info is
+    extracted through `router` (see build_router) and keyed by its model chain. `status(message, progress)`
+    receives stage updates. Returns {"context", "company_info", "downloadable_material_context",
+    "downloadable_material_url"}, or None once the failure has been reported to `reporter`.
+    """
+    company_url = add_http_if_missing(row.get("company_url", ""))
+    use_cache, use_scrape_cache = options.use_cache, options.scrape_cache_enabled
+
+    def cached_stage(stage, key, compute, refresh):
+        if stage_cache is None:
+            return compute()
+        value, cached = stage_cache.get_or_compute(stage, key, compute, refresh=refresh)
+        if cached and cached_stages is not None:
+            cached_stages.append(stage)
+        return value
+
+    # 1. Website text, plus any additional material
+    if status:
+        status("Scraping client's website...", 0.0)
+    with telemetry.span("scrape"):
+
+        def scrape_context():
+            if options.crawl:
+                crawled = crawl_site(company_url, max_pages=options.max_crawl_pages, use_cache=use_scrape_cache)
+                for error in crawled["errors"]:
+                    reporter.warning(f"Could not crawl {error['url']}: {error['error']}")
+                website_text = crawled["text"]
+            else:
+                website_text = scrape_website_text(company_url, use_cache=use_scrape_cache, reporter=reporter)
+            if not website_text:
+                return ""
+            additional_text = _read_document(row["additional_material_path"]) if row.get("additional_material_path") else ""
+            return website_text + "\n\n--- Additional Material ---\n" + additional_text
+
+        additional_fingerprint = file_fingerprint(row["additional_material_path"]) if row.get("additional_material_path") else None
+        combined_context = cached_stage(
+            "context", context_key(company_url, options.crawl, options.max_crawl_pages, additional_fingerprint),
+            scrape_context, refresh=not use_scrape_cache
+        )
+    if not combined_context:
+        reporter.error("Failed to scrape website.")
+        return None
+
+    # 2. Key company info
+    if status:
+        status("Extracting key company information using AI...", 0.2)
+    with telemetry.span("extract"):
+
+        def extract_company_info():
+            extracted = extract_key_info_from_text(combined_context, client, options.model, use_cache=use_cache, reporter=reporter,
+                                                   rate_limiter=rate_limiter, chunked=options.chunked_key_info,
+                                                   usage_tracker=telemetry.usage, router=router)
+            if not extracted or "Error" in extracted.get("company_name", "Error"):
+                return None # Not cached, so the next run tries again
+            return extracted
+
+        company_info = cached_stage(
+            "company_info", company_info_key(router.models("key_info") if router else options.model, options.chunked_key_info,
+                                             combined_context),
+            extract_company_info, refresh=not use_cache
+        )
+        if not company_info:
+            reporter.error("Failed to extract key company information.")
+            return None
+
+        downloadable_material_url = add_http_if_missing(row.get("downloadable_material_url", ""))
+        downloadable_material_context = ""
+        if row.get("downloadable_material_path"):
+            downloadable_material_context = _read_document(row["downloadable_material_path"])
+            downloadable_material_url = downloadable_material_url or "Uploaded Material"
+        elif downloadable_material_url:
+            downloadable_material_context = cached_stage(
+                "downloadable_context", downloadable_context_key(downloadable_material_url),
+                lambda: scrape_downloadable_material_text(downloadable_material_url, use_cache=use_scrape_cache, reporter=reporter),
+                refresh=not use_scrape_cache
+            )
+    return {"context": combined_context, "company_info": company_info,
+            "downloadable_material_context": downloadable_material_context,
+            "downloadable_material_url": downloadable_material_url}
+
+
+def run_company(row, client, output_dir, options=None, rate_limiter=None, stage_cache=None, reporter=None,
+                usage_tracker=None, telemetry=None, status_callback=None, result_callback=None, company_info_callback=None):
+    """
+    Runs the full flow for one CSV row with `options` (a RunOptions) and writes its workbook (and any
+    columnar exports) to `output_dir`. Returns a manifest entry; failures are recorded in it rather than raised.
+    `status_callback(message, progress)` receives stage updates with progress from 0 to 1 (message is None
+    for progress-only updates), `company_info_callback(company_info)` is called once key info is extracted,
+    and `result_callback` is passed through to generate_all_content.
+    With a `stage_cache` (see stage_cache.StageCache) the scraped context, company info and downloadable
+    material context are reused when their inputs are unchanged.
+    Stage spans and per-call usage go to `telemetry` (a telemetry.RunTelemetry, created if not given); the
+    summary lands in entry["metrics"] and the workbook's Metrics sheet.
+    """
+    started = time.time()
+    company_url = add_http_if_missing(row.get("company_url", ""))
+    lead_objective = row.get("lead_objective", "")
+    lead_objective_url = add_http_if_missing(row.get("lead_objective_url", ""))
+    options = options or RunOptions()
+    reporter = reporter or CollectingReporter(context=company_url)
+    router = build_router(options)
+    telemetry = telemetry or RunTelemetry(usage_tracker, labels={"company_url": company_url, "lead_objective": lead_objective})
+    telemetry.router = telemetry.router or router
+
+    def status(message, progress):
+        reporter.info(message)
+        if status_callback:
+            status_callback(message, progress)
+    entry = {"company_url": company_url, "lead_objective": lead_objective, "status": "failed",
+             "company_name": None, "workbook": None, "exports": [], "timings": {}, "cached_stages": [], "metrics_file": None,
+             "slots": {"reused": 0, "generated": 0}, "routing": None}
+
+    workbook_path = None
+
+    def finish(status):
+        if workbook_path:
+            _release_path(workbook_path)
+        entry["status"] = status
+        entry["elapsed_seconds"] = round(time.time() - started, 2)
+        entry["timings"] = telemetry.stage_seconds()
+        entry["metrics"] = telemetry.summary()
+        entry["routing"] = router.summary() if router else None
+        entry["errors"] = list(getattr(reporter, "errors", []))
+        entry["warnings"] = list(getattr(reporter, "warnings", []))
+        return entry
+
+    missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+    if missing:
+        reporter.error(f"Row is missing {', '.join(missing)}.")
+        return finish("failed")
+
+    try:
+        # 1-2. Website text, plus any additional material, key company info and downloadable material context
+        prepared = prepare_company_context(row, client, options, reporter, telemetry, router, rate_limiter, stage_cache,
+                                           status, entry["cached_stages"])
+        if prepared is None:
+            return finish("failed")
+        combined_context, company_info = prepared["context"], prepared["company_info"]
+        downloadable_material_context = prepared["downloadable_material_context"]
+        downloadable_material_url = prepared["downloadable_material_url"]
+        entry["company_name"] = company_info.get("company_name")
+        entry["company_info"] = company_info
+        if company_info_callback:
+            company_info_callback(company_info)
+
+        # 3. Prompts and content
+        with telemetry.span("generate"):
+            num_content_pieces = int(row.get("num_content_pieces") or DEFAULT_NUM_CONTENT_PIECES)
+            all_prompts = compile_all_prompts(
+                company_info, lead_objective, lead_objective_url, downloadable_material_context,
+                downloadable_material_url, num_content_pieces, combined_context, multi_item=options.multi_item,
+                prefix_cache=options.prefix_cache
+            )
+            basename = f"{format_company_name_for_filename(company_info.get('company_name'))}_{lead_objective.lower().replace(' ', '_')}"
+            workbook_path = _claim_unique_path(os.path.join(output_dir, basename + ".xlsx"))
+            basename = os.path.splitext(os.path.basename(workbook_path))[0]
+
+            streaming_export = StreamingExport(output_dir, basename, options.export_formats) if options.export_formats else None
+
+            def on_result(platform, row_index, result_row):
+                if streaming_export:
+                    streaming_export.add_result(platform, row_index, result_row)
+                if result_callback:
+                    result_callback(platform, row_index, result_row)
+
+            def generation_progress(value):
+                if status_callback: # Progress only; per-call messages go to the reporter
+                    status_callback(None, 0.4 + 0.5 * value)
+
+            status("Generating tailored content with AI...", 0.4)
+            run_manifest = RunManifest(company_url, lead_objective) if options.reuse_slots else None
+            content_data = generate_all_content(
+                all_prompts, client, generation_progress, reporter.info, options.model,
+                max_concurrency=options.max_concurrency, rate_limiter=rate_limiter, use_cache=options.use_cache,
+                result_callback=on_result, reporter=reporter, usage_tracker=telemetry.usage,
+                structured_outputs=options.structured_outputs, dedupe=options.dedupe, run_manifest=run_manifest, router=router
+            )
+            if run_manifest is not None:
+                entry["slots"] = run_manifest.summary()
+            entry["usage"] = telemetry.usage.summary()
+            if streaming_export:
+                entry["exports"] = streaming_export.close()
+
+        # 4. Workbook, with the metrics of every stage before it
+        status("Formatting content into Excel file...", 0.9)
+        with telemetry.span("export"):
+            with open(workbook_path, "wb") as f:
+                create_excel_file_streaming(content_data, company_info.get("company_name"), lead_objective, company_info,
+                                            output=f, metrics=telemetry.summary())
+            entry["workbook"] = workbook_path
+        if options.metrics_format:
+            entry["metrics_file"] = write_metrics(telemetry.summary(), os.path.join(output_dir, basename + "_metrics"),
+                                                  options.metrics_format)
+    except Exception as e:
+        reporter.error(f"Pipeline failed: {e}")
+        return finish("failed")
+    status("Done.", 1.0)
+    return finish("ok")
+
+
+def run_pipeline(rows, client, output_dir, options=None, workers=DEFAULT_WORKERS,
+                 max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS, rate_limiter=None, stage_cache=None,
+                 progress_callback=None):
+    """
+    Runs run_company with `options` (a RunOptions) for every row on a pool of `workers` threads. All rows
+    share one rate limiter and `stage_cache`, so at most `max_concurrent_requests` OpenAI calls are in flight
+    across the whole run.
+    `progress_callback(done, total, entry)` is called as each row finishes.
+    Writes manifest.json to `output_dir` and returns the manifest dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rate_limiter = rate_limiter or RateLimiter(max_in_flight=max_concurrent_requests)
+    options = replace(options or RunOptions(), max_concurrency=max_concurrent_requests)
+    started = time.time()
+    entries = [None] * len(rows)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(run_company, row, client, output_dir, options, rate_limiter=rate_limiter,
+                            stage_cache=stage_cache): index
+            for index, row in enumerate(rows)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            entries[index] = dict(future.result(), row=index + 1)
+            logger.info("Finished row %d/%d (%s): %s", index + 1, len(rows), entries[index]["company_url"], entries[index]["status"])
+            if progress_callback:
+                progress_callback(done, len(rows), entries[index])
+
+    manifest = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "elapsed_seconds": round(time.time() - started, 2),
+        "total": len(rows),
+        "succeeded": sum(1 for entry in entries if entry["status"] == "ok"),
+        "failed": sum(1 for entry in entries if entry["status"] != "ok"),
+        "rows": entries,
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate ad content for every company in a CSV file.")
+    parser.add_argument("csv_path", help="CSV with company_url, lead_objective and lead_objective_url columns")
+    parser.add_argument("--output-dir", default="output", help="Where workbooks and manifest.json are written")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Companies processed in parallel")
+    parser.add_argument("--max-concurrent-requests", type=int, default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                        help="OpenAI calls in flight across all companies")
+    parser.add_argument("--model", help="Use this model for every call instead of routing each prompt type "
+                                         f"to its own model (default for unrouted calls: {DEFAULT_MODEL})")
+    parser.add_argument("--formats", nargs="*", default=[], choices=sorted(EXPORTERS),
+                        help="Columnar exports written next to each workbook")
+    parser.add_argument("--crawl", action="store_true", help="Crawl several pages of each site instead of the home page")
+    parser.add_argument("--max-crawl-pages", type=int, default=DEFAULT_MAX_PAGES)
+    parser.add_argument("--truncate-key-info-context", action="store_true",
+                        help="Extract key info from the first 15,000 characters only instead of the full context in chunks")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Start every prompt with a shared company brief so provider-side prompt caching applies")
+    parser.add_argument("--no-structured-outputs", action="store_true",
+                        help="Ask for plain JSON instead of per-platform JSON schemas (for models without structured outputs)")
+    parser.add_argument("--no-dedupe", action="store_true", help="Keep near-duplicate versions instead of regenerating them")
+    parser.add_argument("--multi-item", action="store_true", help="Generate all versions per platform/objective in one call")
+    parser.add_argument("--metrics", choices=sorted(METRICS_FORMATS), default="json",
+                        help="Format of the per-company metrics file written next to each workbook")
+    parser.add_argument("--no-reuse-slots", action="store_true",
+                        help="Generate every item instead of reusing unchanged ones from earlier runs")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the completion and scrape caches for reads")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("OPENAI_API_KEY is not set.")
+
+    rows = read_companies_csv(args.csv_path)
+    # Retries are handled by the shared resilience layer (backoff, Retry-After, circuit breaker)
+    client = OpenAI(api_key=api_key, max_retries=0)
+    options = RunOptions(
+        model=args.model or DEFAULT_MODEL, route_models=args.model is None, use_cache=not args.no_cache, crawl=args.crawl,
+        max_crawl_pages=args.max_crawl_pages, multi_item=args.multi_item, export_formats=tuple(args.formats),
+        chunked_key_info=not args.truncate_key_info_context, prefix_cache=args.prefix_cache, metrics_format=args.metrics,
+        structured_outputs=not args.no_structured_outputs, dedupe=not args.no_dedupe, reuse_slots=not args.no_reuse_slots
+    )
+    manifest = run_pipeline(
+        rows, client, args.output_dir, options, workers=args.workers, max_concurrent_requests=args.max_concurrent_requests,
+        stage_cache=get_stage_cache(), # Rows for the same company share one scrape and extraction
+        progress_callback=lambda done, total, entry: print(f"[{done}/{total}] {entry['company_url']}: {entry['status']}")
+    )
+    print(f"{manifest['succeeded']} of {manifest['total']} companies succeeded. "
+          f"Manifest: {os.path.join(args.output_dir, MANIFEST_FILENAME)}")
+    return 0 if manifest["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
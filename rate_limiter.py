@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Conservative defaults that sit comfortably inside a typical gpt-4o-mini tier.
+# Raise them if your OpenAI organisation has higher limits.
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200000
+
+# Organisation-wide budget shared by every session of a deployment (see get_scheduler).
+SHARED_REQUESTS_PER_MINUTE = int(os.environ.get("OPENAI_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE))
+SHARED_TOKENS_PER_MINUTE = int(os.environ.get("OPENAI_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE))
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+        self._last_refill = now
+
+    def wait_time(self, amount=1):
+        """Seconds until `amount` tokens are available, without taking them (0 if they are now)."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            return max(0.0, (amount - self._tokens) / self.rate_per_second)
+
+    def try_acquire(self, amount=1):
+        """Takes `amount` tokens if available. Returns seconds to wait otherwise (0 on success)."""
+        amount = min(amount, self.capacity) # A single oversized request must still be able to pass
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate_per_second
+
+    def acquire(self, amount=1):
+        """Blocks until `amount` tokens have been taken from the bucket."""
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Combined requests/min and tokens/min limiter for OpenAI calls. With `max_in_flight`, it also
+    caps how many calls run at once across every thread sharing it (see `request`).
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_in_flight=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+
+    def acquire(self, estimated_tokens=0):
+        """Blocks until one request slot and `estimated_tokens` tokens are available."""
+        self.requests.acquire(1)
+        if estimated_tokens:
+            self.tokens.acquire(estimated_tokens)
+
+    @contextmanager
+    def request(self, estimated_tokens=0):
+        """Holds an in-flight slot (if capped) for the duration of one call, after pacing it with acquire()."""
+        if self._in_flight is None:
+            self.acquire(estimated_tokens)
+            yield
+            return
+        with self._in_flight:
+            self.acquire(estimated_tokens)
+            yield
+
+
+class FairScheduler:
+    """
+    One requests/min and tokens/min budget shared by every session in the process (e.g. each browser
+    session of the app), so together they stay inside the organisation's rate limit. Waiting calls are
+    queued per session and granted round-robin across sessions: a session with many calls queued can't
+    starve one with a few. With `max_in_flight`, it also caps calls running at once across all sessions.
+    Sessions use it through the RateLimiter-compatible view returned by session().
+    """
+
+    def __init__(self, requests_per_minute=SHARED_REQUESTS_PER_MINUTE, tokens_per_minute=SHARED_TOKENS_PER_MINUTE,
+                 max_in_flight=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._queues = {} # session -> deque of waiting calls; dict order is the round-robin order
+        self._waited = {} # session -> (calls granted, total seconds waited)
+        self._cond = threading.Condition()
+
+    def _dispatch(self):
+        """
+        Grants waiting calls in round-robin order while budget allows. Called with the lock held by any
+        waiting thread. Returns seconds until the budget refills enough for the next call, or None if
+        nothing is waiting or the next call waits for an in-flight slot.
+        """
+        granted = False
+        wait = None
+        while self._queues:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                break
+            session, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(ticket["tokens"]) if ticket["tokens"] else 0.0)
+            if wait > 0:
+                break
+            wait = None
+            self.requests.try_acquire(1)
+            if ticket["tokens"]:
+                self.tokens.try_acquire(ticket["tokens"])
+            queue.popleft()
+            del self._queues[session]
+            if queue: # Back of the rotation
+                self._queues[session] = queue
+            ticket["granted"] = True
+            self._in_flight += 1
+            calls, waited = self._waited.get(session, (0, 0.0))
+            self._waited[session] = (calls + 1, waited + time.monotonic() - ticket["queued_at"])
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        return wait
+
+    def _start(self, session, estimated_tokens):
+        ticket = {"tokens": estimated_tokens, "queued_at": time.monotonic(), "granted": False}
+        with self._cond:
+            self._queues.setdefault(session, deque()).append(ticket)
+            while True:
+                wait = self._dispatch()
+                if ticket["granted"]:
+                    return
+                self._cond.wait(timeout=wait)
+
+    def _finish(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._dispatch()
+            self._cond.notify_all()
+
+    def acquire(self, session, estimated_tokens=0):
+        """Blocks until it is `session`'s turn and one request and `estimated_tokens` tokens are available."""
+        self._start(session, estimated_tokens)
+        self._finish()
+
+    @contextmanager
+    def request(self, session, estimated_tokens=0):
+        """Holds an in-flight slot for the duration of one call, once acquired in `session`'s turn."""
+        self._start(session, estimated_tokens)
+        try:
+            yield
+        finally:
+            self._finish()
+
+    def session(self, session):
+        return SessionRateLimiter(self, session)
+
+    def status(self, session=None):
+        """
+        Queue state for display: calls queued overall and for `session`, the position of the session's
+        next call in the round-robin order (1 = next), an estimate of its wait in seconds from the calls
+        ahead of it, and the average wait of the session's calls so far.
+        """
+        with self._cond:
+            sessions = list(self._queues)
+            queue = self._queues.get(session) or ()
+            status = {
+                "sessions_waiting": len(sessions),
+                "queued": sum(len(q) for q in self._queues.values()),
+                "in_flight": self._in_flight,
+                "session_queued": len(queue),
+                "position": None,
+                "estimated_wait_seconds": 0.0,
+            }
+            if queue:
+                ahead = sessions[:sessions.index(session) + 1] # Every session ahead gets one call first
+                ahead_tokens = sum(self._queues[s][0]["tokens"] for s in ahead)
+                status["position"] = len(ahead)
+                status["estimated_wait_seconds"] = round(max(self.requests.wait_time(len(ahead)),
+                                                             self.tokens.wait_time(ahead_tokens)), 1)
+            calls, waited = self._waited.get(session, (0, 0.0))
+        status["average_wait_seconds"] = round(waited / calls, 2) if calls else 0.0
+        return status
+
+
+class SessionRateLimiter:
+    """One session's view of a FairScheduler, usable anywhere a RateLimiter is (acquire/request)."""
+
+    def __init__(self, scheduler, session):
+        self.scheduler = scheduler
+        self.session = session
+
+    def acquire(self, estimated_tokens=0):
+        self.scheduler.acquire(self.session, estimated_tokens)
+
+    def request(self, estimated_tokens=0):
+        return self.scheduler.request(self.session, estimated_tokens)
+
+    def status(self):
+        return self.scheduler.status(self.session)
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """
+    Returns the process-wide scheduler, creating it on first use. Its budget comes from
+    OPENAI_REQUESTS_PER_MINUTE and OPENAI_TOKENS_PER_MINUTE, which should match the organisation's limits.
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = FairScheduler()
+        return _default_scheduler
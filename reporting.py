@@ -0,0 +1,78 @@
+import logging
+
+logger = logging.getLogger("ad_content_generator")
+
+
+class Reporter:
+    """
+    Receives user-facing errors and warnings from the scraping and generation code.
+    The base class logs them; StreamlitReporter also shows them in the app.
+    `details` carries supporting text such as a malformed AI response.
+    """
+
+    def __init__(self, context=""):
+        self.context = context # Prefixed to log lines, e.g. the company a pipeline row belongs to
+
+    def _prefixed(self, message):
+        return f"[{self.context}] {message}" if self.context else message
+
+    def error(self, message, details=None):
+        logger.error(self._prefixed(message))
+        if details:
+            logger.debug("%s details:\n%s", self._prefixed(message), details)
+
+    def warning(self, message):
+        logger.warning(self._prefixed(message))
+
+    def info(self, message):
+        logger.info(self._prefixed(message))
+
+
+class CollectingReporter(Reporter):
+    """Logs like Reporter and also keeps errors and warnings so they can be written to a run manifest."""
+
+    def __init__(self, context=""):
+        super().__init__(context)
+        self.errors = []
+        self.warnings = []
+
+    def error(self, message, details=None):
+        super().error(message, details)
+        self.errors.append(message)
+
+    def warning(self, message):
+        super().warning(message)
+        self.warnings.append(message)
+
+
+class StreamlitReporter(Reporter):
+    """Shows errors and warnings as Streamlit widgets, as the app always has."""
+
+    def error(self, message, details=None):
+        import streamlit as st
+        st.error(message)
+        if details:
+            st.text_area("Problematic AI Response:", details, height=150)
+
+    def warning(self, message):
+        import streamlit as st
+        st.warning(message)
+
+    def info(self, message):
+        import streamlit as st
+        st.info(message)
+
+
+def _in_streamlit():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return False
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+
+def get_reporter(reporter=None):
+    """Returns `reporter` if given, else a StreamlitReporter inside a Streamlit script run and a logging Reporter otherwise."""
+    if reporter is not None:
+        return reporter
+    return StreamlitReporter() if _in_streamlit() else Reporter()
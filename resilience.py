@@ -0,0 +1,204 @@
+import email.utils
+import random
+import threading
+import time
+
+import openai
+import requests
+
+# Defaults for call_with_retries. Delays are in seconds.
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+MAX_RETRY_AFTER = 60.0 # Never honour a Retry-After longer than this
+
+# Circuit breaker defaults: open after this many consecutive failures, probe again after the cooldown.
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class RetryBudget:
+    """Caps the total number of retries across a run so a bad upstream can't multiply its cost."""
+
+    def __init__(self, max_retries):
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """Takes one retry from the budget. Returns False once the budget is spent."""
+        with self._lock:
+            if self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe after `reset_timeout`."""
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go ahead now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                _stats.increment("breaker_trips")
+
+
+class _Stats:
+    """Process-wide resilience counters."""
+
+    def __init__(self):
+        self._counts = {"retries": 0, "breaker_trips": 0, "breaker_rejections": 0, "budget_exhausted": 0, "gave_up": 0}
+        self._lock = threading.Lock()
+
+    def increment(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+_stats = _Stats()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Returns the shared circuit breaker for an upstream, e.g. 'openai' or 'scrape:example.com'."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def resilience_stats():
+    """Retry/breaker counters plus the state of every breaker."""
+    stats = _stats.snapshot()
+    with _breakers_lock:
+        stats["breakers"] = {name: {"state": b.state, "trips": b.trips} for name, b in _breakers.items()}
+    return stats
+
+
+def _response_of(exc):
+    """HTTP response attached to an OpenAI or requests exception, if any."""
+    return getattr(exc, "response", None)
+
+
+def is_retryable(exc):
+    """Transient failures worth retrying: timeouts, connection errors, 429 and 5xx responses."""
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError,
+                        requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(exc, requests.exceptions.HTTPError):
+        response = _response_of(exc)
+        return response is not None and response.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def retry_after_seconds(exc):
+    """Parses a Retry-After header (seconds or HTTP date) from the failed response, if present."""
+    response = _response_of(exc)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value) if value else None
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """Full-jitter exponential backoff for the given retry attempt (1-based)."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def call_with_retries(func, *args, breaker=None, retry_budget=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                      base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY, **kwargs):
+    """
+    Calls `func(*args, **kwargs)`, retrying transient failures with jittered exponential backoff.
+    A Retry-After header on the failed response takes precedence over the computed delay.
+    Raises CircuitOpenError without calling `func` while `breaker` is open, and stops retrying
+    once `retry_budget` is spent. Non-retryable errors are raised immediately.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None and not breaker.allow():
+            _stats.increment("breaker_rejections")
+            raise CircuitOpenError(f"Circuit breaker '{breaker.name}' is open; skipping call.")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            retryable = is_retryable(e)
+            if breaker is not None and retryable:
+                breaker.record_failure()
+            elif breaker is not None: # The upstream answered; the request itself was bad
+                breaker.record_success()
+            if not retryable or attempt >= max_attempts:
+                if retryable:
+                    _stats.increment("gave_up")
+                raise
+            if retry_budget is not None and not retry_budget.consume():
+                _stats.increment("budget_exhausted")
+                raise
+            _stats.increment("retries")
+            delay = retry_after_seconds(e)
+            delay = min(delay, MAX_RETRY_AFTER) if delay is not None else backoff_delay(attempt, base_delay, max_delay)
+            time.sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
@@ -0,0 +1,121 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from completion_cache import CACHE_DIR
+
+RUN_MANIFEST_PATH = os.path.join(CACHE_DIR, "run_manifests.sqlite3")
+
+
+def slot_id(platform, objective, version):
+    """Stable identity of one generated item, independent of how many versions a run asks for."""
+    return f"{platform}/{objective}/V{version}"
+
+
+def prompt_fingerprint(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def slot_fingerprint(model, input_fingerprint, **options):
+    """Fingerprint of everything that shapes a slot's output: the model, its inputs and generation options."""
+    payload = json.dumps([model, input_fingerprint, options], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunManifestStore:
+    """
+    SQLite-backed record of the final row (after repairs and dedupe) of every generated slot, keyed by
+    run scope (company and lead objective) and slot ID, with the fingerprint of the inputs it was made from.
+    Each slot keeps only its latest row, so the store grows with the number of distinct slots, not runs.
+    """
+
+    def __init__(self, path=RUN_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            " scope TEXT, slot TEXT, fingerprint TEXT, row TEXT, updated_at REAL, PRIMARY KEY (scope, slot))"
+        )
+        self._conn.commit()
+
+    def get(self, scope, slot, fingerprint):
+        """The stored row if the slot was last generated from the same fingerprint, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT row FROM slots WHERE scope = ? AND slot = ? AND fingerprint = ?", (scope, slot, fingerprint)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, scope, slot, fingerprint, row):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO slots (scope, slot, fingerprint, row, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (scope, slot, fingerprint, json.dumps(row, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def clear(self, scope=None):
+        """Drops every slot, or those of one scope. Returns the number removed."""
+        with self._lock:
+            if scope is None:
+                removed = self._conn.execute("DELETE FROM slots").rowcount
+            else:
+                removed = self._conn.execute("DELETE FROM slots WHERE scope = ?", (scope,)).rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            scopes, slots = self._conn.execute("SELECT COUNT(DISTINCT scope), COUNT(*) FROM slots").fetchone()
+        return {"scopes": scopes, "slots": slots}
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_run_manifest_store():
+    """Returns the process-wide run manifest store, creating it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = RunManifestStore()
+        return _default_store
+
+
+class RunManifest:
+    """
+    The slots of one company and lead objective. generate_all_content looks every slot up by its ID
+    and fingerprint before calling the API and records each final row, so raising num_content_pieces
+    or changing one input only generates the new or affected slots.
+    """
+
+    def __init__(self, company_url, lead_objective, store=None):
+        self.scope = hashlib.sha256(json.dumps([company_url, lead_objective]).encode("utf-8")).hexdigest()
+        self.store = store or get_run_manifest_store()
+        self.reused = []
+        self.generated = []
+        self._lock = threading.Lock()
+
+    def get(self, slot, fingerprint):
+        row = self.store.get(self.scope, slot, fingerprint)
+        if row is not None:
+            with self._lock:
+                self.reused.append(slot)
+        return row
+
+    def put(self, slot, fingerprint, row):
+        self.store.put(self.scope, slot, fingerprint, copy.deepcopy(row))
+        with self._lock:
+            self.generated.append(slot)
+
+    def summary(self):
+        with self._lock:
+            return {"reused": len(self.reused), "generated": len(self.generated)}
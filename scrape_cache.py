@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import threading
+import time
+
+from completion_cache import CACHE_DIR
+
+SCRAPE_CACHE_PATH = os.path.join(CACHE_DIR, "scrapes.sqlite3")
+
+DEFAULT_MAX_AGE_SECONDS = 3600 # Within this age a cached page is reused without touching the network
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024 # Least recently used pages are evicted past 100 MB
+
+
+class ScrapeCache:
+    """
+    SQLite-backed cache of fetched pages: raw response body, cleaned text and the
+    ETag/Last-Modified validators used for conditional revalidation.
+    """
+
+    def __init__(self, path=SCRAPE_CACHE_PATH, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0 # Served without a network request
+        self.revalidations = 0 # Served after a 304 Not Modified
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, raw BLOB, text TEXT, etag TEXT, last_modified TEXT,"
+            " size INTEGER, fetched_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages(accessed_at)")
+        self._conn.commit()
+
+    def get(self, url, max_age_seconds=None):
+        """
+        Returns the cached entry for `url` as a dict, or None. Its "fresh" flag says whether it is
+        younger than `max_age_seconds` (defaults to the cache's max age); fresh entries count as hits.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw, text, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+            raw, text, etag, last_modified, fetched_at = row
+            entry = {"raw": raw, "text": text, "etag": etag, "last_modified": last_modified, "fetched_at": fetched_at}
+            entry["fresh"] = self.is_fresh(entry, max_age_seconds)
+            if entry["fresh"]:
+                self.hits += 1
+        return entry
+
+    def is_fresh(self, entry, max_age_seconds=None):
+        """True if a cached entry is younger than `max_age_seconds` (defaults to the cache's max age)."""
+        max_age_seconds = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        return entry is not None and time.time() - entry["fetched_at"] < max_age_seconds
+
+    def set(self, url, raw, text, etag=None, last_modified=None):
+        """Stores a freshly downloaded page (counted as a miss) and evicts least recently used pages past `max_bytes`."""
+        now = time.time()
+        raw = raw or b""
+        size = len(raw) + len((text or "").encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, raw, text, etag, last_modified, size, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, raw, text, etag, last_modified, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+            self.misses += 1
+
+    def touch(self, url):
+        """Marks a cached page as revalidated now (after a 304 response)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+            self.revalidations += 1
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._conn.execute("SELECT url, size FROM pages ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+
+    def clear(self):
+        """Removes every cached page."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.commit()
+
+    def stats(self):
+        """Returns hit/revalidation/miss counters and the current page count and size."""
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"hits": self.hits, "revalidations": self.revalidations, "misses": self.misses,
+                "entries": entries, "bytes": total}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_scrape_cache():
+    """Returns the process-wide scrape cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ScrapeCache()
+        return _default_cache
@@ -1,44 +1,150 @@
 import requests
 from bs4 import BeautifulSoup
-import streamlit as st
 import json
 from openai import OpenAI
 import re
+from urllib.parse import urlparse
+
+from completion_cache import cached_completion_content
+from scrape_cache import get_scrape_cache
+from html_extractor import extract_text_streaming, is_text_content_type
+from resilience import CircuitOpenError, RetryBudget, call_with_retries, get_breaker
+from reporting import get_reporter
+from utils import estimate_tokens
+from key_info import extract_key_info_chunked
 
 # Use gpt-4o-mini as it's a capable and cost-effective recent model.
 # The user can change this if they have access to a specific "gpt-4.1-mini".
 DEFAULT_MODEL = "gpt-4o-mini"
 
-def scrape_website_text(url: str) -> str:
-    """Scrapes main textual content from a website URL."""
+# Model for key info extraction, in fallback order (see model_routing.ModelRouter). JSON extraction
+# from long context is handled well by small models; the limit is the p95 latency per call in seconds.
+MODEL_ROUTES = {
+    "key_info": {"models": ["gpt-4o-mini", "gpt-4.1-mini"], "max_p95_seconds": 30},
+}
+
+KEY_INFO_MAX_CHARS = 15000 # Text read by a single (non-chunked) key info extraction call
+KEY_INFO_EXPECTED_TOKENS = 1000 # Output budget reserved against tokens/min for key info extraction
+SCRAPE_MAX_ATTEMPTS = 3 # Page fetches give up sooner than API calls; the crawler has other pages to read
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+def html_to_text(html_content) -> str:
+    """
+    Extracts cleaned main text from raw HTML bytes or string with BeautifulSoup.
+    fetch_page uses the streaming, size-capped extractor in html_extractor instead;
+    this full-tree version is kept as the reference for benchmarks.
+    """
+    soup = BeautifulSoup(html_content, 'lxml') # 'lxml' is generally faster
+
+    # Remove script and style elements
+    for script_or_style in soup(["script", "style", "nav", "footer", "aside"]):
+        script_or_style.decompose()
+
+    # Get text
+    text = soup.get_text(separator=' ', strip=True)
+    
+    # Basic cleaning: reduce multiple spaces/newlines
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+def fetch_page(url: str, session: requests.Session | None = None, use_cache: bool = True,
+               max_age_seconds: float | None = None, retry_budget: RetryBudget | None = None) -> dict:
+    """
+    Fetches a page through the scrape cache and returns {"url", "text", "raw", "from_cache"}.
+    The body is streamed through the size-capped extractor; non-text responses are not downloaded.
+    Within `max_age_seconds` (defaults to the cache's max age) the cached page is returned
+    without a request; older entries are revalidated with If-None-Match/If-Modified-Since
+    and a 304 reuses the already-parsed text. Transient failures (timeouts, 429, 5xx) are retried
+    with backoff behind a per-host circuit breaker. Raises requests.exceptions.RequestException
+    or CircuitOpenError.
+    """
+    cache = get_scrape_cache()
+    cached = cache.get(url, max_age_seconds) if use_cache else None
+    if cached is not None and cached["fresh"]:
+        return {"url": url, "text": cached["text"], "raw": cached["raw"], "from_cache": True}
+
+    headers = dict(REQUEST_HEADERS)
+    if cached is not None:
+        if cached["etag"]:
+            headers['If-None-Match'] = cached["etag"]
+        if cached["last_modified"]:
+            headers['If-Modified-Since'] = cached["last_modified"]
+
+    def request_page():
+        response = (session or requests).get(url, headers=headers, timeout=10, stream=True)
+        if response.status_code != 304:
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                response.close()
+                raise
+        return response
+
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'lxml') # 'lxml' is generally faster
-
-        # Remove script and style elements
-        for script_or_style in soup(["script", "style", "nav", "footer", "aside"]):
-            script_or_style.decompose()
-
-        # Get text
-        text = soup.get_text(separator=' ', strip=True)
-        
-        # Basic cleaning: reduce multiple spaces/newlines
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error scraping website {url}: {e}")
+        response = call_with_retries(request_page, breaker=get_breaker(f"scrape:{urlparse(url).netloc.lower()}"),
+                                     retry_budget=retry_budget, max_attempts=SCRAPE_MAX_ATTEMPTS)
+        with response:
+            if response.status_code == 304 and cached is not None:
+                cache.touch(url)
+                return {"url": url, "text": cached["text"], "raw": cached["raw"], "from_cache": True}
+            content_type = response.headers.get('Content-Type', '')
+            if not is_text_content_type(content_type): # Don't download binaries just to find no text
+                return {"url": url, "text": "", "raw": b"", "from_cache": False, "skipped": content_type}
+            declared_encoding = requests.utils.get_encoding_from_headers(response.headers) if 'charset=' in content_type.lower() else None
+            extracted = extract_text_streaming(response.iter_content(chunk_size=64 * 1024), encoding=declared_encoding)
+    except (requests.exceptions.RequestException, CircuitOpenError):
+        if cached is not None: # Serve the stale copy rather than failing the whole run
+            return {"url": url, "text": cached["text"], "raw": cached["raw"], "from_cache": True, "stale": True}
+        raise
+    text = extracted["text"]
+    cache.set(url, extracted["raw"], text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return {"url": url, "text": text, "raw": extracted["raw"], "from_cache": False, "truncated": extracted["truncated"]}
+
+def scrape_website_text(url: str, use_cache: bool = True, max_age_seconds: float | None = None, reporter=None) -> str:
+    """Scrapes main textual content from a website URL, using the scrape cache (see fetch_page)."""
+    reporter = get_reporter(reporter)
+    try:
+        page = fetch_page(url, use_cache=use_cache, max_age_seconds=max_age_seconds)
+        if page.get("stale"):
+            reporter.warning(f"Could not refresh {url}; using the cached copy.")
+        return page["text"]
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        reporter.error(f"Error scraping website {url}: {e}")
         return ""
     except Exception as e:
-        st.error(f"An unexpected error occurred during website scraping: {e}")
+        reporter.error(f"An unexpected error occurred during website scraping: {e}")
         return ""
 
 
-def extract_key_info_from_text(text_content: str, openai_client: OpenAI, model: str = DEFAULT_MODEL) -> dict:
-    """Uses OpenAI to extract specific company info from text."""
+def extract_key_info_from_text(text_content: str, openai_client: OpenAI, model: str = DEFAULT_MODEL, use_cache: bool = True,
+                               reporter=None, rate_limiter=None, chunked: bool = False, usage_tracker=None,
+                               router=None) -> dict:
+    """
+    Uses OpenAI to extract specific company info from text. Identical requests are served from the completion cache.
+    A single call reads the first KEY_INFO_MAX_CHARS characters; with `chunked=True`, longer texts are read in full
+    via parallel per-chunk extractions that are merged (see key_info.extract_key_info_chunked).
+    Token usage of network calls is recorded in `usage_tracker` under platform "key_info".
+    With a `router` (see model_routing.ModelRouter, e.g. over MODEL_ROUTES) the model is picked for the
+    "key_info" task instead of using `model`.
+    """
+    reporter = get_reporter(reporter)
+    if router is not None:
+        model, _ = router.route("key_info")
+    if chunked and len(text_content) > KEY_INFO_MAX_CHARS:
+        merged = extract_key_info_chunked(text_content, openai_client, model, use_cache=use_cache,
+                                          reporter=reporter, rate_limiter=rate_limiter, usage_tracker=usage_tracker)
+        if merged:
+            return merged
+        reporter.error("OpenAI API calls failed during chunked company info extraction.")
+        return {
+            "company_name": "API Error", "tagline": "API Error", "mission_statement": "API Error",
+            "industry": "API Error", "offerings": [], "USPs": [],
+            "value_proposition": "API Error", "target_audience": "API Error",
+            "tone_of_voice": "API Error", "CTAs": []
+        }
     prompt = f"""
     Analyze the following text from a company's website and any provided additional materials.
     Extract the following information. If a piece of information is not found, use "Not found" or an empty list/string as appropriate.
@@ -60,23 +166,20 @@ def extract_key_info_from_text(text_content: str, openai_client: OpenAI, model:
 
     Text Content to Analyze (max 15000 chars for this extraction):
     ---
-    {text_content[:15000]}
+    {text_content[:KEY_INFO_MAX_CHARS]}
     ---
 
     Provide ONLY the JSON object. Do not include any explanatory text before or after the JSON.
     """
     try:
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        content = response.choices[0].message.content
+        content = cached_completion_content(openai_client, model, prompt, use_cache=use_cache, rate_limiter=rate_limiter,
+                                            estimated_tokens=estimate_tokens(prompt) + KEY_INFO_EXPECTED_TOKENS,
+                                            usage_tracker=usage_tracker, usage_label="key_info",
+                                            usage_tags={"platform": "key_info", "objective": "single call"})
         try:
             return json.loads(content)
         except json.JSONDecodeError as e:
-            st.error(f"Failed to parse JSON from company info extraction: {e}")
-            st.text_area("Problematic AI Response for Key Info Extraction:", content, height=200)
+            reporter.error(f"Failed to parse JSON from company info extraction: {e}", details=content)
             return {
                 "company_name": "Error", "tagline": "Error", "mission_statement": "Error",
                 "industry": "Error", "offerings": [], "USPs": [],
@@ -84,7 +187,7 @@ def extract_key_info_from_text(text_content: str, openai_client: OpenAI, model:
                 "tone_of_voice": "Error", "CTAs": []
             }
     except Exception as e:
-        st.error(f"OpenAI API call failed during company info extraction: {e}")
+        reporter.error(f"OpenAI API call failed during company info extraction: {e}")
         return {
             "company_name": "API Error", "tagline": "API Error", "mission_statement": "API Error",
             "industry": "API Error", "offerings": [], "USPs": [],
@@ -92,9 +195,9 @@ def extract_key_info_from_text(text_content: str, openai_client: OpenAI, model:
             "tone_of_voice": "API Error", "CTAs": []
         }
 
-def scrape_downloadable_material_text(url: str) -> str:
+def scrape_downloadable_material_text(url: str, use_cache: bool = True, reporter=None) -> str:
     """Scrapes text from a downloadable material URL (assuming it's a webpage)."""
     # This is similar to scrape_website_text. If it's a direct PDF/DOCX link,
     # it would need different handling (downloading and then parsing).
     # For now, assuming it's a webpage with text content.
-    return scrape_website_text(url)
\ No newline at end of file
+    return scrape_website_text(url, use_cache=use_cache, reporter=reporter)
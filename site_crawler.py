@@ -0,0 +1,225 @@
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urldefrag, urlparse
+
+import lxml.html
+import requests
+from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from resilience import RetryBudget
+from scraper import REQUEST_HEADERS, fetch_page
+
+# Crawl budgets. Whichever is hit first stops the crawl.
+DEFAULT_MAX_PAGES = 15
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_TIME_BUDGET_SECONDS = 30
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 4
+
+# Pages likely to hold key company info are crawled first.
+PRIORITY_KEYWORDS = ["about", "pricing", "product", "service", "solution", "platform", "feature",
+                     "customer", "case-stud", "why", "company", "team", "industr"]
+SKIPPED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".mp4", ".mp3",
+                      ".css", ".js", ".xml", ".ico", ".doc", ".docx", ".ppt", ".pptx", ".xls", ".xlsx")
+
+
+def normalize_url(url):
+    """Drops fragments and trailing slashes so the same page is only crawled once."""
+    url, _ = urldefrag(url)
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/") or "/"
+    return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower(), path=path).geturl()
+
+
+def _same_site(url, host):
+    netloc = urlparse(url).netloc.lower()
+    return netloc == host or netloc == "www." + host or "www." + netloc == host
+
+
+def _is_crawlable(url, host):
+    parsed = urlparse(url)
+    return (parsed.scheme in ("http", "https") and _same_site(url, host)
+            and not parsed.path.lower().endswith(SKIPPED_EXTENSIONS))
+
+
+def _priority(url):
+    """Lower sorts first: the home page, then pages matching PRIORITY_KEYWORDS, then shallow paths."""
+    path = urlparse(url).path.lower()
+    if path in ("", "/"):
+        return (0, 0)
+    keyword_rank = next((i for i, keyword in enumerate(PRIORITY_KEYWORDS) if keyword in path), len(PRIORITY_KEYWORDS))
+    return (1 + keyword_rank, path.count("/"))
+
+
+def extract_links(raw_html, base_url):
+    """Returns absolute hrefs found in a page."""
+    if not raw_html:
+        return []
+    try:
+        document = lxml.html.fromstring(raw_html)
+    except (etree.ParserError, ValueError):
+        return []
+    return [urljoin(base_url, href) for href in document.xpath("//a/@href") if href and not href.startswith(("mailto:", "tel:", "javascript:"))]
+
+
+def _parse_sitemap(content):
+    """Returns (page_urls, nested_sitemap_urls) from a sitemap or sitemap index document."""
+    try:
+        root = etree.fromstring(content, parser=etree.XMLParser(recover=True, resolve_entities=False, no_network=True))
+    except (etree.XMLSyntaxError, ValueError):
+        return [], []
+    if root is None:
+        return [], []
+    locs = [loc.text.strip() for loc in root.iter("{*}loc") if loc.text]
+    if etree.QName(root).localname == "sitemapindex":
+        return [], locs
+    return locs, []
+
+
+def discover_sitemap_urls(start_url, session, max_sitemaps=5, deadline=None):
+    """
+    Finds page URLs from robots.txt Sitemap entries and /sitemap.xml, following one level of sitemap indexes.
+    Only sitemaps on the start URL's site are fetched, and none once the monotonic `deadline` has passed.
+    """
+    base = f"{urlparse(start_url).scheme}://{urlparse(start_url).netloc}"
+    host = urlparse(start_url).netloc.lower()
+
+    def get(url):
+        timeout = 5 if deadline is None else min(5, deadline - time.monotonic())
+        if timeout <= 0:
+            return None
+        try:
+            response = session.get(url, headers=REQUEST_HEADERS, timeout=timeout)
+        except requests.exceptions.RequestException:
+            return None
+        return response if response.ok else None
+
+    sitemap_urls = []
+    robots = get(urljoin(base, "/robots.txt"))
+    if robots is not None:
+        sitemap_urls += [url for url in re.findall(r"(?im)^\s*sitemap:\s*(\S+)", robots.text) if _same_site(url, host)]
+    if not sitemap_urls:
+        sitemap_urls.append(urljoin(base, "/sitemap.xml"))
+
+    page_urls = []
+    seen = set()
+    while sitemap_urls and len(seen) < max_sitemaps:
+        sitemap_url = sitemap_urls.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        response = get(sitemap_url)
+        if response is None:
+            continue
+        pages, nested = _parse_sitemap(response.content)
+        page_urls += pages
+        sitemap_urls += [url for url in nested if _same_site(url, host)]
+    return page_urls
+
+
+def create_session(max_connections_per_host=DEFAULT_MAX_CONNECTIONS_PER_HOST):
+    """Pooled keep-alive session sized for the per-host connection limit."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections_per_host)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def crawl_site(start_url, max_pages=DEFAULT_MAX_PAGES, max_bytes=DEFAULT_MAX_BYTES,
+               time_budget_seconds=DEFAULT_TIME_BUDGET_SECONDS,
+               max_connections_per_host=DEFAULT_MAX_CONNECTIONS_PER_HOST,
+               use_cache=True, use_sitemap=True, session=None):
+    """
+    Crawls same-host pages starting from `start_url`, seeded from the sitemap and expanded via links.
+    Pages are fetched concurrently through the scrape cache, at most `max_connections_per_host` at a
+    time per host, skipping duplicate URLs and pages whose text was already seen. Stops at
+    `max_pages`, `max_bytes` of downloaded HTML or `time_budget_seconds` (which also covers sitemap
+    discovery), whichever comes first.
+    Returns {"text": combined text with per-page headers, "pages": [{"url", "chars", "bytes", "from_cache"}], "errors": [...]}.
+    """
+    start_url = normalize_url(start_url)
+    host = urlparse(start_url).netloc.lower()
+    deadline = time.monotonic() + time_budget_seconds
+    owns_session = session is None
+    session = session or create_session(max_connections_per_host)
+
+    host_limits = {}
+    host_limits_lock = threading.Lock()
+    retry_budget = RetryBudget(max_pages) # At most one retry per page on average across the crawl
+
+    def fetch_with_host_limit(url):
+        url_host = urlparse(url).netloc.lower()
+        with host_limits_lock:
+            limit = host_limits.setdefault(url_host, threading.Semaphore(max_connections_per_host))
+        with limit:
+            return fetch_page(url, session=session, use_cache=use_cache, retry_budget=retry_budget)
+
+    frontier = [start_url]
+    queued = {start_url}
+    if use_sitemap:
+        for url in discover_sitemap_urls(start_url, session, deadline=deadline):
+            url = normalize_url(url)
+            if _is_crawlable(url, host) and url not in queued:
+                queued.add(url)
+                frontier.append(url)
+
+    pages = []
+    texts = []
+    errors = []
+    seen_content = set()
+    bytes_downloaded = 0
+    executor = ThreadPoolExecutor(max_workers=max_connections_per_host)
+    try:
+        in_flight = {}
+        while True:
+            budget_left = (len(pages) + len(in_flight) < max_pages and bytes_downloaded < max_bytes
+                           and time.monotonic() < deadline)
+            if budget_left and frontier:
+                frontier.sort(key=_priority)
+                while frontier and len(in_flight) < max_connections_per_host and len(pages) + len(in_flight) < max_pages:
+                    url = frontier.pop(0)
+                    in_flight[executor.submit(fetch_with_host_limit, url)] = url
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, timeout=max(0.1, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done: # Time budget exhausted with requests still running
+                break
+            for future in done:
+                url = in_flight.pop(future)
+                try:
+                    page = future.result()
+                except Exception as e:
+                    errors.append({"url": url, "error": str(e)})
+                    continue
+
+                raw = page.get("raw") or b""
+                bytes_downloaded += 0 if page.get("from_cache") else len(raw)
+                for link in extract_links(raw, url):
+                    link = normalize_url(link)
+                    if _is_crawlable(link, host) and link not in queued:
+                        queued.add(link)
+                        frontier.append(link)
+
+                text = page.get("text") or ""
+                content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                if not text or content_hash in seen_content: # Duplicate page content under another URL
+                    continue
+                seen_content.add(content_hash)
+                pages.append({"url": url, "chars": len(text), "bytes": len(raw), "from_cache": page.get("from_cache", False)})
+                texts.append((url, text))
+    finally:
+        # Don't wait for stragglers past the time budget
+        executor.shutdown(wait=False, cancel_futures=True)
+        if owns_session:
+            session.close()
+
+    # Keep the output deterministic regardless of completion order
+    order = sorted(range(len(pages)), key=lambda i: (_priority(pages[i]["url"]), pages[i]["url"]))
+    pages = [pages[i] for i in order]
+    combined_text = "\n\n".join(f"--- Page: {texts[i][0]} ---\n{texts[i][1]}" for i in order)
+    return {"text": combined_text, "pages": pages, "errors": errors}
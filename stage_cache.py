@@ -0,0 +1,117 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from scrape_cache import DEFAULT_MAX_AGE_SECONDS
+
+DEFAULT_TTL_SECONDS = DEFAULT_MAX_AGE_SECONDS # Stage outputs go stale when their scraped pages would be revalidated
+DEFAULT_MAX_ENTRIES = 128
+
+STAGES = ("context", "company_info", "downloadable_context")
+
+
+def stage_cache_key(*parts):
+    """Hash of a stage's inputs. Long texts are hashed rather than compared, so keys stay small."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def context_key(company_url, crawl, max_crawl_pages, additional_material_fingerprint=None):
+    """Key of the scraped website text plus additional material."""
+    return stage_cache_key(company_url, bool(crawl), max_crawl_pages if crawl else None, additional_material_fingerprint)
+
+
+def company_info_key(model, chunked, combined_context):
+    """Key of the company info extracted from `combined_context`, so new scraped text is extracted again."""
+    return stage_cache_key(model, bool(chunked), hashlib.sha256(combined_context.encode("utf-8")).hexdigest())
+
+
+def downloadable_context_key(url):
+    return stage_cache_key(url)
+
+
+def file_fingerprint(path):
+    """SHA-256 of a file's bytes, so a re-uploaded copy of the same document hits the same key."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    In-memory cache of pipeline stage outputs (scraped context, company info, downloadable material
+    context) keyed by each stage's inputs and shared by every session in the process. Changing only
+    later-stage settings such as num_content_pieces therefore skips scraping and key info extraction.
+    Entries expire after `ttl_seconds`; least recently used entries are evicted past `max_entries`.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # (stage, key) -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, stage, key):
+        """Returns a copy of the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get((stage, key))
+            if entry is None or (self.ttl_seconds and time.time() - entry[0] > self.ttl_seconds):
+                self._entries.pop((stage, key), None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end((stage, key))
+            self.hits += 1
+            return copy.deepcopy(entry[1]) # Callers may mutate what they get back
+
+    def set(self, stage, key, value):
+        with self._lock:
+            self._entries[(stage, key)] = (time.time(), copy.deepcopy(value))
+            self._entries.move_to_end((stage, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, stage, key, compute, refresh=False):
+        """
+        Returns (value, cached). With refresh=True the cached value is ignored and replaced.
+        Empty results (failed scrapes or extractions) are not stored, so the next run retries them.
+        """
+        if not refresh:
+            value = self.get(stage, key)
+            if value is not None:
+                return value, True
+        value = compute() # Not under the lock; two sessions may compute the same key, which is harmless
+        if value:
+            self.set(stage, key, value)
+        return value, False
+
+    def invalidate(self, stage=None):
+        """Drops every entry, or only those of one stage. Returns the number removed."""
+        with self._lock:
+            doomed = [entry_key for entry_key in self._entries if stage is None or entry_key[0] == stage]
+            for entry_key in doomed:
+                del self._entries[entry_key]
+        return len(doomed)
+
+    def stats(self):
+        with self._lock:
+            per_stage = {name: sum(1 for entry_key in self._entries if entry_key[0] == name) for name in STAGES}
+        return {"hits": self.hits, "misses": self.misses, "entries": per_stage}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_stage_cache():
+    """Returns the process-wide stage cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = StageCache()
+        return _default_cache
@@ -1,35 +1,51 @@
 import streamlit as st
 from openai import OpenAI
 import os
+import json
 import time
 import io
+import shutil
+import tempfile
+import uuid
 
 # Import local modules
-from utils import (
-    add_http_if_missing, extract_text_from_pdf,
-    extract_text_from_pptx, get_file_extension,
-    format_company_name_for_filename
-)
-from scraper import (
-    scrape_website_text, extract_key_info_from_text,
-    scrape_downloadable_material_text
-)
-from ai_content_generator import (
-    compile_all_prompts, generate_all_content
-)
-from excel_formatter import create_excel_file
+from utils import add_http_if_missing, format_company_name_for_filename
+from ai_content_generator import compile_all_prompts
+from excel_formatter import PLATFORM_SHEET_SCHEMAS, IncrementalWorkbook, create_excel_file_streaming
+from exporters import export_content, flatten_result, zip_export_files
+from site_crawler import DEFAULT_MAX_PAGES
+from completion_cache import UsageTracker, get_completion_cache
+from resilience import resilience_stats
+from batch_generator import submit_prompts_batch, get_batch_status, collect_batch_results
+from job_runner import FINAL_STATUSES, get_job_runner
+from pipeline import RunOptions, build_router, prepare_company_context, run_company
+from rate_limiter import get_scheduler
+from reporting import get_reporter
+from stage_cache import STAGES, get_stage_cache
+from telemetry import RunTelemetry, metrics_to_json_log, metrics_to_prometheus
 
 # Use gpt-4o-mini as it's a capable and cost-effective recent model.
 # The user can change this if they have access to a specific "gpt-4.1-mini".
 # The prompt specified "gpt-4.1-mini", but "gpt-4o-mini" is a more standard recent model.
 AI_MODEL_NAME = "gpt-4o-mini" 
 
+INTERACTIVE_MODE_LABEL = "Interactive"
+BATCH_MODE_LABEL = "Batch (overnight, lower cost)"
+EXPORT_FORMAT_OPTIONS = {"CSV": "csv", "JSONL": "jsonl", "Parquet": "parquet"}
+JOB_POLL_INTERVAL_SECONDS = 2 # How often the page refreshes a running background job
+
 st.set_page_config(layout="wide", page_title="Marketing Content Generator")
 
 # --- Initialize OpenAI Client ---
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key):
+    """One client (and HTTP connection pool) per API key, shared across reruns and sessions."""
+    # Retries are handled by the shared resilience layer (backoff, Retry-After, circuit breaker)
+    return OpenAI(api_key=api_key, max_retries=0)
+
 try:
     openai_api_key = st.secrets["OPENAI_API_KEY"]
-    client = OpenAI(api_key=openai_api_key)
+    client = get_openai_client(openai_api_key)
 except KeyError:
     st.error("OpenAI API key not found. Please add it to your secrets.toml file.")
     st.stop()
@@ -51,10 +67,46 @@ if 'company_info' not in st.session_state:
     st.session_state.company_info = None
 if 'generation_time' not in st.session_state:
     st.session_state.generation_time = None
+if 'cache_stats' not in st.session_state:
+    st.session_state.cache_stats = None
+if 'usage_calls' not in st.session_state:
+    st.session_state.usage_calls = None
+if 'run_metrics' not in st.session_state:
+    st.session_state.run_metrics = None
+if 'generated_content' not in st.session_state:
+    st.session_state.generated_content = None
+if 'pending_batch_id' not in st.session_state:
+    st.session_state.pending_batch_id = None
+if 'export_zip_bytes' not in st.session_state:
+    st.session_state.export_zip_bytes = None
+if 'export_zip_filename' not in st.session_state:
+    st.session_state.export_zip_filename = ""
+if 'active_job_id' not in st.session_state:
+    st.session_state.active_job_id = None
+if 'loaded_job_id' not in st.session_state:
+    st.session_state.loaded_job_id = None
+if 'job_error' not in st.session_state:
+    st.session_state.job_error = None
+if 'scheduler_session' not in st.session_state:
+    # Every OpenAI call of this browser session goes through the process-wide scheduler under this ID,
+    # so concurrent sessions share one rate budget and take turns
+    st.session_state.scheduler_session = uuid.uuid4().hex[:12]
+session_rate_limiter = get_scheduler().session(st.session_state.scheduler_session)
 
 # --- Frontend Inputs ---
 st.sidebar.header("Client Inputs")
 company_url = st.sidebar.text_input("Company Website URL*", placeholder="e.g., www.example.com")
+crawl_site_pages = st.sidebar.checkbox(
+    "Crawl additional site pages",
+    value=False,
+    help="Also read pages found via the sitemap and same-site links (about, pricing, products, ...)."
+)
+max_crawl_pages = st.sidebar.slider("Max pages to crawl", 2, 50, DEFAULT_MAX_PAGES, disabled=not crawl_site_pages)
+read_full_context = st.sidebar.checkbox(
+    "Read full context for key info",
+    value=True,
+    help="Extract company info from all scraped pages and uploaded material in parallel chunks instead of only the first 15,000 characters."
+)
 additional_material_file = st.sidebar.file_uploader(
     "Upload Additional Context (PDF/PPTX)",
     type=['pdf', 'pptx'],
@@ -79,24 +131,247 @@ downloadable_material_url_input = st.sidebar.text_input(
 
 st.sidebar.header("Content Configuration")
 num_content_pieces = st.sidebar.slider("Number of Content Pieces per Objective/Sequence*", 1, 20, 10)
+prefix_cache_prompts = st.sidebar.checkbox(
+    "Prefix-cache-friendly prompts",
+    value=False,
+    help="Start every prompt with the same company brief so OpenAI's automatic prompt caching can reuse it across calls."
+)
+route_models = st.sidebar.checkbox(
+    "Route prompt types to different models",
+    value=True,
+    help=f"Short-form ads use cheaper, faster models and slow or failing models are skipped. Off: {AI_MODEL_NAME} for everything."
+)
+multi_item_generation = st.sidebar.checkbox(
+    "Multi-item generation (fewer API calls)",
+    value=False,
+    help="Generate all versions for a platform/objective in one call instead of one call per version."
+)
+bypass_ai_cache = st.sidebar.checkbox(
+    "Bypass AI response cache",
+    value=False,
+    help="Force fresh OpenAI calls for this run, including company info extraction. Fresh results still refresh the cache."
+)
+force_rescrape = st.sidebar.checkbox(
+    "Force re-scrape websites",
+    value=False,
+    help="Ignore cached pages and scraped context and download them again. Cached pages are otherwise revalidated after an hour."
+)
+generation_mode = st.sidebar.radio(
+    "Generation Mode",
+    options=[INTERACTIVE_MODE_LABEL, BATCH_MODE_LABEL],
+    help="Interactive runs as a background job on the server, so it keeps going across reruns and reloads. "
+         "Batch mode submits every prompt as one OpenAI batch job. Results can take up to 24h but cost less."
+)
+export_format_labels = st.sidebar.multiselect(
+    "Additional export formats",
+    options=list(EXPORT_FORMAT_OPTIONS),
+    help="Unstyled per-platform tables for downstream tools, written as results arrive and downloaded as one zip."
+)
+export_formats = [EXPORT_FORMAT_OPTIONS[label] for label in export_format_labels]
 
 generate_button = st.sidebar.button("🚀 Generate Content", type="primary", use_container_width=True)
 
+st.sidebar.header("Caches")
+stage_cache_stats = get_stage_cache().stats()
+st.sidebar.caption(
+    f"Reused across runs while inputs are unchanged: {stage_cache_stats['entries']['context']} scraped contexts, "
+    f"{stage_cache_stats['entries']['company_info']} company info extractions."
+)
+invalidate_stage = st.sidebar.selectbox(
+    "Cached stage to clear", options=["All stages", *STAGES],
+    help="Scraped context and company info are otherwise reused for an hour, e.g. when only the number of content pieces changes."
+)
+if st.sidebar.button("Clear Stage Cache", use_container_width=True):
+    cleared = get_stage_cache().invalidate(None if invalidate_stage == "All stages" else invalidate_stage)
+    st.sidebar.success(f"Cleared {cleared} cached entries.")
+if st.sidebar.button("Reset OpenAI Client", use_container_width=True, help="Drops the shared client and its connection pool."):
+    get_openai_client.clear()
+    st.rerun()
+
+st.sidebar.header("Batch Jobs")
+batch_id_input = st.sidebar.text_input("Batch ID", value=st.session_state.pending_batch_id or "")
+check_batch_button = st.sidebar.button("Check Batch", use_container_width=True)
+
+st.sidebar.header("Background Jobs")
+job_id_input = st.sidebar.text_input(
+    "Job ID", value=st.session_state.active_job_id or st.query_params.get("job", ""),
+    help="Each interactive run gets a job ID (also kept in the page URL). Attach to see its progress or results."
+)
+attach_job_button = st.sidebar.button("Attach to Job", use_container_width=True)
+
 # --- Main Area for Status and Results ---
 status_placeholder = st.empty()
 progress_bar_placeholder = st.empty()
 timer_placeholder = st.empty()
 download_placeholder = st.empty()
+export_download_placeholder = st.empty()
+results_placeholder = st.empty()
 
 
-# --- Backend Flow on Button Click ---
-if generate_button:
-    # Reset previous results
+def platform_table(platform, results):
+    """Flattened display rows for one platform's results (completed rows only)."""
+    rows = []
+    for result in results:
+        if result is not None:
+            rows += flatten_result(platform, result)
+    return rows
+
+
+def render_results_tables(content_data, container=None):
+    """Draws one tab per platform into `container` (default: the results area). Returns {platform: placeholder}."""
+    table_placeholders = {}
+    with container or results_placeholder.container():
+        st.subheader("Generated Content")
+        tabs = st.tabs([sheet_name for sheet_name, _ in PLATFORM_SHEET_SCHEMAS.values()])
+        for tab, platform in zip(tabs, PLATFORM_SHEET_SCHEMAS):
+            with tab:
+                table_placeholders[platform] = st.empty()
+                rows = platform_table(platform, content_data.get(platform) or [])
+                if rows:
+                    table_placeholders[platform].dataframe(rows, use_container_width=True, hide_index=True)
+                else:
+                    table_placeholders[platform].caption("Waiting for results...")
+    return table_placeholders
+
+
+def reset_results():
     st.session_state.generated_excel_bytes = None
     st.session_state.excel_filename = ""
     st.session_state.company_info = None
     st.session_state.generation_time = None
+    st.session_state.cache_stats = None
+    st.session_state.usage_calls = None
+    st.session_state.run_metrics = None
+    st.session_state.generated_content = None
+    st.session_state.export_zip_bytes = None
+    st.session_state.export_zip_filename = ""
     download_placeholder.empty() # Clear previous download button
+    export_download_placeholder.empty()
+
+
+def save_upload(uploaded_file, directory):
+    """Copies a Streamlit upload into the job directory so the background job can read it after this run ends."""
+    path = os.path.join(directory, os.path.basename(uploaded_file.name))
+    with open(path, "wb") as f:
+        f.write(uploaded_file.getvalue())
+    return path
+
+
+def generation_job(job, row, client, options, rate_limiter, stage_cache):
+    """Background job: runs the whole flow for one company via pipeline.run_company and returns a JSON-able result."""
+    ai_cache = get_completion_cache()
+    cache_hits_before, cache_misses_before = ai_cache.hits, ai_cache.misses
+    resilience_before = resilience_stats()
+    usage_tracker = UsageTracker()
+    partial_workbook = IncrementalWorkbook(None, row["lead_objective"], {})
+    job.live["workbook"] = partial_workbook
+
+    entry = run_company(
+        row, client, job.work_dir, options, rate_limiter=rate_limiter, stage_cache=stage_cache, usage_tracker=usage_tracker,
+        status_callback=job.report, result_callback=partial_workbook.add_result,
+        company_info_callback=lambda info: partial_workbook.set_company_info(info.get("company_name"), info)
+    )
+    if entry["status"] != "ok":
+        raise RuntimeError("; ".join(entry.get("errors") or ["Generation failed."]))
+
+    content_path = os.path.join(job.work_dir, "content.json")
+    with open(content_path, "w", encoding="utf-8") as f:
+        json.dump(partial_workbook.content_data(), f, ensure_ascii=False)
+    export_zip_path = None
+    if entry["exports"]:
+        export_zip_path = os.path.join(job.work_dir, "export.zip")
+        with open(export_zip_path, "wb") as f:
+            f.write(zip_export_files(entry["exports"]))
+
+    resilience_after = resilience_stats()
+    return {
+        "entry": entry,
+        "content_path": content_path,
+        "export_zip_path": export_zip_path,
+        "usage_calls": usage_tracker.calls,
+        "metrics": entry.get("metrics"),
+        "cache_stats": {
+            "hits": ai_cache.hits - cache_hits_before,
+            "misses": ai_cache.misses - cache_misses_before,
+            "retries": resilience_after["retries"] - resilience_before["retries"],
+            "breaker_trips": resilience_after["breaker_trips"] - resilience_before["breaker_trips"],
+            "usage": usage_tracker.summary(),
+            "reused_stages": entry["cached_stages"],
+            "slots": entry["slots"]
+        }
+    }
+
+
+def load_job_results(job_id, result):
+    """Moves a completed job's outputs into session state for display and download."""
+    entry = result["entry"]
+    with open(entry["workbook"], "rb") as f:
+        st.session_state.generated_excel_bytes = f.read()
+    st.session_state.excel_filename = os.path.basename(entry["workbook"])
+    with open(result["content_path"], encoding="utf-8") as f:
+        st.session_state.generated_content = json.load(f)
+    if result.get("export_zip_path"):
+        with open(result["export_zip_path"], "rb") as f:
+            st.session_state.export_zip_bytes = f.read()
+        st.session_state.export_zip_filename = st.session_state.excel_filename.rsplit(".", 1)[0] + "_export.zip"
+    st.session_state.company_info = entry.get("company_info")
+    st.session_state.generation_time = entry.get("elapsed_seconds")
+    st.session_state.cache_stats = result.get("cache_stats")
+    st.session_state.usage_calls = result.get("usage_calls")
+    st.session_state.run_metrics = result.get("metrics")
+    st.session_state.loaded_job_id = job_id
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def job_panel(job_id):
+    """Polls a background job, showing progress and live results until it finishes."""
+    runner = get_job_runner()
+    job = runner.status(job_id)
+    if job is None:
+        st.warning(f"No job found with ID {job_id}.")
+        st.session_state.active_job_id = None
+        return
+    if job["status"] in FINAL_STATUSES:
+        st.session_state.active_job_id = None
+        if job["status"] == "completed":
+            load_job_results(job_id, job["result"])
+        else:
+            st.session_state.job_error = f"Job {job_id} {job['status']}: {job.get('error') or job.get('message')}"
+        st.rerun() # Redraw the whole page with the final results
+        return
+
+    if job["status"] == "queued":
+        st.info(f"Job {job_id} is queued (position {job['queue_position'] or '?'}). It starts when a worker is free.")
+    else:
+        st.progress(job["progress"] or 0.0, text=f"Job {job_id}: {job['message']}")
+    st.caption("The job keeps running if you change settings, reload or close this page. Reattach later with its job ID.")
+
+    live_job = runner.live_job(job_id)
+    job_rate_limiter = live_job.live.get("rate_limiter") if live_job else None
+    if job["status"] == "running" and job_rate_limiter is not None:
+        queue = job_rate_limiter.status()
+        if queue["position"]:
+            st.caption(f"OpenAI queue (shared by {queue['sessions_waiting']} sessions): next call is number "
+                       f"{queue['position']} in line, about {queue['estimated_wait_seconds']:.0f}s wait; "
+                       f"{queue['session_queued']} of this session's calls waiting.")
+        elif queue["average_wait_seconds"] >= 1:
+            st.caption(f"OpenAI queue: calls waited {queue['average_wait_seconds']:.1f}s on average for the shared rate limit.")
+    partial_workbook = live_job.live.get("workbook") if live_job else None
+    if partial_workbook is not None and partial_workbook.completed_rows:
+        st.download_button(
+            label="📥 Download Partial Excel File (results so far)",
+            data=partial_workbook.to_bytes, # Built on click, from the rows completed by then
+            file_name=f"{job_id}_partial.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            on_click="ignore",
+            use_container_width=True
+        )
+        render_results_tables(partial_workbook.content_data(), st.container())
+
+
+# --- Backend Flow on Button Click ---
+if generate_button:
+    reset_results()
 
     # Validate inputs
     if not company_url:
@@ -109,58 +384,66 @@ if generate_button:
     company_url = add_http_if_missing(company_url)
     lead_objective_url = add_http_if_missing(lead_objective_url)
     downloadable_material_url = add_http_if_missing(downloadable_material_url_input) if downloadable_material_url_input else ""
+    run_row = {
+        "company_url": company_url, "lead_objective": selected_lead_objective,
+        "lead_objective_url": lead_objective_url, "downloadable_material_url": downloadable_material_url,
+        "num_content_pieces": num_content_pieces,
+    }
+    run_options = RunOptions(
+        model=AI_MODEL_NAME, route_models=route_models, use_cache=not bypass_ai_cache, use_scrape_cache=not force_rescrape,
+        crawl=crawl_site_pages, max_crawl_pages=max_crawl_pages, chunked_key_info=read_full_context,
+        multi_item=multi_item_generation, prefix_cache=prefix_cache_prompts, export_formats=tuple(export_formats)
+    )
 
-    start_time = time.time()
-    
+if generate_button and generation_mode == INTERACTIVE_MODE_LABEL:
+    # Hand the run to a background job so it survives reruns, reloads and disconnects
+    runner = get_job_runner()
+    job = runner.create_job(label=f"{company_url} ({selected_lead_objective})")
+    job.live["rate_limiter"] = session_rate_limiter # For the queue position in job_panel
+    job_row = dict(run_row)
+    if additional_material_file:
+        job_row["additional_material_path"] = save_upload(additional_material_file, job.work_dir)
+    if downloadable_material_file:
+        job_row["downloadable_material_path"] = save_upload(downloadable_material_file, job.work_dir)
+    runner.submit(job, generation_job, job_row, client, run_options, session_rate_limiter, get_stage_cache())
+    st.session_state.active_job_id = job.id
+    st.session_state.job_error = None
+    st.query_params["job"] = job.id
+
+elif generate_button:
     with status_placeholder.status("Processing...", expanded=True) as status_container:
         progress_bar = progress_bar_placeholder.progress(0)
-        
-        # 1. Scrape client's website
-        st.write("Step 1: Scraping client's website...")
-        website_text = scrape_website_text(company_url)
-        if not website_text:
-            status_container.update(label="Failed to scrape website. Please check URL and try again.", state="error")
-            st.stop()
-        progress_bar.progress(10)
-
-        # Combine with additional uploaded material if any
-        additional_text = ""
-        if additional_material_file:
-            st.write("Processing additional uploaded material...")
-            ext = get_file_extension(additional_material_file.name)
-            if ext == 'pdf':
-                additional_text = extract_text_from_pdf(additional_material_file)
-            elif ext == 'pptx':
-                additional_text = extract_text_from_pptx(additional_material_file)
-        
-        combined_context_for_info_extraction = website_text + "\n\n--- Additional Material ---\n" + additional_text
-        progress_bar.progress(20)
 
-        # Extract key company info using AI
-        st.write("Step 2: Extracting key company information using AI...")
-        company_info = extract_key_info_from_text(combined_context_for_info_extraction, client, AI_MODEL_NAME)
-        st.session_state.company_info = company_info # Save for reasoning page
-        if not company_info or "Error" in company_info.get("company_name", "Error"):
-            status_container.update(label="Failed to extract key company information. AI processing error.", state="error")
+        def show_stage(message, progress):
+            st.write(message)
+            progress_bar.progress(int(100 * progress))
+
+        # 1-2. Scrape, extract key company info and read the downloadable material, as a background job would
+        batch_router = build_router(run_options)
+        batch_telemetry = RunTelemetry(labels={"company_url": company_url, "lead_objective": selected_lead_objective},
+                                       router=batch_router)
+        reused_stages = []
+        with tempfile.TemporaryDirectory() as upload_dir:
+            batch_row = dict(run_row)
+            if additional_material_file:
+                batch_row["additional_material_path"] = save_upload(additional_material_file, upload_dir)
+            if downloadable_material_file:
+                batch_row["downloadable_material_path"] = save_upload(downloadable_material_file, upload_dir)
+            prepared = prepare_company_context(
+                batch_row, client, run_options, get_reporter(), batch_telemetry, batch_router, session_rate_limiter,
+                get_stage_cache(), show_stage, reused_stages
+            )
+        if prepared is None:
+            status_container.update(label="Failed to scrape the website or extract key company information.", state="error")
             st.stop()
+        if reused_stages:
+            st.write(f"Reused from an earlier run: {', '.join(reused_stages).replace('_', ' ')}.")
+        combined_context_for_info_extraction = prepared["context"]
+        company_info = prepared["company_info"]
+        downloadable_material_context = prepared["downloadable_material_context"]
+        downloadable_material_url = prepared["downloadable_material_url"]
+        st.session_state.company_info = company_info # Save for reasoning page
         st.write(f"Extracted Company Name: {company_info.get('company_name', 'N/A')}")
-        progress_bar.progress(30)
-
-        # 2. Process downloadable material for context
-        downloadable_material_context = ""
-        if downloadable_material_file:
-            st.write("Processing uploaded downloadable material...")
-            ext = get_file_extension(downloadable_material_file.name)
-            if ext == 'pdf':
-                downloadable_material_context = extract_text_from_pdf(downloadable_material_file)
-            elif ext == 'pptx':
-                downloadable_material_context = extract_text_from_pptx(downloadable_material_file)
-            if not downloadable_material_url: # If file uploaded, this becomes the "source" for CTA
-                downloadable_material_url = "Uploaded Material" 
-        elif downloadable_material_url:
-            st.write("Scraping downloadable material URL for context...")
-            downloadable_material_context = scrape_downloadable_material_text(downloadable_material_url)
-        
         if downloadable_material_context:
             st.write("Context from downloadable material obtained.")
         progress_bar.progress(40)
@@ -173,46 +456,100 @@ if generate_button:
         all_prompts = compile_all_prompts(
             company_info, selected_lead_objective, lead_objective_url,
             downloadable_material_context, downloadable_material_url,
-            num_content_pieces, full_scraped_text_for_reasoning
+            num_content_pieces, full_scraped_text_for_reasoning,
+            multi_item=multi_item_generation, prefix_cache=prefix_cache_prompts
         )
         progress_bar.progress(50)
 
-        # 4. Use OpenAI to generate tailored content
-        st.write("Step 4: Generating tailored content with AI (this may take a few minutes)...")
-        
-        def update_progress_bar(value):
-            # Scale AI generation progress from 50% to 90% of the overall progress
-            base_progress = 50
-            generation_span = 40 
-            progress_bar.progress(int(base_progress + value * generation_span))
-
-        def update_status_text(message):
-            st.write(message) # Write to the status container
-
-        generated_content_data = generate_all_content(
-            all_prompts, client, update_progress_bar, update_status_text, AI_MODEL_NAME
-        )
-        progress_bar.progress(90)
-
-        # 5. Parse and format into Excel
-        st.write("Step 5: Formatting content into Excel file...")
         company_name_for_file = format_company_name_for_filename(company_info.get("company_name", "marketing_content"))
         lead_obj_for_file = selected_lead_objective.lower().replace(" ", "_")
         filename = f"{company_name_for_file}_{lead_obj_for_file}.xlsx"
-        
-        excel_bytes = create_excel_file(generated_content_data, company_info.get("company_name"), selected_lead_objective, company_info)
-        st.session_state.generated_excel_bytes = excel_bytes
-        st.session_state.excel_filename = filename
+
+        # 4. Submit the compiled prompts as an offline batch and return immediately
+        st.write("Step 4: Submitting prompts as an offline batch job...")
+        batch_id = submit_prompts_batch(
+            all_prompts, client, AI_MODEL_NAME,
+            metadata={"company_info": company_info, "lead_objective": selected_lead_objective, "filename": filename,
+                      "metrics": batch_telemetry.summary()}, # Key-info routing and stage timings for the Metrics sheet
+            use_cache=not bypass_ai_cache
+        )
+        st.session_state.pending_batch_id = batch_id
         progress_bar.progress(100)
-        
-        end_time = time.time()
-        st.session_state.generation_time = round(end_time - start_time, 2)
+        status_container.update(label=f"Batch {batch_id} submitted. Use 'Check Batch' in the sidebar to collect results later.", state="complete")
+
+# --- Reattach to a background job (after a reload, or by ID from the sidebar) ---
+if attach_job_button and job_id_input.strip():
+    reset_results()
+    st.session_state.active_job_id = job_id_input.strip()
+    st.session_state.job_error = None
+    st.query_params["job"] = st.session_state.active_job_id
+elif (not st.session_state.active_job_id and st.query_params.get("job")
+      and st.query_params.get("job") != st.session_state.loaded_job_id and not generate_button):
+    st.session_state.active_job_id = st.query_params.get("job")
 
-        status_container.update(label=f"Content generation complete! Time taken: {st.session_state.generation_time}s", state="complete")
+if st.session_state.job_error:
+    status_placeholder.error(st.session_state.job_error)
+if st.session_state.active_job_id:
+    with status_placeholder.container():
+        job_panel(st.session_state.active_job_id)
+
+# --- Collect a previously submitted batch ---
+if check_batch_button and batch_id_input:
+    batch_id_to_check = batch_id_input.strip()
+    try:
+        batch_status, batch_done, batch_total = get_batch_status(client, batch_id_to_check)
+    except Exception as e:
+        st.sidebar.error(f"Could not retrieve batch {batch_id_to_check}: {e}")
+    else:
+        if batch_status != "completed":
+            st.sidebar.info(f"Batch {batch_id_to_check} is {batch_status} ({batch_done}/{batch_total} requests done).")
+        else:
+            try:
+                batch_results, batch_manifest = collect_batch_results(client, batch_id_to_check)
+            except FileNotFoundError:
+                st.sidebar.error(f"No local manifest found for batch {batch_id_to_check}.")
+            else:
+                batch_metadata = batch_manifest.get("metadata", {})
+                batch_company_info = batch_metadata.get("company_info", {})
+                st.session_state.generated_excel_bytes = create_excel_file_streaming(
+                    batch_results, batch_company_info.get("company_name"),
+                    batch_metadata.get("lead_objective", ""), batch_company_info, metrics=batch_metadata.get("metrics")
+                )
+                st.session_state.excel_filename = batch_metadata.get("filename", f"{batch_id_to_check}.xlsx")
+                st.session_state.generated_content = batch_results
+                if export_formats:
+                    export_basename = st.session_state.excel_filename.rsplit(".", 1)[0]
+                    export_dir = tempfile.mkdtemp(prefix="ad_content_export_")
+                    try:
+                        st.session_state.export_zip_bytes = zip_export_files(
+                            export_content(batch_results, export_dir, export_basename, export_formats)
+                        )
+                        st.session_state.export_zip_filename = export_basename + "_export.zip"
+                    finally:
+                        shutil.rmtree(export_dir, ignore_errors=True)
+                st.session_state.company_info = batch_company_info
+                st.session_state.pending_batch_id = None
+                st.sidebar.success(f"Batch {batch_id_to_check} collected.")
 
 # --- Display Download Button and Timer if content generated ---
 if st.session_state.generation_time is not None:
-    timer_placeholder.success(f"Total Generation Time: {st.session_state.generation_time} seconds")
+    timer_message = f"Total Generation Time: {st.session_state.generation_time} seconds"
+    if st.session_state.cache_stats:
+        run_stats = st.session_state.cache_stats
+        timer_message += f" (AI cache: {run_stats['hits']} hits, {run_stats['misses']} misses"
+        if run_stats.get("retries") or run_stats.get("breaker_trips"):
+            timer_message += f"; {run_stats['retries']} retries, {run_stats['breaker_trips']} circuit breaker trips"
+        timer_message += ")"
+        if run_stats.get("reused_stages"):
+            timer_message += f" · Reused from earlier runs: {', '.join(run_stats['reused_stages']).replace('_', ' ')}"
+        slots = run_stats.get("slots")
+        if slots and slots["reused"]:
+            timer_message += f" · Content items reused: {slots['reused']} of {slots['reused'] + slots['generated']}"
+        usage = run_stats.get("usage")
+        if usage and usage["prompt_tokens"]:
+            timer_message += (f" · Prompt cache: {usage['cached_tokens']:,} of {usage['prompt_tokens']:,} prompt tokens "
+                              f"cached ({usage['cached_ratio']:.0%}) across {usage['calls']} calls")
+    timer_placeholder.success(timer_message)
 
 if st.session_state.generated_excel_bytes:
     download_placeholder.download_button(
@@ -222,6 +559,40 @@ if st.session_state.generated_excel_bytes:
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         use_container_width=True
     )
+    if st.session_state.export_zip_bytes:
+        export_download_placeholder.download_button(
+            label="📦 Download CSV/JSONL/Parquet Export",
+            data=st.session_state.export_zip_bytes,
+            file_name=st.session_state.export_zip_filename,
+            mime="application/zip",
+            use_container_width=True
+        )
+    if st.session_state.generated_content:
+        render_results_tables(st.session_state.generated_content)
+    if st.session_state.run_metrics:
+        run_metrics = st.session_state.run_metrics
+        with st.expander(f"Run metrics (estimated cost ${run_metrics['totals']['cost_usd']:.4f})"):
+            st.caption("Pipeline stages")
+            st.dataframe(run_metrics["stages"], use_container_width=True)
+            st.caption("OpenAI usage by platform and objective, slowest first")
+            st.dataframe(run_metrics["groups"], use_container_width=True)
+            if run_metrics.get("models"):
+                st.caption("OpenAI usage and latency by model")
+                st.dataframe(run_metrics["models"], use_container_width=True)
+            if run_metrics.get("routing"):
+                st.caption("Model routing decisions")
+                st.dataframe(run_metrics["routing"]["decisions"], use_container_width=True)
+            st.caption("Per-call token usage")
+            st.dataframe(run_metrics["calls"], use_container_width=True)
+            metrics_basename = st.session_state.excel_filename.rsplit(".", 1)[0] + "_metrics"
+            prometheus_col, json_col = st.columns(2)
+            prometheus_col.download_button("Download Prometheus metrics", data=metrics_to_prometheus(run_metrics),
+                                           file_name=metrics_basename + ".prom", mime="text/plain", on_click="ignore")
+            json_col.download_button("Download JSON log", data=metrics_to_json_log(run_metrics),
+                                     file_name=metrics_basename + ".jsonl", mime="application/x-ndjson", on_click="ignore")
+    elif st.session_state.usage_calls:
+        with st.expander("Per-call token usage"):
+            st.dataframe(st.session_state.usage_calls, use_container_width=True)
     if st.session_state.company_info:
         st.subheader("Summary of Extracted Company Information:")
         st.json(st.session_state.company_info)
@@ -0,0 +1,225 @@
+import json
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from completion_cache import UsageTracker
+
+# Estimated USD per 1M tokens: (input, cached input, output). Models not listed are costed at 0.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+
+METRIC_PREFIX = "ad_content"
+LATENCY_QUANTILES = (0.5, 0.95)
+
+
+def model_prices(model):
+    """Prices for `model`, matching dated snapshots (gpt-4o-mini-2024-07-18) by their longest listed prefix."""
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model == name or model.startswith(name + "-"):
+            return MODEL_PRICES[name]
+    return None
+
+
+def estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens):
+    prices = model_prices(model or "")
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values` (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class RunTelemetry:
+    """
+    Per-stage spans and per-call OpenAI usage for one run. Calls are recorded by the wrapped UsageTracker
+    (pass `telemetry.usage` wherever a usage_tracker is accepted); summary() groups them by platform and
+    objective with token counts, estimated cost and latency, for the workbook's Metrics sheet and for
+    write_metrics. `labels` (e.g. the company URL) are attached to every exported series.
+    Calls are also grouped by model, and with a `router` (a model_routing.ModelRouter) its routing
+    decisions are included.
+    """
+
+    def __init__(self, usage_tracker=None, labels=None, router=None):
+        self.usage = usage_tracker or UsageTracker()
+        self.labels = dict(labels or {})
+        self.router = router
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """Times a pipeline stage; the span is recorded even if the stage raises."""
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spans.append({"stage": stage, "started_at": round(started_at, 3),
+                                   "seconds": round(time.perf_counter() - start, 3), **attributes})
+
+    def stage_seconds(self):
+        """{stage: seconds}, summing stages that ran more than once."""
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for span in spans:
+            totals[span["stage"]] = round(totals.get(span["stage"], 0.0) + span["seconds"], 3)
+        return totals
+
+    def summary(self):
+        """A JSON-serialisable snapshot: stages, per-call rows, per platform/objective groups and totals."""
+        with self._lock:
+            spans = list(self.spans)
+        calls = [dict(call, cost_usd=round(estimate_cost(call["model"], call["prompt_tokens"], call["cached_tokens"],
+                                                         call["completion_tokens"]), 6))
+                 for call in self.usage.calls]
+
+        groups = {}
+        for call in calls:
+            key = (call.get("platform") or call["label"], call.get("objective") or "N/A")
+            groups.setdefault(key, []).append(call)
+        group_rows = []
+        for (platform, objective), group in groups.items():
+            latencies = [call["latency_seconds"] for call in group if call["latency_seconds"] is not None]
+            group_rows.append({
+                "platform": platform, "objective": objective, "calls": len(group),
+                "prompt_tokens": sum(call["prompt_tokens"] for call in group),
+                "cached_tokens": sum(call["cached_tokens"] for call in group),
+                "completion_tokens": sum(call["completion_tokens"] for call in group),
+                "cost_usd": round(sum(call["cost_usd"] for call in group), 6),
+                "latency_total_seconds": round(sum(latencies), 3),
+                "latency_mean_seconds": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                "latency_p95_seconds": round(percentile(latencies, 0.95), 3),
+                "latency_max_seconds": round(max(latencies, default=0.0), 3),
+                "wait_total_seconds": round(sum(call.get("wait_seconds") or 0.0 for call in group), 3),
+            })
+        group_rows.sort(key=lambda row: row["latency_total_seconds"], reverse=True) # Biggest contributors first
+
+        model_rows = []
+        for model in sorted({call["model"] for call in calls}):
+            model_calls = [call for call in calls if call["model"] == model]
+            latencies = [call["latency_seconds"] for call in model_calls if call["latency_seconds"] is not None]
+            model_rows.append({
+                "model": model, "calls": len(model_calls),
+                "prompt_tokens": sum(call["prompt_tokens"] for call in model_calls),
+                "completion_tokens": sum(call["completion_tokens"] for call in model_calls),
+                "cost_usd": round(sum(call["cost_usd"] for call in model_calls), 6),
+                "latency_p50_seconds": round(percentile(latencies, 0.5), 3),
+                "latency_p95_seconds": round(percentile(latencies, 0.95), 3),
+                "latency_max_seconds": round(max(latencies, default=0.0), 3),
+            })
+
+        return {
+            "labels": self.labels,
+            "stages": spans,
+            "groups": group_rows,
+            "models": model_rows,
+            "routing": self.router.summary() if self.router else None,
+            "calls": calls,
+            "totals": {
+                "calls": len(calls),
+                "prompt_tokens": sum(call["prompt_tokens"] for call in calls),
+                "cached_tokens": sum(call["cached_tokens"] for call in calls),
+                "completion_tokens": sum(call["completion_tokens"] for call in calls),
+                "cost_usd": round(sum(call["cost_usd"] for call in calls), 6),
+                "stage_seconds": round(sum(span["seconds"] for span in spans), 3),
+            },
+        }
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name, labels, value):
+    label_text = ",".join(f'{re.sub(r"[^a-zA-Z0-9_]", "_", key)}="{_escape_label(val)}"' for key, val in labels.items())
+    return f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{METRIC_PREFIX}_{name} {value}"
+
+
+def metrics_to_prometheus(metrics):
+    """Prometheus text exposition format (e.g. for node_exporter's textfile collector)."""
+    run_labels = metrics.get("labels", {})
+    lines = [f"# HELP {METRIC_PREFIX}_stage_duration_seconds Wall time of each pipeline stage.",
+             f"# TYPE {METRIC_PREFIX}_stage_duration_seconds gauge"]
+    stage_totals = {}
+    for span in metrics.get("stages", []):
+        stage_totals[span["stage"]] = stage_totals.get(span["stage"], 0.0) + span["seconds"]
+    lines += [_series("stage_duration_seconds", {**run_labels, "stage": stage}, round(seconds, 3))
+              for stage, seconds in stage_totals.items()]
+
+    counters = [("openai_calls_total", "calls", "OpenAI calls that went to the network."),
+                ("openai_prompt_tokens_total", "prompt_tokens", "Prompt tokens sent."),
+                ("openai_cached_prompt_tokens_total", "cached_tokens", "Prompt tokens served from the provider's prompt cache."),
+                ("openai_completion_tokens_total", "completion_tokens", "Completion tokens received."),
+                ("openai_cost_usd_total", "cost_usd", "Estimated cost in USD.")]
+    for name, key, help_text in counters:
+        lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} counter"]
+        lines += [_series(name, {**run_labels, "platform": row["platform"], "objective": row["objective"]}, row[key])
+                  for row in metrics.get("groups", [])]
+
+    lines += [f"# HELP {METRIC_PREFIX}_openai_latency_seconds Latency of OpenAI calls.",
+              f"# TYPE {METRIC_PREFIX}_openai_latency_seconds summary"]
+    latencies = {}
+    for call in metrics.get("calls", []):
+        if call.get("latency_seconds") is not None:
+            latencies.setdefault((call.get("platform") or call["label"], call.get("objective") or "N/A"), []).append(call["latency_seconds"])
+    for (platform, objective), values in latencies.items():
+        labels = {**run_labels, "platform": platform, "objective": objective}
+        lines += [_series("openai_latency_seconds", {**labels, "quantile": q}, round(percentile(values, q), 3))
+                  for q in LATENCY_QUANTILES]
+        lines.append(_series("openai_latency_seconds_sum", labels, round(sum(values), 3)))
+        lines.append(_series("openai_latency_seconds_count", labels, len(values)))
+
+    lines += [f"# HELP {METRIC_PREFIX}_openai_model_latency_seconds Latency of OpenAI calls per model.",
+              f"# TYPE {METRIC_PREFIX}_openai_model_latency_seconds gauge"]
+    for row in metrics.get("models", []):
+        lines += [_series("openai_model_latency_seconds", {**run_labels, "model": row["model"], "quantile": q},
+                          row[f"latency_p{round(q * 100)}_seconds"]) for q in LATENCY_QUANTILES]
+    routing = metrics.get("routing") or {}
+    if routing.get("decisions"):
+        lines += [f"# HELP {METRIC_PREFIX}_model_routing_decisions_total Calls routed to each model per task.",
+                  f"# TYPE {METRIC_PREFIX}_model_routing_decisions_total counter"]
+        lines += [_series("model_routing_decisions_total", {**run_labels, "task": d["task"], "model": d["model"],
+                                                           "reason": d["reason"]}, d["calls"])
+                  for d in routing["decisions"]]
+    return "\n".join(lines) + "\n"
+
+
+def metrics_to_json_log(metrics):
+    """One JSON object per line: a record per stage span and per call, then the grouped summary."""
+    labels = metrics.get("labels", {})
+    lines = [json.dumps({"event": "stage", **labels, **span}, ensure_ascii=False) for span in metrics.get("stages", [])]
+    lines += [json.dumps({"event": "openai_call", **labels, **call}, ensure_ascii=False) for call in metrics.get("calls", [])]
+    lines.append(json.dumps({"event": "summary", **labels, "groups": metrics.get("groups", []),
+                             "models": metrics.get("models", []), "routing": metrics.get("routing"),
+                             "totals": metrics.get("totals", {})}, ensure_ascii=False))
+    return "\n".join(lines) + "\n"
+
+
+METRICS_FORMATS = {"prometheus": (".prom", metrics_to_prometheus), "json": (".jsonl", metrics_to_json_log)}
+
+
+def write_metrics(metrics, path_without_extension, metrics_format="json"):
+    """Writes `metrics` (a RunTelemetry.summary()) in one of METRICS_FORMATS. Returns the file path."""
+    extension, render = METRICS_FORMATS[metrics_format]
+    path = path_without_extension + extension
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(render(metrics))
+    return path
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+# Caches are created at import time, so point them at a scratch directory before any module is imported
+os.environ["CONTENT_CACHE_DIR"] = tempfile.mkdtemp(prefix="ad_content_generator_tests_")
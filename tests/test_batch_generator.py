@@ -0,0 +1,55 @@
+import pytest
+from openai import OpenAI
+
+from ai_content_generator import compile_all_prompts, prompt_rows
+from batch_generator import collect_batch_results, submit_prompts_batch
+from mock_openai_server import KEY_INFO_RESPONSE, MockOpenAIServer
+from reporting import CollectingReporter
+
+
+@pytest.fixture
+def batch_server():
+    server = MockOpenAIServer(latency_ms=0, jitter_ms=0, seed=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run_batch(server, tmp_path, multi_item):
+    client = OpenAI(base_url=server.base_url, api_key="test")
+    prompts = compile_all_prompts(KEY_INFO_RESPONSE, "Demo Booking", "https://example.com/demo", "", "", 3,
+                                  "Scraped text", multi_item=multi_item)
+    batch_id = submit_prompts_batch(prompts, client, batch_dir=str(tmp_path), use_cache=False)
+    reporter = CollectingReporter()
+    results, manifest = collect_batch_results(client, batch_id, str(tmp_path), reporter=reporter)
+    return results, manifest, reporter
+
+
+def assert_slots_mapped(results, manifest):
+    for slot in manifest["slots"]:
+        if slot["platform"] == "reasoning":
+            assert results["reasoning"]["reasoning_statement"]
+            continue
+        rows = [results[slot["platform"]][row] for row in prompt_rows(slot, slot["index"])]
+        assert all(rows), slot["custom_id"]
+        if slot.get("versions") or slot.get("version") is not None:
+            assert [row["version_number"] for row in rows] == (slot.get("versions") or [slot["version"]] * len(rows))
+
+
+@pytest.mark.parametrize("multi_item", [False, True])
+def test_batch_results_map_back_to_their_slots(batch_server, tmp_path, multi_item):
+    results, manifest, reporter = run_batch(batch_server, tmp_path, multi_item)
+
+    assert [len(results[platform]) for platform in ("email", "linkedin", "facebook", "google_search", "google_display")] == [3, 9, 9, 1, 1]
+    assert_slots_mapped(results, manifest)
+    assert reporter.warnings == [] and reporter.errors == []
+
+
+def test_failed_batch_lines_are_reported_and_retried(batch_server, tmp_path):
+    batch_server.batch_error_rate = 0.5
+    results, manifest, reporter = run_batch(batch_server, tmp_path, multi_item=True)
+
+    assert len(reporter.warnings) == 1 and "batch requests failed" in reporter.warnings[0]
+    assert reporter.errors == []
+    assert batch_server.stats["ok"] > 0 # The failed lines went through the synchronous path
+    assert_slots_mapped(results, manifest)
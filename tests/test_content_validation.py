@@ -0,0 +1,85 @@
+from content_validation import FIELD_LIMITS, apply_repairs, enforce_limits, find_problems
+
+
+def facebook_row(**overrides):
+    row = {"version_number": 1, "ad_name": "Acme - Demand Gen - V1", "objective": "Demand Gen",
+           "primary_text": "Stop losing weekend sales to empty shelves.", "image_copy": "Forecast every store",
+           "headline": "Never run out again", "link_description": "Book a demo today",
+           "destination": "https://example.com/demo", "cta_button": "Book Now"}
+    return dict(row, **overrides)
+
+
+DISPLAY_HEADLINES = ["Never run out of bestsellers", "Forecasts your buyers trust", "Cut stock-outs by 30%",
+                     "Live in 30 days", "Smarter replenishment", "Built for mid-market retail", "SOC 2 Type II certified"]
+DISPLAY_DESCRIPTIONS = ["Planners see every store's stock in one live view.",
+                        "Your ERP already has the data; Acme turns it into purchase orders.",
+                        "Retail teams cut excess inventory by a fifth in one quarter.",
+                        "Security reviews pass before the pilot even starts.",
+                        "Machine learning models adjust forecasts every night."]
+
+
+def test_valid_row_has_no_problems():
+    assert find_problems("facebook", facebook_row(), 0) == []
+
+
+def test_overlong_and_missing_text_fields():
+    problems = find_problems("facebook", facebook_row(headline="Forecast demand with confidence", cta_button=" "), 2)
+
+    assert [(p["id"], p["issue"], p["limit"]) for p in problems] == [
+        ("2.headline", "too_long", FIELD_LIMITS["facebook"]["headline"]), ("2.cta_button", "missing", None)
+    ]
+
+
+def test_list_fields_are_normalised_before_reporting_the_shortfall():
+    row = {"headlines": ["  Never run out of bestsellers ", "Never run out of bestsellers!", "", None,
+                         "A headline far too long for a display ad", "Cut stock-outs by 30%"],
+           "descriptions": DISPLAY_DESCRIPTIONS + ["A surplus description that is dropped."]}
+    problems = find_problems("google_display", row, 0)
+
+    # Whitespace is stripped, blanks and near-copies dropped, overlong entries kept for repair, surplus cut
+    assert row["headlines"] == ["Never run out of bestsellers", "Cut stock-outs by 30%",
+                                "A headline far too long for a display ad", "", ""]
+    assert row["descriptions"] == DISPLAY_DESCRIPTIONS
+    assert [(p["id"], p["issue"]) for p in problems] == [
+        ("0.headlines.2", "too_long"), ("0.headlines.3", "missing"), ("0.headlines.4", "missing")
+    ]
+
+
+def test_apply_repairs_replaces_only_usable_fixes():
+    rows = [facebook_row(headline="Forecast demand with confidence", cta_button="")]
+    problems = find_problems("facebook", rows[0], 0)
+    repair = {"fixes": [{"id": "0.headline", "text": " Forecast with confidence "}, {"id": "0.cta_button", "text": "  "},
+                        {"id": "9.headline", "text": "Not a requested field"}, "not a fix"]}
+
+    assert apply_repairs(rows, problems, repair) == 1
+    assert rows[0]["headline"] == "Forecast with confidence" and rows[0]["cta_button"] == ""
+    assert apply_repairs(rows, problems, None) == 0
+
+
+def test_apply_repairs_fills_list_entries():
+    rows = [{"headlines": DISPLAY_HEADLINES[:3], "descriptions": DISPLAY_DESCRIPTIONS}]
+    problems = find_problems("google_display", rows[0], 0)
+    repair = {"fixes": [{"id": "0.headlines.3", "text": "Alerts, not spreadsheets"},
+                        {"id": "0.headlines.4", "text": "Free up working capital"}]}
+
+    assert apply_repairs(rows, problems, repair) == 2
+    assert find_problems("google_display", rows[0], 0) == []
+
+
+def test_enforce_limits_truncates_at_word_boundaries():
+    row = facebook_row(headline="Forecast demand with confidence", link_description="Supercalifragilisticexpialidocious")
+    assert enforce_limits("facebook", row) == []
+
+    assert row["headline"] == "Forecast demand with" # Cut before the word that crosses the limit
+    assert row["link_description"] == "Supercalifragilisticexpiali" # No space to cut at, so a hard cut
+    assert find_problems("facebook", row, 0) == []
+
+
+def test_enforce_limits_reports_what_it_cannot_fix():
+    row = facebook_row(cta_button="")
+    display = {"headlines": DISPLAY_HEADLINES[:3] + ["", "A headline far too long for a display ad"],
+               "descriptions": DISPLAY_DESCRIPTIONS}
+
+    assert enforce_limits("facebook", row) == ["cta_button missing"]
+    assert enforce_limits("google_display", display) == ["headlines short"]
+    assert display["headlines"] == DISPLAY_HEADLINES[:3] + ["A headline far too long for a"] # Empty entries dropped
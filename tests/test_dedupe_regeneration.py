@@ -0,0 +1,53 @@
+import json
+
+import pytest
+from openai import OpenAI
+
+from ai_content_generator import compile_all_prompts, generate_all_content
+from mock_openai_server import KEY_INFO_RESPONSE, MockOpenAIServer
+
+
+@pytest.fixture
+def server():
+    server = MockOpenAIServer(latency_ms=0, jitter_ms=0, seed=1).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class RecordingClient:
+    """
+    Forwards chat completions to a real client and keeps every prompt that was sent. Multi-item replies
+    repeat their first item's copy for every version, so each call comes back with near-duplicates.
+    """
+
+    def __init__(self, client):
+        self.prompts = []
+        self.chat = self
+        self.completions = self
+        self._client = client
+
+    def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][0]["content"])
+        response = self._client.chat.completions.create(**kwargs)
+        message = response.choices[0].message
+        content = json.loads(message.content)
+        if content.get("items"):
+            first = content["items"][0]
+            content["items"] = [dict(first, version_number=item["version_number"]) for item in content["items"]]
+            message.content = json.dumps(content)
+        return response
+
+
+@pytest.mark.parametrize("multi_item", [False, True])
+def test_regenerations_do_not_pile_up_hints(server, multi_item):
+    client = RecordingClient(OpenAI(base_url=server.base_url, api_key="test", max_retries=0))
+    prompts = compile_all_prompts(KEY_INFO_RESPONSE, "Demo Booking", "https://example.com/demo", "", "", 5,
+                                  "Scraped text", multi_item=multi_item)
+    generate_all_content(prompts, client, lambda value: None, lambda message: None, use_cache=False, dedupe_budget=100)
+
+    regenerated = [prompt for prompt in client.prompts if "Variety: other versions" in prompt]
+    assert regenerated, "expected the mock's near-duplicates to trigger regenerations"
+    for prompt in client.prompts:
+        assert prompt.count("Variety: other versions") <= 1
+        assert prompt.count("Return only version_number") <= 1
@@ -0,0 +1,47 @@
+import openai
+import pytest
+from openai import OpenAI
+
+from ai_content_generator import MODEL_ROUTES
+from completion_cache import cached_completion_content
+from mock_openai_server import MockOpenAIServer
+from model_routing import MIN_SAMPLES, ModelRouter, get_model_stats
+
+
+@pytest.fixture
+def server():
+    server = MockOpenAIServer(latency_ms=0, jitter_ms=0, max_prompt_chars=100, seed=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def model_stats():
+    stats = get_model_stats()
+    stats.clear()
+    yield stats
+    stats.clear()
+
+
+def test_client_errors_do_not_flip_routing(server, model_stats):
+    client = OpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+    router = ModelRouter(MODEL_ROUTES, "gpt-4o-mini")
+    primary = router.models("email")[0]
+    for attempt in range(2 * MIN_SAMPLES):
+        with pytest.raises(openai.BadRequestError): # Over the mock's context length
+            cached_completion_content(client, primary, f"prompt {attempt} " + "x" * 200, use_cache=False, model_task="email")
+
+    assert server.stats["bad_requests"] == 2 * MIN_SAMPLES
+    assert model_stats.snapshot(primary, "email")["error_rate"] == 0.0
+    assert router.route("email") == (primary, "email")
+    assert router.summary()["decisions"][0]["reason"] == "primary"
+
+
+def test_failing_model_is_routed_around(model_stats):
+    router = ModelRouter(MODEL_ROUTES, "gpt-4o-mini")
+    primary, fallback = router.models("email")[:2]
+    for _ in range(MIN_SAMPLES):
+        model_stats.observe(primary, "email", 1.0, ok=False)
+
+    assert router.route("email") == (fallback, "email")
@@ -0,0 +1,68 @@
+import random
+
+from near_duplicates import NEAR_DUPLICATE_THRESHOLD, NearDuplicateIndex, is_near_duplicate, jaccard, shingles
+
+WORDS = ("forecast demand retail stock store planner inventory order supplier season margin shelf weekend sales "
+         "buyer dashboard").split()
+
+
+def pairs_near_threshold(count, seed=7):
+    """(text, variant) pairs whose exact similarity lies in [threshold, threshold + 0.1)."""
+    rng = random.Random(seed)
+    pairs = []
+    while len(pairs) < count:
+        words = [rng.choice(WORDS) for _ in range(30)]
+        variant = list(words)
+        for _ in range(rng.randint(1, 3)):
+            variant[rng.randrange(len(variant))] = rng.choice(WORDS) + "s"
+        text, variant = " ".join(words), " ".join(variant)
+        if NEAR_DUPLICATE_THRESHOLD <= jaccard(shingles(text), shingles(variant)) < NEAR_DUPLICATE_THRESHOLD + 0.1:
+            pairs.append((text, variant))
+    return pairs
+
+
+def test_match_returns_the_most_similar_accepted_text():
+    index = NearDuplicateIndex()
+    index.add("email", 0, "Stop losing weekend sales to empty shelves with live stock views.", "Stop losing")
+    index.add("email", 1, "Your ERP already has the data; turn it into purchase orders.", "Your ERP")
+
+    key, similarity = index.match("email", "Stop losing weekend sales to empty shelves with live stock views!")
+    assert key == 0 and similarity == 1.0 # Punctuation and case are normalised away
+    assert index.match("email", "Security reviews pass before the pilot even starts.") is None
+    assert index.match("linkedin", "Stop losing weekend sales to empty shelves with live stock views.") is None
+    assert index.labels("email") == ["Stop losing", "Your ERP"]
+
+
+def test_lsh_recall_near_the_threshold():
+    pairs = pairs_near_threshold(200)
+    found = 0
+    for text, variant in pairs:
+        index = NearDuplicateIndex()
+        index.add("group", 0, text)
+        match = index.match("group", variant)
+        if match is not None:
+            assert match[1] >= NEAR_DUPLICATE_THRESHOLD # Candidates are confirmed by exact similarity
+            found += 1
+    assert found / len(pairs) >= 0.9 # LSH bands are sized for ~95% recall at the threshold
+
+
+def test_pairs_below_the_threshold_are_not_matched():
+    index = NearDuplicateIndex()
+    text = "Forecast demand for every store and order what will sell this season."
+    index.add("group", 0, text)
+    variant = "Forecast demand for every warehouse and order what shoppers want next quarter."
+    assert jaccard(shingles(text), shingles(variant)) < NEAR_DUPLICATE_THRESHOLD
+    assert index.match("group", variant) is None
+
+
+def test_empty_and_very_short_texts():
+    index = NearDuplicateIndex()
+    index.add("group", 0, "")
+    index.add("group", 1, "Go")
+
+    assert index.match("group", "") is None
+    assert index.match("group", "  !! ") is None # Nothing left after normalising
+    assert index.match("group", "go!")[0] == 1 # Shorter than a shingle, padded to one
+    assert index.match("group", "No") is None
+    assert not is_near_duplicate("", ["", "Go"])
+    assert is_near_duplicate("GO", ["Go"])
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from rate_limiter import FairScheduler
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def queue_calls(scheduler, calls, granted):
+    """Queues (session, label) calls one at a time, so the order they were queued in is known."""
+    threads = []
+    for session, label in calls:
+        def call(session=session, label=label):
+            with scheduler.request(session):
+                granted.append(label)
+        queued = scheduler.status()["queued"]
+        thread = threading.Thread(target=call)
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.status()["queued"] == queued + 1)
+    return threads
+
+
+def test_sessions_are_served_round_robin():
+    scheduler = FairScheduler(requests_per_minute=10000, tokens_per_minute=10000000, max_in_flight=1)
+    granted = []
+    with scheduler.request("blocker"): # Holds the only in-flight slot while the queues fill
+        threads = queue_calls(scheduler, [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("b", "b2"), ("c", "c1")],
+                              granted)
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # A session with many calls queued takes turns with the others instead of going first with all of them
+    assert granted == ["a1", "b1", "c1", "a2", "b2", "a3"]
+    assert scheduler.status("a")["average_wait_seconds"] > 0
+
+
+def test_status_reports_queue_positions():
+    scheduler = FairScheduler(requests_per_minute=10000, tokens_per_minute=10000000, max_in_flight=1)
+    granted = []
+    with scheduler.request("blocker"):
+        threads = queue_calls(scheduler, [("a", "a1"), ("a", "a2"), ("b", "b1"), ("c", "c1")], granted)
+        status = {session: scheduler.status(session) for session in ("a", "b", "c", "idle")}
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert [status[session]["position"] for session in ("a", "b", "c", "idle")] == [1, 2, 3, None]
+    assert status["a"]["session_queued"] == 2 and status["idle"]["session_queued"] == 0
+    assert status["a"]["queued"] == 4 and status["a"]["sessions_waiting"] == 3 and status["a"]["in_flight"] == 1
+    assert status["c"]["estimated_wait_seconds"] == 0.0 # Plenty of budget; only the in-flight cap holds them
+    after = scheduler.status("a")
+    assert (after["queued"], after["in_flight"], after["position"]) == (0, 0, None)
+
+
+def test_status_estimates_the_wait_from_the_budget():
+    scheduler = FairScheduler(requests_per_minute=60, tokens_per_minute=10000000)
+    for _ in range(60): # Spend the whole requests/min budget; it refills at one request per second
+        scheduler.acquire("a")
+    granted = []
+    threads = queue_calls(scheduler, [("a", "a1"), ("b", "b1")], granted)
+    status = scheduler.status("b")
+
+    assert status["position"] == 2
+    assert 1.0 <= status["estimated_wait_seconds"] <= 2.0
+    for thread in threads:
+        thread.join(timeout=5)
+    assert granted == ["a1", "b1"]
@@ -0,0 +1,83 @@
+import pytest
+from openai import OpenAI
+
+from ai_content_generator import compile_all_prompts, generate_all_content
+from mock_openai_server import KEY_INFO_RESPONSE, MockOpenAIServer
+from run_manifest import RunManifest, RunManifestStore, slot_fingerprint, slot_id
+
+
+@pytest.fixture
+def store():
+    return RunManifestStore(":memory:")
+
+
+def test_rows_are_reused_only_for_the_same_fingerprint(store):
+    manifest = RunManifest("https://example.com", "Demo Booking", store=store)
+    slot = slot_id("email", "Demand Gen", 1)
+    fingerprint = slot_fingerprint("gpt-4o-mini", "input", structured_outputs=True)
+    row = {"version_number": 1, "subject_line": "Never run out again"}
+    manifest.put(slot, fingerprint, row)
+    row["subject_line"] = "Changed after it was stored"
+
+    assert manifest.get(slot, fingerprint) == {"version_number": 1, "subject_line": "Never run out again"}
+    assert manifest.get(slot, slot_fingerprint("gpt-4.1-mini", "input", structured_outputs=True)) is None
+    assert manifest.get(slot, slot_fingerprint("gpt-4o-mini", "edited input", structured_outputs=True)) is None
+    assert manifest.get(slot, slot_fingerprint("gpt-4o-mini", "input", structured_outputs=False)) is None
+    assert manifest.summary() == {"reused": 1, "generated": 1}
+
+
+def test_new_fingerprint_replaces_the_stored_row(store):
+    manifest = RunManifest("https://example.com", "Demo Booking", store=store)
+    slot = slot_id("linkedin", "Brand Awareness", 2)
+    manifest.put(slot, "old", {"headline": "Old"})
+    manifest.put(slot, "new", {"headline": "New"})
+
+    assert manifest.get(slot, "old") is None
+    assert manifest.get(slot, "new") == {"headline": "New"}
+    assert store.stats() == {"scopes": 1, "slots": 1}
+
+
+def test_scopes_are_separate(store):
+    slot = slot_id("email", "Demand Gen", 1)
+    RunManifest("https://example.com", "Demo Booking", store=store).put(slot, "fp", {"headline": "A"})
+
+    assert RunManifest("https://example.com", "Free Trial", store=store).get(slot, "fp") is None
+    assert RunManifest("https://other.example.com", "Demo Booking", store=store).get(slot, "fp") is None
+    assert store.clear(RunManifest("https://example.com", "Demo Booking", store=store).scope) == 1
+
+
+@pytest.fixture
+def server():
+    server = MockOpenAIServer(latency_ms=0, jitter_ms=0, seed=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_generation_reuses_unchanged_slots(server, store):
+    client = OpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+
+    def run(num_content_pieces, model="gpt-4o-mini"):
+        prompts = compile_all_prompts(KEY_INFO_RESPONSE, "Demo Booking", "https://example.com/demo", "", "",
+                                      num_content_pieces, "Scraped text")
+        manifest = RunManifest("https://example.com", "Demo Booking", store=store)
+        results = generate_all_content(prompts, client, lambda value: None, lambda message: None, model=model,
+                                       use_cache=True, run_manifest=manifest)
+        return results, manifest.summary()
+
+    first, first_summary = run(2)
+    requests_before = server.stats["requests"]
+    second, second_summary = run(2)
+
+    assert first_summary["reused"] == 0 and first_summary["generated"] > 0
+    assert second_summary == {"reused": first_summary["generated"], "generated": 0}
+    assert server.stats["requests"] == requests_before
+    assert second["email"] == first["email"]
+
+    _, more_pieces = run(3)
+    # Email 2 is no longer the last of the sequence, so its prompt (and fingerprint) changed; the rest is reused
+    assert more_pieces["reused"] == first_summary["generated"] - 1
+    assert more_pieces["generated"] == 1 + 3 + 3 + 1 # V3 of the emails and of each LinkedIn/Facebook objective, and email 2
+
+    _, other_model = run(2, model="gpt-4.1-mini") # The model is part of every fingerprint
+    assert other_model["reused"] == 0
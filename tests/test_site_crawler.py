@@ -0,0 +1,70 @@
+import pytest
+
+from fixture_site import FixtureSite, build_page
+from site_crawler import crawl_site
+
+
+@pytest.fixture
+def sites():
+    """The crawled site (6 pages of ~4 KB) and another site that only shows up in its robots.txt and sitemaps."""
+    site = FixtureSite(pages=6, page_kb=4).start()
+    other = FixtureSite(pages=2, page_kb=4).start()
+    site.documents["/about-us"] = site.documents["/about"] # Same content under another URL
+    site.documents["/links"] = ("text/html", build_page("Links", 4096, ["about/", "about#team", "pricing/"]))
+    site.documents["/extra-sitemap.xml"] = ("application/xml", (
+        '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"<url><loc>{site.base_url}/links</loc></url><url><loc>{other.base_url}/about</loc></url></urlset>"
+    ).encode("utf-8"))
+    site.documents["/robots.txt"] = ("text/plain", (
+        f"User-agent: *\nSitemap: {other.base_url}/sitemap.xml\nSitemap: {site.base_url}/sitemap.xml\n"
+        f"Sitemap: {site.base_url}/extra-sitemap.xml\n"
+    ).encode("utf-8"))
+    yield site, other
+    for server in (site, other):
+        server.shutdown()
+        server.server_close()
+
+
+def html_paths(site):
+    return [path for path, (kind, _) in site.documents.items() if kind == "text/html"]
+
+
+def test_crawl_stays_on_site_and_skips_duplicates(sites):
+    site, other = sites
+    crawl = crawl_site(site.base_url + "/", max_pages=50, use_cache=False)
+
+    urls = [page["url"] for page in crawl["pages"]]
+    assert other.requests == 0 # Neither the off-site sitemap nor the off-site page was fetched
+    assert all(url.startswith(site.base_url) for url in urls)
+    assert len(urls) == len(set(urls))
+    # /about and /about-us share content, so only one of them is kept; /links' variants of /about are the same URL
+    assert len(urls) == len(html_paths(site)) - 1
+    assert (site.base_url + "/about" in urls) != (site.base_url + "/about-us" in urls)
+    assert crawl["errors"] == []
+
+
+def test_crawl_returns_page_provenance(sites):
+    site, _ = sites
+    crawl = crawl_site(site.base_url + "/", max_pages=3, use_cache=False)
+
+    assert crawl["pages"][0]["url"] == site.base_url + "/" # The home page sorts first
+    for page in crawl["pages"]:
+        assert page["bytes"] == len(site.documents[page["url"][len(site.base_url):]][1])
+        assert page["chars"] > 0 and page["from_cache"] is False
+        assert f"--- Page: {page['url']} ---" in crawl["text"]
+
+
+def test_crawl_stops_at_page_byte_and_time_budgets(sites):
+    site, _ = sites
+    assert len(crawl_site(site.base_url + "/", max_pages=3, use_cache=False)["pages"]) == 3
+
+    page_bytes = len(site.documents["/"][1])
+    by_bytes = crawl_site(site.base_url + "/", max_pages=50, max_bytes=2 * page_bytes, max_connections_per_host=1,
+                          use_cache=False)
+    fetched = [page["bytes"] for page in by_bytes["pages"]]
+    assert 2 <= len(fetched) < len(html_paths(site)) - 1 # Stopped before running out of distinct pages
+    assert sum(fetched) - max(fetched) < 2 * page_bytes # The last page was only requested while under budget
+
+    requests_before = site.requests
+    assert crawl_site(site.base_url + "/", time_budget_seconds=0, use_cache=False)["pages"] == []
+    assert site.requests == requests_before
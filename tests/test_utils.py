@@ -0,0 +1,33 @@
+import io
+
+from pptx import Presentation
+from pptx.util import Inches
+
+from utils import extract_text_from_pptx
+
+
+def geometry_less_deck():
+    """A one-slide deck with a table, speaker notes and a text shape that has neither geometry nor the txBox flag."""
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    box = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1))
+    box.text_frame.text = "Shape without geometry"
+    box._element.nvSpPr.cNvSpPr.attrib.pop("txBox")
+    box._element.spPr.remove(box._element.spPr.prstGeom)
+    table = slide.shapes.add_table(2, 2, Inches(1), Inches(3), Inches(4), Inches(1)).table
+    for row, cells in enumerate([("Plan", "Price"), ("Pro", "$99")]):
+        for column, text in enumerate(cells):
+            table.cell(row, column).text = text
+    slide.notes_slide.notes_text_frame.text = "Mention the annual discount"
+    output = io.BytesIO()
+    prs.save(output)
+    output.seek(0)
+    return output
+
+
+def test_pptx_shape_without_geometry_keeps_the_deck():
+    text = extract_text_from_pptx(geometry_less_deck())
+
+    assert "Shape without geometry" in text
+    assert "Plan | Price" in text and "Pro | $99" in text
+    assert "Speaker notes: Mention the annual discount" in text
@@ -1,7 +1,24 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 import PyPDF2
 from pptx import Presentation
+from pptx.shapes.group import GroupShape
 import re
 
+# Document extraction limits. Text past MAX_DOCUMENT_CHARS would be cut downstream anyway.
+MAX_PDF_PAGES = 500
+MAX_DOCUMENT_CHARS = 100000
+PDF_PARALLEL_MIN_PAGES = 40 # Smaller PDFs aren't worth the process-pool start-up cost
+PDF_PAGES_PER_WORKER_RANGE = 8
+PDF_SPILL_THRESHOLD_BYTES = 20 * 1024 * 1024
+
+# Bump when extraction output changes so cached document text is not reused.
+PDF_EXTRACTOR_VERSION = 2
+PPTX_EXTRACTOR_VERSION = 3
+
 def add_http_if_missing(url):
     """Adds http:// or https:// to a URL if the scheme is missing."""
     if not url:
@@ -10,33 +27,154 @@ def add_http_if_missing(url):
         return 'https://' + url  # Default to https
     return url
 
-def extract_text_from_pdf(file_obj):
-    """Extracts text from an uploaded PDF file object."""
+def _spill_to_temp_file(file_obj, suffix=".pdf"):
+    """Copies an uploaded file object to a temp file in chunks and returns its path."""
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        shutil.copyfileobj(file_obj, tmp, length=1024 * 1024)
+        return tmp.name
+
+def _file_size(file_obj):
+    """Size of an uploaded file object in bytes, without reading it."""
+    size = getattr(file_obj, "size", None) # Streamlit UploadedFile
+    if size is not None:
+        return size
+    position = file_obj.tell()
+    file_obj.seek(0, os.SEEK_END)
+    size = file_obj.tell()
+    file_obj.seek(position)
+    return size
+
+def iter_pdf_pages(file_obj, max_pages=MAX_PDF_PAGES, start_page=0):
+    """Yields the text of each PDF page in order, one page at a time. `file_obj` may also be an open PdfReader."""
+    pdf_reader = file_obj if isinstance(file_obj, PyPDF2.PdfReader) else PyPDF2.PdfReader(file_obj)
+    end_page = len(pdf_reader.pages) if max_pages is None else min(len(pdf_reader.pages), start_page + max_pages)
+    for page_num in range(start_page, end_page):
+        yield pdf_reader.pages[page_num].extract_text() or ""
+
+def _extract_pdf_page_range(path, start_page, end_page):
+    """Process-pool worker: extracts pages [start_page, end_page) from a PDF on disk."""
+    with open(path, "rb") as f:
+        return list(iter_pdf_pages(f, max_pages=end_page - start_page, start_page=start_page))
+
+def _collect_within_budget(page_texts, max_chars):
+    """Joins page texts until `max_chars` is reached. Returns (text, budget_met)."""
+    parts = []
+    total = 0
+    for page_text in page_texts:
+        parts.append(page_text)
+        total += len(page_text) + 1
+        if max_chars is not None and total >= max_chars:
+            return "\n".join(parts)[:max_chars], True
+    return "\n".join(parts), False
+
+def extract_text_from_pdf(file_obj, max_pages=MAX_PDF_PAGES, max_chars=MAX_DOCUMENT_CHARS, parallel=None,
+                          max_workers=None):
+    """
+    Extracts text from an uploaded PDF file object, page by page, stopping once `max_pages`
+    or `max_chars` is reached. `parallel=None` uses a process pool for large documents
+    (PDF_PARALLEL_MIN_PAGES+ pages) on multi-core machines; uploads above PDF_SPILL_THRESHOLD_BYTES are spilled to a
+    temp file first so workers read from disk instead of copies of the bytes.
+    """
+    spilled_path = None
     try:
-        pdf_reader = PyPDF2.PdfReader(file_obj)
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-        return text
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+        if _file_size(file_obj) > PDF_SPILL_THRESHOLD_BYTES:
+            spilled_path = _spill_to_temp_file(file_obj)
+            source = spilled_path
+        else:
+            source = file_obj
+
+        pdf_reader = PyPDF2.PdfReader(source) # Parsed once; the serial path reads its pages directly
+        num_pages = len(pdf_reader.pages)
+        if max_pages is not None:
+            num_pages = min(num_pages, max_pages)
+        if parallel is None:
+            parallel = num_pages >= PDF_PARALLEL_MIN_PAGES and (os.cpu_count() or 1) > 1
+        if not parallel or num_pages < 2:
+            text, _ = _collect_within_budget(iter_pdf_pages(pdf_reader, max_pages=num_pages), max_chars)
+            return text
+
+        if spilled_path is None:
+            spilled_path = _spill_to_temp_file(file_obj)
+        return _extract_pdf_parallel(spilled_path, num_pages, max_chars, max_workers)
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return ""
+    finally:
+        if spilled_path:
+            os.remove(spilled_path)
+
+def _extract_pdf_parallel(path, num_pages, max_chars, max_workers=None):
+    """Extracts page ranges in a process pool, consuming them in page order and stopping early at the budget."""
+    max_workers = max_workers or min(os.cpu_count() or 2, 8)
+    pages_per_range = max(PDF_PAGES_PER_WORKER_RANGE, -(-num_pages // (max_workers * 4)))
+    ranges = [(start, min(start + pages_per_range, num_pages)) for start in range(0, num_pages, pages_per_range)]
+
+    # Spawned workers don't inherit the parent's threads and locks (e.g. Streamlit's or the job runner's)
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    budget_met = False
+    try:
+        futures = [executor.submit(_extract_pdf_page_range, path, start, end) for start, end in ranges]
+
+        def ordered_pages():
+            for future in futures:
+                yield from future.result()
+
+        text, budget_met = _collect_within_budget(ordered_pages(), max_chars)
+        return text
+    finally:
+        # Once the budget is met, later ranges are no longer needed
+        executor.shutdown(wait=not budget_met, cancel_futures=True)
+
+def _shape_text(shape):
+    """Text of a single non-group shape: table rows joined by " | ", or the shape's own text."""
+    if getattr(shape, "has_table", False) and shape.has_table:
+        rows = ([cell.text.strip() for cell in row.cells] for row in shape.table.rows)
+        return [" | ".join(cells) for cells in rows if any(cells)]
+    if hasattr(shape, "text") and shape.text:
+        return [shape.text]
+    return []
+
+def _iter_shape_text(shapes):
+    """Yields text from shapes, including table cells and shapes nested in groups."""
+    for shape in shapes:
+        # Not shape.shape_type, which raises for shapes python-pptx doesn't recognise (e.g. no geometry)
+        if isinstance(shape, GroupShape):
+            yield from _iter_shape_text(shape.shapes)
+            continue
+        try:
+            yield from _shape_text(shape)
+        except Exception as e: # One unreadable shape shouldn't drop the rest of the deck
+            print(f"Skipping unreadable PPTX shape: {e}")
 
 def extract_text_from_pptx(file_obj):
-    """Extracts text from an uploaded PPTX file object."""
+    """Extracts text from an uploaded PPTX file object: shapes, tables, grouped shapes and speaker notes."""
     try:
         prs = Presentation(file_obj)
         text = []
         for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text.append(shape.text)
+            text.extend(_iter_shape_text(slide.shapes))
+            if slide.has_notes_slide:
+                notes = slide.notes_slide.notes_text_frame.text if slide.notes_slide.notes_text_frame else ""
+                if notes.strip():
+                    text.append(f"Speaker notes: {notes}")
         return "\n".join(text)
     except Exception as e:
         print(f"Error reading PPTX: {e}")
         return ""
 
+def extract_text_from_upload(file_obj, filename):
+    """Extracts text from an uploaded PDF or PPTX, chosen by file extension."""
+    ext = get_file_extension(filename)
+    if ext == 'pdf':
+        return extract_text_from_pdf(file_obj)
+    elif ext == 'pptx':
+        return extract_text_from_pptx(file_obj)
+    return ""
+
 def get_file_extension(filename):
     """Gets the file extension from a filename."""
     return filename.split('.')[-1].lower() if '.' in filename else ""
@@ -48,4 +186,10 @@ def format_company_name_for_filename(company_name):
     # Remove special characters, replace spaces with underscores
     name = re.sub(r'[^\w\s-]', '', company_name).strip().replace(' ', '_')
     name = re.sub(r'[-\s]+', '_', name)
-    return name if name else "generic_company"
\ No newline at end of file
+    return name if name else "generic_company"
+
+def estimate_tokens(text):
+    """Roughly estimates the token count of a string (~4 characters per token for English)."""
+    if not text:
+        return 0
+    return len(text) // 4 + 1